@@ -0,0 +1,372 @@
+"""Denormalized aggregates kept in step with the raw workout tables.
+
+Write routes call refresh_session() inside their own transaction, right before
+commit, so the summaries and analytics rollups can never be observed out of
+sync with the rows they describe. rebuild/verify are exposed as
+`flask aggregates rebuild|verify`.
+"""
+import click, json
+from flask.cli import AppGroup
+from database import get_db
+from training_load import DEFAULT_HR, DEFAULT_RPE, rebuild_load, refresh_load, verify_load
+
+VOLUME_EPSILON = 1e-6
+
+
+# ── Per-session summary ───────────────────────────────────────────────────────
+def refresh_session(conn, sid):
+    """Recompute session_summary / session_muscle_volume for one session.
+    Cost is bounded by the size of that session (indexed on session_id)."""
+    conn.execute("""
+        INSERT INTO session_summary
+            (session_id, user_id, total_sets, total_cardio, total_volume, total_distance, total_duration)
+        SELECT s.id, s.user_id,
+               (SELECT COUNT(*) FROM workout_set WHERE session_id = s.id),
+               (SELECT COUNT(*) FROM cardio_log  WHERE session_id = s.id),
+               (SELECT SUM(reps * COALESCE(weight_kg,0)) FROM workout_set WHERE session_id = s.id),
+               (SELECT SUM(distance_km)  FROM cardio_log WHERE session_id = s.id),
+               (SELECT SUM(duration_min) FROM cardio_log WHERE session_id = s.id)
+        FROM workout_session s WHERE s.id = ?
+        ON CONFLICT(session_id) DO UPDATE SET
+            total_sets     = excluded.total_sets,
+            total_cardio   = excluded.total_cardio,
+            total_volume   = excluded.total_volume,
+            total_distance = excluded.total_distance,
+            total_duration = excluded.total_duration
+    """, (sid,))
+    conn.execute("DELETE FROM session_muscle_volume WHERE session_id=?", (sid,))
+    conn.execute("""
+        INSERT INTO session_muscle_volume (session_id, muscle_group, total_sets, volume)
+        SELECT ws.session_id, COALESCE(NULLIF(e.muscle_group,''), 'Other'),
+               COUNT(*), SUM(ws.reps * COALESCE(ws.weight_kg,0))
+        FROM workout_set ws JOIN exercise e ON e.id = ws.exercise_id
+        WHERE ws.session_id = ?
+        GROUP BY 2
+    """, (sid,))
+    s = conn.execute("SELECT user_id, session_date, template_id FROM workout_session WHERE id=?",
+                     (sid,)).fetchone()
+    if s:
+        refresh_day(conn, s["user_id"], s["session_date"])
+        if s["template_id"] is not None:
+            refresh_template(conn, s["template_id"])
+
+
+def _write_summaries(conn, where, params=()):
+    """Set-based recompute of session_summary and session_muscle_volume for
+    the sessions `s` matching `where`."""
+    conn.execute(f"DELETE FROM session_summary WHERE session_id IN (SELECT id FROM workout_session s WHERE {where})",
+                 params)
+    conn.execute(f"""
+        INSERT INTO session_summary
+            (session_id, user_id, total_sets, total_cardio, total_volume, total_distance, total_duration)
+        SELECT s.id, s.user_id, COALESCE(w.n, 0), COALESCE(c.n, 0), w.volume, c.distance, c.duration
+        FROM workout_session s
+        LEFT JOIN (SELECT ws.session_id, COUNT(*) AS n, SUM(ws.reps * COALESCE(ws.weight_kg,0)) AS volume
+                   FROM workout_set ws JOIN workout_session s ON s.id = ws.session_id
+                   WHERE {where} GROUP BY ws.session_id) w ON w.session_id = s.id
+        LEFT JOIN (SELECT cl.session_id, COUNT(*) AS n, SUM(cl.distance_km) AS distance,
+                          SUM(cl.duration_min) AS duration
+                   FROM cardio_log cl JOIN workout_session s ON s.id = cl.session_id
+                   WHERE {where} GROUP BY cl.session_id) c ON c.session_id = s.id
+        WHERE {where}
+    """, params * 3)
+    conn.execute(f"DELETE FROM session_muscle_volume WHERE session_id IN "
+                 f"(SELECT id FROM workout_session s WHERE {where})", params)
+    conn.execute(f"""
+        INSERT INTO session_muscle_volume (session_id, muscle_group, total_sets, volume)
+        SELECT ws.session_id, COALESCE(NULLIF(e.muscle_group,''), 'Other'),
+               COUNT(*), SUM(ws.reps * COALESCE(ws.weight_kg,0))
+        FROM workout_set ws
+        JOIN workout_session s ON s.id = ws.session_id
+        JOIN exercise e ON e.id = ws.exercise_id
+        WHERE {where}
+        GROUP BY 1, 2
+    """, params)
+
+
+def backfill_summaries(conn):
+    """Create summaries for sessions that have none yet, then refresh the
+    rollups of the days they fall on. Returns how many."""
+    missing = "s.id NOT IN (SELECT session_id FROM session_summary)"
+    days = conn.execute(f"SELECT DISTINCT s.user_id, s.session_date FROM workout_session s WHERE {missing}").fetchall()
+    n = conn.execute(f"SELECT COUNT(*) FROM workout_session s WHERE {missing}").fetchone()[0]
+    _write_summaries(conn, missing)
+    for r in days:
+        refresh_day(conn, r["user_id"], r["session_date"])
+    return n
+
+
+def rebuild_summaries(conn, user_id=None):
+    """Set-based rebuild of every session summary (or one user's). Summaries
+    only, so a backfill pays for each derived table once: follow it with
+    rebuild_rollups(), which also replays training load, and
+    rebuild_template_snapshots(). Returns the number of sessions."""
+    owner, params = ("1", ()) if user_id is None else ("s.user_id=?", (user_id,))
+    _write_summaries(conn, owner, params)
+    return conn.execute(f"SELECT COUNT(*) FROM workout_session s WHERE {owner}", params).fetchone()[0]
+
+
+def verify_summaries(conn):
+    """Return a list of (session_id, problem) where the summary disagrees with
+    the raw tables. Empty list means everything checks out."""
+    problems = []
+    for r in conn.execute("""
+        SELECT s.id, ss.session_id AS has_summary,
+               ss.total_sets, ss.total_cardio, ss.total_volume,
+               (SELECT COUNT(*) FROM workout_set WHERE session_id = s.id) AS raw_sets,
+               (SELECT COUNT(*) FROM cardio_log  WHERE session_id = s.id) AS raw_cardio,
+               (SELECT SUM(reps * COALESCE(weight_kg,0)) FROM workout_set WHERE session_id = s.id) AS raw_volume
+        FROM workout_session s
+        LEFT JOIN session_summary ss ON ss.session_id = s.id
+    """):
+        if r["has_summary"] is None:
+            problems.append((r["id"], "missing summary"))
+        elif r["total_sets"] != r["raw_sets"]:
+            problems.append((r["id"], f"total_sets {r['total_sets']} != {r['raw_sets']}"))
+        elif r["total_cardio"] != r["raw_cardio"]:
+            problems.append((r["id"], f"total_cardio {r['total_cardio']} != {r['raw_cardio']}"))
+        elif abs((r["total_volume"] or 0) - (r["raw_volume"] or 0)) > VOLUME_EPSILON:
+            problems.append((r["id"], f"total_volume {r['total_volume']} != {r['raw_volume']}"))
+
+    stored = """
+        SELECT session_id, muscle_group, total_sets, ROUND(COALESCE(volume,0), 6)
+        FROM session_muscle_volume
+    """
+    raw = """
+        SELECT ws.session_id, COALESCE(NULLIF(e.muscle_group,''), 'Other'),
+               COUNT(*), ROUND(COALESCE(SUM(ws.reps * COALESCE(ws.weight_kg,0)),0), 6)
+        FROM workout_set ws JOIN exercise e ON e.id = ws.exercise_id
+        GROUP BY 1, 2
+    """
+    for r in conn.execute(f"{stored} EXCEPT {raw}"):
+        problems.append((r[0], f"muscle volume for {r[1]!r} is stale"))
+    for r in conn.execute(f"{raw} EXCEPT {stored}"):
+        problems.append((r[0], f"muscle volume for {r[1]!r} is missing"))
+    return problems
+
+
+# ── Analytics rollups ─────────────────────────────────────────────────────────
+# Each rollup is defined once as a SELECT over the raw tables; the same text
+# drives the incremental refresh (filtered to one user/day), the full backfill
+# and the consistency check.
+WEEK_KEY = "strftime('%Y-W%W', {col})"
+# Changing ROLLUPS needs a migration (migrations.py) that calls rebuild_rollups()
+
+ROLLUPS = {
+    "rollup_daily": """
+        SELECT s.user_id, s.session_date, COUNT(*),
+               SUM(ss.total_sets), SUM(ss.total_volume), SUM(s.calories_burned),
+               SUM(ss.total_cardio), SUM(ss.total_distance), SUM(ss.total_duration)
+        FROM workout_session s JOIN session_summary ss ON ss.session_id = s.id
+        WHERE {where}
+        GROUP BY s.user_id, s.session_date
+    """,
+    "rollup_exercise_daily": """
+        SELECT s.user_id, ws.exercise_id, s.session_date, COUNT(*),
+               SUM(ws.reps * COALESCE(ws.weight_kg,0)),
+               MAX(ws.weight_kg),
+               MAX(CASE WHEN ws.weight_kg IS NOT NULL THEN ws.reps END)
+        FROM workout_set ws JOIN workout_session s ON s.id = ws.session_id
+        WHERE {where}
+        GROUP BY s.user_id, ws.exercise_id, s.session_date
+    """,
+    "rollup_cardio_daily": """
+        SELECT s.user_id, cl.activity_type, s.session_date, COUNT(*),
+               SUM(cl.distance_km), SUM(cl.duration_min), ROUND(AVG(cl.avg_heart_rate))
+        FROM cardio_log cl JOIN workout_session s ON s.id = cl.session_id
+        WHERE {where}
+        GROUP BY s.user_id, cl.activity_type, s.session_date
+    """,
+    "rollup_load_daily": f"""
+        SELECT s.user_id, s.session_date,
+               COALESCE(SUM((SELECT SUM(ws.reps * COALESCE(ws.weight_kg,0) * COALESCE(ws.rpe,{DEFAULT_RPE}) / 10.0)
+                             FROM workout_set ws WHERE ws.session_id = s.id)), 0),
+               COALESCE(SUM((SELECT SUM(cl.duration_min * COALESCE(cl.avg_heart_rate,{DEFAULT_HR}))
+                             FROM cardio_log cl WHERE cl.session_id = s.id)), 0)
+        FROM workout_session s
+        WHERE {{where}}
+        GROUP BY s.user_id, s.session_date
+    """,
+}
+# Weekly rows are folded from the daily rollup rather than the raw tables
+WEEKLY_ROLLUP = """
+    SELECT user_id, """ + WEEK_KEY.format(col="day") + """, SUM(sessions),
+           SUM(total_sets), SUM(volume), SUM(calories),
+           SUM(cardio_count), SUM(distance_km), SUM(duration_min)
+    FROM rollup_daily
+    WHERE {where}
+    GROUP BY 1, 2
+"""
+ROLLUP_KEYS = {"user_id", "day", "week", "exercise_id", "activity_type"}
+
+
+def refresh_day(conn, uid, day):
+    """Recompute every rollup row touching (uid, day), then its week and the
+    training-load state from that day on."""
+    for table, select in ROLLUPS.items():
+        conn.execute(f"DELETE FROM {table} WHERE user_id=? AND day=?", (uid, day))
+        conn.execute(f"INSERT INTO {table} " + select.format(where="s.user_id=? AND s.session_date=?"),
+                     (uid, day))
+    week = WEEK_KEY.format(col="?")
+    conn.execute(f"DELETE FROM rollup_weekly WHERE user_id=? AND week={week}", (uid, day))
+    conn.execute("INSERT INTO rollup_weekly " + WEEKLY_ROLLUP.format(
+        where=f"user_id=? AND day BETWEEN date(?,'-6 days') AND date(?,'+6 days') "
+              f"AND {WEEK_KEY.format(col='day')}={week}"
+    ), (uid, day, day, day))
+    refresh_load(conn, uid, day)
+
+
+def rebuild_rollups(conn, user_id=None):
+    """Backfill: drop and regenerate all rollup rows (optionally for one user)."""
+    if user_id is None:
+        raw, owner, params = "1", "1", ()
+    else:
+        raw, owner, params = "s.user_id=?", "user_id=?", (user_id,)
+    for table, select in ROLLUPS.items():
+        conn.execute(f"DELETE FROM {table} WHERE {owner}", params)
+        conn.execute(f"INSERT INTO {table} " + select.format(where=raw), params)
+    conn.execute(f"DELETE FROM rollup_weekly WHERE {owner}", params)
+    conn.execute("INSERT INTO rollup_weekly " + WEEKLY_ROLLUP.format(where=owner), params)
+    rebuild_load(conn, user_id)
+
+
+def verify_rollups(conn):
+    """Compare every rollup table with a fresh aggregation of the raw rows.
+    Returns a list of (table, key, problem); empty means consistent."""
+    checks = {t: select.format(where="1") for t, select in ROLLUPS.items()}
+    checks["rollup_weekly"] = WEEKLY_ROLLUP.format(where="1")
+    problems = []
+    for table, raw in checks.items():
+        conn.execute("DROP TABLE IF EXISTS temp.fresh_rollup")
+        conn.execute(f"CREATE TEMP TABLE fresh_rollup AS SELECT * FROM {table} WHERE 0")
+        try:
+            conn.execute("INSERT INTO fresh_rollup " + raw)
+            cols = [r["name"] for r in conn.execute(f"PRAGMA table_info({table})")]
+            # Round float sums so summation order can't raise false alarms
+            proj = ", ".join(c if c in ROLLUP_KEYS else f"ROUND({c}, 6) AS {c}" for c in cols)
+            keys = [c for c in cols if c in ROLLUP_KEYS]
+            for a, b, problem in ((table, "fresh_rollup", "stale"), ("fresh_rollup", table, "missing")):
+                for r in conn.execute(f"SELECT {proj} FROM {a} EXCEPT SELECT {proj} FROM {b}"):
+                    problems.append((table, tuple(r[k] for k in keys), problem))
+        finally:
+            conn.execute("DROP TABLE fresh_rollup")
+            conn.commit()   # only temp-table writes are pending here
+    return problems
+
+
+# ── Template snapshots ────────────────────────────────────────────────────────
+# One row per template holding what the template list shows (counts, last_used)
+# and the whole GET /api/templates/<id> payload, including the actuals from the
+# most recent linked session. refresh_session() refreshes the template its
+# session is linked to, so ending a session or changing its sets keeps the
+# snapshot current; the template routes refresh it after their own edits.
+def template_snapshot(conn, t):
+    """(exercise_count, cardio_count, last_used, last_session_id, payload) for
+    the session_template row `t`."""
+    exercises = [dict(r) for r in conn.execute("""
+        SELECT te.*, e.name as exercise_name, e.muscle_group, e.equipment
+        FROM template_exercise te
+        JOIN exercise e ON e.id = te.exercise_id
+        WHERE te.template_id = ?
+        ORDER BY te.sort_order
+    """, (t["id"],))]
+    cardio = [dict(r) for r in conn.execute("SELECT * FROM template_cardio WHERE template_id=?", (t["id"],))]
+    last = conn.execute("""
+        SELECT id, session_date FROM workout_session
+        WHERE template_id = ? AND user_id = ?
+        ORDER BY session_date DESC, started_at DESC
+        LIMIT 1
+    """, (t["id"], t["user_id"])).fetchone()
+
+    last_sets, last_cardio = {}, []
+    if last:
+        for r in conn.execute("""
+            SELECT exercise_id, set_number, reps, weight_kg, rpe, rest_seconds
+            FROM workout_set
+            WHERE session_id = ?
+            ORDER BY exercise_id, set_number
+        """, (last["id"],)):
+            last_sets.setdefault(r["exercise_id"], []).append(dict(r))
+        last_cardio = [dict(r) for r in conn.execute(
+            "SELECT * FROM cardio_log WHERE session_id=? ORDER BY logged_at", (last["id"],)
+        )]
+    for ex in exercises:
+        ex["last_sets"] = last_sets.get(ex["exercise_id"], [])
+
+    payload = dict(t)
+    payload["exercises"]   = exercises
+    payload["cardio"]      = cardio
+    payload["last_cardio"] = last_cardio
+    payload["has_history"] = last is not None
+    return (len(exercises), len(cardio), last["session_date"] if last else None,
+            last["id"] if last else None, payload)
+
+def refresh_template(conn, tid):
+    t = conn.execute("SELECT * FROM session_template WHERE id=?", (tid,)).fetchone()
+    if t is None:
+        conn.execute("DELETE FROM template_snapshot WHERE template_id=?", (tid,))
+        return
+    n_ex, n_cardio, last_used, last_sid, payload = template_snapshot(conn, t)
+    conn.execute("""
+        INSERT INTO template_snapshot
+            (template_id, user_id, exercise_count, cardio_count, last_used, last_session_id, detail)
+        VALUES (?,?,?,?,?,?,?)
+        ON CONFLICT(template_id) DO UPDATE SET
+            exercise_count  = excluded.exercise_count,
+            cardio_count    = excluded.cardio_count,
+            last_used       = excluded.last_used,
+            last_session_id = excluded.last_session_id,
+            detail          = excluded.detail
+    """, (tid, t["user_id"], n_ex, n_cardio, last_used, last_sid,
+          json.dumps(payload, separators=(",", ":"))))
+
+def rebuild_template_snapshots(conn, user_id=None):
+    rows = conn.execute("SELECT id FROM session_template WHERE ? IS NULL OR user_id=?",
+                        (user_id, user_id)).fetchall()
+    for r in rows:
+        refresh_template(conn, r["id"])
+    return len(rows)
+
+def verify_template_snapshots(conn):
+    """Return a list of (template_id, problem); empty means consistent."""
+    problems = []
+    for t in conn.execute("SELECT * FROM session_template").fetchall():
+        s = conn.execute("SELECT * FROM template_snapshot WHERE template_id=?", (t["id"],)).fetchone()
+        if s is None:
+            problems.append((t["id"], "missing snapshot"))
+            continue
+        *fresh, payload = template_snapshot(conn, t)
+        stored = [s["exercise_count"], s["cardio_count"], s["last_used"], s["last_session_id"]]
+        if stored != fresh or json.loads(s["detail"]) != payload:
+            problems.append((t["id"], "stale snapshot"))
+    return problems
+
+
+# ── CLI ───────────────────────────────────────────────────────────────────────
+aggregates_cli = AppGroup("aggregates", help="Rebuild or verify denormalized aggregates.")
+
+@aggregates_cli.command("rebuild")
+@click.option("--user-id", type=int, default=None, help="Only rebuild this user's data.")
+def rebuild_command(user_id):
+    """Recompute session summaries, then backfill the analytics rollups."""
+    conn = get_db()
+    n = rebuild_summaries(conn, user_id)
+    rebuild_rollups(conn, user_id)
+    t = rebuild_template_snapshots(conn, user_id)
+    conn.commit(); conn.close()
+    click.echo(f"Rebuilt {n} session summaries, their rollups and {t} template snapshots.")
+
+@aggregates_cli.command("verify")
+def verify_command():
+    """Check summaries and rollups against the raw tables."""
+    conn = get_db()
+    problems = [f"session {sid}: {p}" for sid, p in verify_summaries(conn)]
+    problems += [f"{t} {key}: {p}" for t, key, p in verify_rollups(conn)]
+    problems += [f"training_load ({uid}, {day!r}): {p}" for uid, day, p in verify_load(conn)]
+    problems += [f"template {tid}: {p}" for tid, p in verify_template_snapshots(conn)]
+    conn.close()
+    for line in problems:
+        click.echo(line)
+    if problems:
+        raise SystemExit(1)
+    click.echo("Summaries, rollups and template snapshots match the raw tables.")
@@ -0,0 +1,155 @@
+"""Async request handling for the ASGI entry point (asgi.py).
+
+Blueprints mark a view's async twin with @async_view("<blueprint>.<endpoint>").
+AsyncDispatcher matches each request against the Flask URL map; requests
+whose endpoint has an async twin are served on the event loop, everything
+else goes to the WSGI app through the fallback. The async views never touch
+SQLite on the loop: run_db() hands the blocking part to DB_EXECUTOR, a
+dedicated thread pool sized to the connection pool, so a slow query parks
+one DB thread while the loop keeps accepting and answering other requests.
+"""
+import asyncio, json, time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+from database import get_db
+from encoding import choose_encoding, compress, should_compress
+import metrics
+
+ASYNC_VIEWS = {}
+DB_EXECUTOR = None
+
+
+def async_view(endpoint):
+    def deco(fn):
+        ASYNC_VIEWS[endpoint] = fn
+        return fn
+    return deco
+
+async def run_db(fn, *args):
+    """Run fn(conn, *args) on the DB executor with a pooled connection."""
+    def call():
+        conn = get_db()
+        try:
+            return fn(conn, *args)
+        finally:
+            conn.close()
+    return await asyncio.get_running_loop().run_in_executor(DB_EXECUTOR, call)
+
+
+class AsyncRequest:
+    def __init__(self, app, scope, body, view_args):
+        self.app, self.scope, self.view_args = app, scope, view_args
+        self.method = scope["method"]
+        self.headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope["headers"]}
+        self.query_string = scope.get("query_string", b"").decode()
+        self.args = {k: v[0] for k, v in parse_qs(self.query_string).items()}
+        self.body = body
+        self.uid = self._session_user()
+
+    @property
+    def json(self):
+        try:
+            return json.loads(self.body) if self.body else None
+        except ValueError:
+            return None
+
+    def respond(self, body, status=200, headers=None):
+        """(status, bytes, headers) in the same JSON encoding jsonify() uses."""
+        return (status, self.app.json.dumps(body, separators=(",", ":")).encode(),
+                {"Content-Type": "application/json", **(headers or {})})
+
+    @property
+    def if_none_match(self):
+        return {t.strip().removeprefix("W/").strip('"')
+                for t in self.headers.get("if-none-match", "").split(",") if t.strip()}
+
+    def _session_user(self):
+        """user_id from Flask's signed session cookie, or None."""
+        cookies = {}
+        for part in self.headers.get("cookie", "").split(";"):
+            k, _, v = part.strip().partition("=")
+            cookies[k] = v
+        raw = cookies.get(self.app.config["SESSION_COOKIE_NAME"])
+        serializer = self.app.session_interface.get_signing_serializer(self.app)
+        if not raw or serializer is None:
+            return None
+        try:
+            data = serializer.loads(raw, max_age=int(self.app.permanent_session_lifetime.total_seconds()))
+        except Exception:
+            return None
+        return data.get("user_id")
+
+
+class AsyncDispatcher:
+    def __init__(self, app, fallback, db_threads=None):
+        global DB_EXECUTOR
+        self.app, self.fallback = app, fallback
+        DB_EXECUTOR = ThreadPoolExecutor(db_threads or app.config["DB_POOL_SIZE"],
+                                         thread_name_prefix="ironlog-db")
+        self.urls = app.url_map.bind("")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await self._lifespan(receive, send)
+        if scope["type"] == "http":
+            try:
+                endpoint, view_args = self.urls.match(scope["path"], method=scope["method"])
+            except Exception:   # 404 / 405 / redirects: let Flask produce them
+                endpoint = None
+            view = ASYNC_VIEWS.get(endpoint)
+            if view is not None:
+                return await self._serve(view, scope, receive, send, endpoint, view_args)
+        return await self.fallback(scope, receive, send)
+
+    async def _serve(self, view, scope, receive, send, endpoint, view_args):
+        began = time.perf_counter()
+        body, more = b"", True
+        while more:
+            msg = await receive()
+            body += msg.get("body", b"")
+            more = msg.get("more_body", False)
+        req = AsyncRequest(self.app, scope, body, view_args)
+        if req.uid is not None:         # auth.login_required's check; a cache miss queries off the loop
+            state = self.app.extensions["auth"]
+            user = state.users.get(req.uid)
+            if user is None:
+                user = await run_db(lambda conn, uid: state.user(uid, conn), req.uid)
+            if not user:
+                req.uid = None
+        if req.uid is None:
+            status, payload, headers = req.respond({"error": "Unauthorized"}, 401)
+        else:
+            status, payload, headers = await view(req, **view_args)
+        payload = self._compress(req, status, payload, headers)
+        headers["Content-Length"] = str(len(payload))
+        await send({"type": "http.response.start", "status": status,
+                    "headers": [(k.lower().encode(), str(v).encode()) for k, v in headers.items()]})
+        await send({"type": "http.response.body", "body": payload})
+        if self.app.config.get("METRICS_ENABLED"):
+            metrics.observe_request(endpoint, scope["method"], status, time.perf_counter() - began)
+        timer = self.app.extensions.get("cold_start")
+        if timer is not None:
+            timer.observe(endpoint.rpartition(".")[0] or "app", endpoint, began)
+
+    def _compress(self, req, status, payload, headers):
+        """encoding.init_encoding()'s after_request hook, for the async path."""
+        headers["Vary"] = "Accept-Encoding"
+        if not should_compress(status, headers.get("Content-Type"), len(payload), self.app.config):
+            return payload
+        coding = choose_encoding(req.headers.get("accept-encoding"))
+        if coding is None:
+            return payload
+        headers["Content-Encoding"] = coding
+        if headers.get("ETag", "").startswith('"'):
+            headers["ETag"] = "W/" + headers["ETag"]
+        return compress(payload, coding, self.app.config)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            msg = await receive()
+            if msg["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif msg["type"] == "lifespan.shutdown":
+                DB_EXECUTOR.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
@@ -0,0 +1,185 @@
+"""Overview analytics, split into independent sections.
+
+Each section is a plain function of (conn, uid) returning JSON-ready data, so
+it can run either on the request's own connection or in a worker process.
+With ANALYTICS_WORKERS > 0 the sections of one overview are fanned out over
+a ProcessPoolExecutor whose workers each hold a read-only SQLite connection,
+so concurrent Forge tabs spread their Python-side grouping across cores
+instead of queueing on one GIL. Every section is timed either way; the view
+reports the timings in a Server-Timing header.
+
+This module is imported by the spawned workers, so it must not import the
+Flask app.
+"""
+import atexit, multiprocessing, sqlite3, time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+SECTIONS = {}
+
+def section(name):
+    def deco(fn):
+        SECTIONS[name] = fn
+        return fn
+    return deco
+
+
+# ── Sections ──────────────────────────────────────────────────────────────────
+# Everything except the bodyweight trend reads the rollup tables maintained
+# by aggregates.refresh_day(), so cost no longer grows with raw history.
+@section("totals")
+def totals(conn, uid):
+    return dict(conn.execute("""
+        SELECT SUM(sessions)   as total_sessions,
+               SUM(total_sets) as total_sets,
+               SUM(volume)     as total_volume,
+               SUM(calories)   as total_calories
+        FROM rollup_weekly WHERE user_id=?
+    """, (uid,)).fetchone())
+
+@section("cardio_totals")
+def cardio_totals(conn, uid):
+    return dict(conn.execute("""
+        SELECT SUM(distance_km)  as total_distance,
+               SUM(duration_min) as total_duration,
+               COALESCE(SUM(cardio_count),0) as total_cardio
+        FROM rollup_weekly WHERE user_id=?
+    """, (uid,)).fetchone())
+
+@section("weekly_volume")
+def weekly_volume(conn, uid):
+    # Last 12 weeks
+    return [dict(r) for r in conn.execute("""
+        SELECT week, COALESCE(volume,0) as volume
+        FROM rollup_weekly
+        WHERE user_id=? AND week >= strftime('%Y-W%W', date('now','-84 days'))
+        ORDER BY week
+    """, (uid,))]
+
+@section("exercise_progress")
+def exercise_progress(conn, uid):
+    # Max weight per day per exercise, grouped by exercise name
+    ex_dict = {}
+    for r in conn.execute("""
+        SELECT e.id, e.name, e.muscle_group,
+               r.day as session_date, r.max_weight, r.max_reps
+        FROM rollup_exercise_daily r
+        JOIN exercise e ON e.id = r.exercise_id
+        WHERE r.user_id=? AND r.max_weight IS NOT NULL
+        ORDER BY e.name, r.day
+    """, (uid,)):
+        name = r["name"]
+        if name not in ex_dict:
+            ex_dict[name] = {"muscle": r["muscle_group"], "data": []}
+        ex_dict[name]["data"].append({
+            "date": r["session_date"],
+            "max_weight": r["max_weight"],
+            "max_reps": r["max_reps"]
+        })
+    return ex_dict
+
+@section("cardio_by_activity")
+def cardio_by_activity(conn, uid):
+    # Distance + pace per activity per day, grouped by activity type
+    cardio_dict = {}
+    for r in conn.execute("""
+        SELECT activity_type, day as session_date, distance_km, duration_min,
+               CASE WHEN distance_km > 0 AND duration_min > 0
+                    THEN ROUND(duration_min / distance_km, 2) END as avg_pace_min_km,
+               avg_heart_rate
+        FROM rollup_cardio_daily
+        WHERE user_id=?
+        ORDER BY activity_type, day
+    """, (uid,)):
+        cardio_dict.setdefault(r["activity_type"], []).append({
+            "date": r["session_date"],
+            "distance_km": r["distance_km"],
+            "duration_min": r["duration_min"],
+            "avg_pace_min_km": r["avg_pace_min_km"],
+            "avg_heart_rate": r["avg_heart_rate"]
+        })
+    return cardio_dict
+
+@section("bw_trend")
+def bw_trend(conn, uid):
+    # Last 90 days
+    return [dict(r) for r in conn.execute("""
+        SELECT logged_at as date, weight_kg
+        FROM body_weight WHERE user_id=? AND logged_at >= date('now','-90 days')
+        ORDER BY logged_at
+    """, (uid,))]
+
+@section("heatmap")
+def heatmap(conn, uid):
+    # Last 6 months
+    return [dict(r) for r in conn.execute("""
+        SELECT day as date, sessions as count
+        FROM rollup_daily WHERE user_id=? AND day >= date('now','-180 days')
+    """, (uid,))]
+
+@section("calories_timeline")
+def calories_timeline(conn, uid):
+    # Calories burned per day, last 30 days
+    return [dict(r) for r in conn.execute("""
+        SELECT day as date, calories
+        FROM rollup_daily
+        WHERE user_id=? AND day >= date('now','-30 days')
+              AND calories IS NOT NULL
+        ORDER BY day
+    """, (uid,))]
+
+
+def _timed(name, conn, uid):
+    start = time.perf_counter()
+    result = SECTIONS[name](conn, uid)
+    return name, result, (time.perf_counter() - start) * 1000
+
+
+# ── Worker processes ──────────────────────────────────────────────────────────
+_worker_conn = None
+
+def _init_worker(path):
+    global _worker_conn
+    _worker_conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    _worker_conn.row_factory = sqlite3.Row
+    _worker_conn.execute("PRAGMA query_only = ON")
+
+def _run_in_worker(name, uid):
+    return _timed(name, _worker_conn, uid)
+
+_executor = None
+_config = (0, None)
+
+def configure(workers, path):
+    """(Re)start the worker pool; 0 workers computes in the request thread."""
+    global _executor, _config
+    _config = (workers, path)
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+    if workers:
+        # spawn, not fork: the parent runs pool/job threads that fork would copy mid-flight
+        _executor = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"),
+                                        initializer=_init_worker, initargs=(path,))
+
+atexit.register(lambda: configure(0, None))
+
+def init_analytics(app):
+    app.config.setdefault("ANALYTICS_WORKERS", 0)   # processes; 0 = compute in the request thread
+    if app.config["ANALYTICS_WORKERS"]:
+        from database import get_pool
+        configure(app.config["ANALYTICS_WORKERS"], get_pool().path)
+
+
+def compute_overview(conn, uid):
+    """Return ({section: data}, {section: milliseconds})."""
+    done = None
+    if _executor is not None:
+        try:
+            futures = [_executor.submit(_run_in_worker, name, uid) for name in SECTIONS]
+            done = [f.result() for f in futures]
+        except BrokenProcessPool:
+            configure(*_config)   # a worker died; answer inline and start a fresh pool
+    if done is None:
+        done = [_timed(name, conn, uid) for name in SECTIONS]
+    return {n: r for n, r, _ in done}, {n: ms for n, _, ms in done}
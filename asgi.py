@@ -0,0 +1,25 @@
+"""ASGI entry point: `uvicorn asgi:application --workers 4`.
+
+The hot routes (log a set, fetch a session, analytics overview) are served
+by their async twins on the event loop, with SQLite work on a dedicated
+thread pool (see aio.py). Every other route runs the regular Flask app via
+asgiref's WSGI adapter, so blueprints and behaviour are the same in both
+serving modes. Startup is the same as wsgi.py: migrate() under a lock, the
+job runner, and the cold-start timer, which also covers requests served by
+async twins.
+"""
+import startup                      # first: its import is the cold-start zero point
+from asgiref.wsgi import WsgiToAsgi
+from aio import AsyncDispatcher
+from app import app
+from database import migrate
+from jobs import start_jobs
+
+cold_start = startup.ColdStart()
+cold_start.mark("import")
+migrate()
+cold_start.mark("migrate")
+start_jobs(app)
+cold_start.init_app(app)
+application = AsyncDispatcher(app, fallback=WsgiToAsgi(app))
+cold_start.mark("ready")
@@ -0,0 +1,157 @@
+"""Authentication plumbing shared by every blueprint.
+
+- login_required resolves session["user_id"] to the user's record and puts
+  it in g.user. Records are cached for AUTH_USER_TTL seconds, so the common
+  case costs no query and a deleted account is locked out within the TTL.
+- Password hashing runs on a bounded thread pool. Werkzeug hashes with scrypt
+  (PBKDF2 for older hashes), and hashlib releases the GIL for both. At most
+  AUTH_HASH_WORKERS hashes run per process, with AUTH_HASH_QUEUE more
+  waiting. Past that, HashingBusy is raised and the route answers 503 at
+  once, so a login burst can't occupy every request thread.
+- Login and signup attempts each take a token from the client IP's bucket.
+  Logins also take one from the username's bucket. Both happen before any
+  lookup or hashing, and an empty bucket answers 429 with Retry-After.
+
+Buckets, the pool and the user cache are per process, like metrics.py. Behind
+a proxy, remote_addr is the proxy unless the app is wrapped in ProxyFix.
+"""
+import math, threading, time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from functools import wraps
+from flask import current_app, g, jsonify, request, session
+from werkzeug.security import check_password_hash, generate_password_hash
+from cache import MemoryCache
+from database import get_db
+from metrics import Counter, register
+
+throttled = register(Counter(
+    "ironlog_auth_throttled_total", "Login/signup attempts refused by a token bucket.", ("bucket",)))
+hashes = register(Counter(
+    "ironlog_auth_hashes_total", "Password hashes by outcome.", ("op", "outcome")))
+
+
+class HashingBusy(Exception):
+    """Every hashing slot is taken; answer 503 instead of queueing."""
+
+
+# ── Password hashing ──────────────────────────────────────────────────────────
+class Hasher:
+    def __init__(self, workers=2, queue=8, timeout=10.0):
+        self.timeout = timeout
+        self._pool = ThreadPoolExecutor(workers, thread_name_prefix="ironlog-hash")
+        self._slots = threading.BoundedSemaphore(workers + queue)
+
+    def run(self, op, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            hashes.inc((op, "busy"))
+            raise HashingBusy()
+        future = self._pool.submit(fn, *args)
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            result = future.result(self.timeout)
+        except FutureTimeout:
+            hashes.inc((op, "timeout"))
+            raise HashingBusy()
+        hashes.inc((op, "done"))
+        return result
+
+def check_password(pw_hash, password):
+    return current_app.extensions["auth"].hasher.run("check", check_password_hash, pw_hash, password)
+
+def hash_password(password):
+    return current_app.extensions["auth"].hasher.run("hash", generate_password_hash, password)
+
+
+# ── Throttling ────────────────────────────────────────────────────────────────
+class TokenBuckets:
+    """One token bucket per key: `burst` tokens, refilled at `per_minute`.
+    Bounded LRU; an evicted key just starts again with a full bucket."""
+
+    def __init__(self, burst, per_minute, max_keys=100_000):
+        self.burst, self.rate, self.max_keys = burst, per_minute / 60.0, max_keys
+        self._buckets = OrderedDict()       # key -> (tokens, monotonic stamp)
+        self._lock = threading.Lock()
+
+    def take(self, key):
+        """0 if a token was taken, else seconds until one is available."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, stamp = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - stamp) * self.rate)
+            wait = 0.0 if tokens >= 1 else (1 - tokens) / self.rate
+            self._buckets[key] = (tokens - 1 if not wait else tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+def throttle(username=None):
+    """Seconds the client must wait before retrying, or 0 to go ahead."""
+    state = current_app.extensions["auth"]
+    if not current_app.config["AUTH_THROTTLE"]:
+        return 0
+    wait = state.by_ip.take(request.remote_addr or "-")
+    if wait:
+        throttled.inc(("ip",))
+        return wait
+    if username:
+        wait = state.by_username.take(username.lower())
+        if wait:
+            throttled.inc(("username",))
+    return wait
+
+def retry_after(wait):
+    return {"Retry-After": str(max(1, math.ceil(wait)))}
+
+
+# ── Current user ──────────────────────────────────────────────────────────────
+def current_user():
+    if "user" not in g:
+        uid = session.get("user_id")
+        g.user = current_app.extensions["auth"].user(uid) if uid is not None else None
+        if uid is not None and g.user is None:
+            session.clear()
+    return g.user
+
+def login_required(f):
+    @wraps(f)
+    def d(*a, **kw):
+        if current_user() is None:
+            return jsonify({"error": "Unauthorized"}), 401
+        return f(*a, **kw)
+    return d
+
+
+# ── Setup ─────────────────────────────────────────────────────────────────────
+class AuthState:
+    def __init__(self, config):
+        self.hasher = Hasher(config["AUTH_HASH_WORKERS"], config["AUTH_HASH_QUEUE"], config["AUTH_HASH_TIMEOUT"])
+        self.by_ip = TokenBuckets(config["AUTH_IP_BURST"], config["AUTH_IP_PER_MINUTE"])
+        self.by_username = TokenBuckets(config["AUTH_USERNAME_BURST"], config["AUTH_USERNAME_PER_MINUTE"])
+        self.users = MemoryCache(config["AUTH_USER_CACHE_SIZE"])
+        self.user_ttl = config["AUTH_USER_TTL"]
+
+    def user(self, uid, conn=None):
+        """The user's record (id, username, email) or None, through the TTL
+        cache. A deleted user is cached as False."""
+        user = self.users.get(uid)
+        if user is None:
+            row = (conn or get_db()).execute(
+                "SELECT id, username, email FROM user WHERE id=?", (uid,)
+            ).fetchone()
+            user = dict(row) if row else False
+            self.users.set(uid, user, self.user_ttl)
+        return user or None
+
+def init_auth(app):
+    app.config.setdefault("AUTH_HASH_WORKERS", 2)          # concurrent hashes per process
+    app.config.setdefault("AUTH_HASH_QUEUE", 8)            # hashes allowed to wait for a worker
+    app.config.setdefault("AUTH_HASH_TIMEOUT", 10.0)
+    app.config.setdefault("AUTH_THROTTLE", True)
+    app.config.setdefault("AUTH_IP_BURST", 20)
+    app.config.setdefault("AUTH_IP_PER_MINUTE", 10)
+    app.config.setdefault("AUTH_USERNAME_BURST", 5)
+    app.config.setdefault("AUTH_USERNAME_PER_MINUTE", 2)
+    app.config.setdefault("AUTH_USER_TTL", 30)             # seconds a deleted user can keep a session
+    app.config.setdefault("AUTH_USER_CACHE_SIZE", 4096)
+    app.extensions["auth"] = AuthState(app.config)
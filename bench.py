@@ -0,0 +1,1100 @@
+"""End-to-end latency, throughput and memory for every route: `flask bench run`.
+
+For each scale in datagen.SCALES, a seeded database is generated once into
+--data-dir and then copied for every run, so writes from one run never leak
+into the next. Requests go through the whole Flask stack via the test client,
+logged in as the generated user bench0. That user's history is about the same
+size at every scale, so moving between scales measures how routes cope with
+bigger tables around the same user.
+
+Every route in the url map needs a @case, or the run stops and lists the
+missing ones. A case returns the request to time. Any setup it needs, like
+creating the set that a DELETE removes, runs before the clock starts. Per
+route the report gives:
+
+- the first request's latency (cold caches)
+- p50/p95/p99/max over the remaining iterations
+- sequential throughput
+- peak Python allocation for one more request, traced with tracemalloc
+
+--save writes the numbers as a baseline. --compare exits 1 when a route's p95
+or peak memory exceeds the baseline by more than the thresholds. Latency
+differences under NOISE_FLOOR_MS are ignored.
+
+Baselines only compare fairly on the same machine, Python and SQLite. No
+job runner runs during the benchmark, so enqueued jobs stay queued and don't
+compete with the timed requests.
+"""
+import itertools, json, os, platform, resource, shutil, sqlite3, statistics, tempfile, time, tracemalloc
+from datetime import date
+import click
+from flask import current_app
+from flask.cli import AppGroup
+import database
+from datagen import PASSWORD, SCALES, generate_file
+import encoding
+from cache import CacheBackend
+
+ITERATIONS = 200
+SEED = 0
+END = date(2026, 1, 1)          # fixed, so a scale's data is the same whenever it is generated
+LATENCY_THRESHOLD = 0.20        # p95 may grow 20% over the baseline
+MEMORY_THRESHOLD = 0.25
+NOISE_FLOOR_MS = 1.0
+SKIP_ENDPOINTS = set()          # endpoints deliberately left out of the suite
+
+CASES = {}
+
+
+class Case:
+    def __init__(self, fn, endpoint, method, anonymous, iterations, expect):
+        self.fn, self.endpoint, self.method = fn, endpoint, method
+        self.anonymous, self.iterations, self.expect = anonymous, iterations, expect
+        self.key = f"{method} {endpoint}"
+
+def case(endpoint, method="GET", anonymous=False, iterations=None, expect=200):
+    """Register a benchmark for one (endpoint, method). The function takes
+    the Bench and returns (path, test-client kwargs) for one request."""
+    def deco(fn):
+        CASES[f"{method} {endpoint}"] = Case(fn, endpoint, method, anonymous, iterations, expect)
+        return fn
+    return deco
+
+def missing_cases(app):
+    wanted = {f"{m} {r.endpoint}" for r in app.url_map.iter_rules()
+              for m in r.methods - {"HEAD", "OPTIONS"} if r.endpoint not in SKIP_ENDPOINTS}
+    return sorted(wanted - set(CASES))
+
+
+# ── Fixture ───────────────────────────────────────────────────────────────────
+class Bench:
+    """The logged-in client plus ids the cases work on. Writes go to a scratch
+    session dated today, so the generated history stays as generated."""
+
+    def __init__(self, app):
+        self.client, self.anon = app.test_client(), app.test_client()
+        self.seq = itertools.count()
+        self.login(self.client)
+        conn = database.get_db()
+        self.uid = conn.execute("SELECT id FROM user WHERE username='bench0'").fetchone()["id"]
+        self.session_id = conn.execute(
+            "SELECT id FROM workout_session WHERE user_id=? ORDER BY session_date DESC, id DESC LIMIT 1",
+            (self.uid,)).fetchone()["id"]
+        self.template_id = conn.execute(
+            "SELECT id FROM session_template WHERE user_id=? ORDER BY id LIMIT 1", (self.uid,)).fetchone()["id"]
+        self.exercise_id = conn.execute("""
+            SELECT ws.exercise_id FROM workout_set ws JOIN workout_session s ON s.id = ws.session_id
+            WHERE s.user_id=? GROUP BY 1 ORDER BY COUNT(*) DESC LIMIT 1
+        """, (self.uid,)).fetchone()["exercise_id"]
+        conn.close()
+        r = self.ok("POST", "/api/sync", json={"ops": [{"op_id": "bench-session", "type": "create_session",
+                    "data": {"client_id": "bench-session", "date": date.today().isoformat()}}]})
+        self.scratch_id = r["results"][0]["id"]
+        self.set_ids = [x["id"] for x in self.ok("POST", "/api/sets/batch", json={
+            "session_id": self.scratch_id, "sets": [self.set_body(i) for i in range(20)]})["results"]]
+        self.job_id = self.ok("POST", "/api/jobs", json={"kind": "rebuild_aggregates"})["id"]
+
+    def login(self, client):
+        client.post("/login", json={"username": "bench0", "password": PASSWORD})
+
+    def ok(self, method, path, **kw):
+        r = self.client.open(path, method=method, **kw)
+        assert r.status_code < 400, (method, path, r.status_code, r.get_data(as_text=True)[:200])
+        return r.get_json()
+
+    def set_body(self, n=1):
+        return {"session_id": self.scratch_id, "exercise_id": self.exercise_id,
+                "set_number": n, "reps": 5, "weight_kg": 100, "rpe": 8}
+
+    def new_set(self):
+        return self.ok("POST", "/api/sets", json=self.set_body())["set"]["id"]
+
+
+# ── Cases ─────────────────────────────────────────────────────────────────────
+@case("static")
+def _static(b):
+    return "/static/js/app.js", {}
+
+@case("healthz")
+def _healthz(b):
+    return "/healthz", {}
+
+@case("metrics.scrape")
+def _metrics(b):
+    return "/metrics", {}
+
+@case("auth.index", expect=302)
+def _index(b):
+    return "/", {}
+
+@case("auth.login", anonymous=True)
+def _login_page(b):
+    return "/login", {}
+
+@case("auth.login", "POST", anonymous=True, iterations=10)     # password hashing dominates
+def _login(b):
+    b.anon.get("/logout")
+    return "/login", {"json": {"username": "bench0", "password": PASSWORD}}
+
+@case("auth.signup", anonymous=True)
+def _signup_page(b):
+    b.anon.get("/logout")
+    return "/signup", {}
+
+@case("auth.signup", "POST", anonymous=True, iterations=10)
+def _signup(b):
+    b.anon.get("/logout")
+    n = next(b.seq)
+    return "/signup", {"json": {"username": f"bench-signup-{n}", "email": f"signup{n}@example.com",
+                                "password": PASSWORD}}
+
+@case("auth.logout", anonymous=True, iterations=10, expect=302)
+def _logout(b):
+    b.login(b.anon)
+    return "/logout", {}
+
+@case("workout.app_page")
+def _app_page(b):
+    return "/app", {}
+
+@case("workout.get_exercises")
+def _exercises(b):
+    return "/api/exercises", {}
+
+@case("workout.add_exercise", "POST")
+def _add_exercise(b):
+    return "/api/exercises", {"json": {"name": f"Bench Exercise {next(b.seq)}", "muscle_group": "Core"}}
+
+@case("workout.get_sessions")
+def _sessions(b):
+    return "/api/sessions", {}
+
+@case("workout.create_session", "POST")
+def _create_session(b):
+    return "/api/sessions", {"json": {"date": date.today().isoformat()}}
+
+@case("workout.get_session")
+def _session(b):
+    return f"/api/sessions/{b.session_id}", {}
+
+@case("workout.get_session_changes")
+def _session_changes(b):
+    return f"/api/sessions/{b.scratch_id}/changes?since=0", {}
+
+@case("workout.end_session", "POST")
+def _end_session(b):
+    return f"/api/sessions/{b.scratch_id}/end", {"json": {"calories_burned": 400}}
+
+@case("workout.log_set", "POST")
+def _log_set(b):
+    return "/api/sets", {"json": b.set_body()}
+
+@case("workout.update_set", "PATCH")
+def _update_set(b):
+    return f"/api/sets/{b.set_ids[0]}", {"json": {"reps": 6}}
+
+@case("workout.delete_set", "DELETE")
+def _delete_set(b):
+    return f"/api/sets/{b.new_set()}", {}
+
+@case("workout.log_sets_batch", "POST")
+def _log_batch(b):
+    return "/api/sets/batch", {"json": {"session_id": b.scratch_id, "sets": [b.set_body(i) for i in range(20)]}}
+
+@case("workout.update_sets_batch", "PATCH")
+def _update_batch(b):
+    return "/api/sets/batch", {"json": {"sets": [{"id": i, "reps": 7} for i in b.set_ids]}}
+
+@case("workout.delete_sets_batch", "DELETE")
+def _delete_batch(b):
+    ids = [x["id"] for x in b.ok("POST", "/api/sets/batch", json={
+        "session_id": b.scratch_id, "sets": [b.set_body(i) for i in range(20)]})["results"]]
+    return "/api/sets/batch", {"json": {"ids": ids}}
+
+@case("workout.log_cardio", "POST")
+def _log_cardio(b):
+    return "/api/cardio", {"json": {"session_id": b.scratch_id, "activity_type": "running",
+                                    "distance_km": 5, "duration_min": 25, "avg_heart_rate": 150}}
+
+@case("workout.delete_cardio", "DELETE")
+def _delete_cardio(b):
+    path, kw = _log_cardio(b)
+    return f"/api/cardio/{b.ok('POST', path, **kw)['cardio']['id']}", {}
+
+@case("bodyweight.get_bodyweight")
+def _bodyweight(b):
+    return "/api/bodyweight", {}
+
+@case("bodyweight.log_bodyweight", "POST")
+def _log_bodyweight(b):
+    return "/api/bodyweight", {"json": {"weight_kg": 80}}
+
+@case("analytics.overview")
+def _overview(b):
+    return "/api/analytics/overview", {}
+
+@case("analytics.strength")
+def _strength(b):
+    return f"/api/analytics/strength?exercise_id={b.exercise_id}", {}
+
+@case("analytics.training_load")
+def _load(b):
+    return "/api/analytics/load?days=90", {}
+
+@case("templates.get_templates")
+def _templates(b):
+    return "/api/templates", {}
+
+@case("templates.get_template")
+def _template(b):
+    return f"/api/templates/{b.template_id}", {}
+
+@case("templates.create_template", "POST")
+def _create_template(b):
+    return "/api/templates", {"json": {"name": f"Bench {next(b.seq)}", "exercises": [
+        {"exercise_id": b.exercise_id, "target_sets": 3, "target_reps": 5, "target_weight_kg": 100}]}}
+
+@case("templates.template_from_session", "POST")
+def _template_from_session(b):
+    return f"/api/templates/from-session/{b.session_id}", {"json": {"name": f"Bench {next(b.seq)}"}}
+
+@case("templates.start_from_template", "POST")
+def _start_template(b):
+    return f"/api/templates/{b.template_id}/start", {}
+
+@case("templates.delete_template", "DELETE")
+def _delete_template(b):
+    path, kw = _create_template(b)
+    return f"/api/templates/{b.ok('POST', path, **kw)['id']}", {}
+
+@case("sync.pull")
+def _pull(b):
+    return "/api/sync?since=0", {}
+
+@case("sync.sync", "POST")
+def _sync(b):
+    n = next(b.seq)
+    return "/api/sync", {"json": {"ops": [{"op_id": f"bench-{n}", "type": "log_set", "data": {
+        "client_id": f"bench-set-{n}", "session_client_id": "bench-session",
+        "exercise_id": b.exercise_id, "set_number": 1, "reps": 5, "weight_kg": 100}}]}}
+
+@case("export.export_index")
+def _export_index(b):
+    return "/api/export", {}
+
+@case("export.export_dataset")
+def _export(b):
+    return "/api/export/sets?format=csv", {}
+
+@case("imports.create_import", "POST", expect=202)
+def _import(b):
+    conn = database.get_db()    # nothing runs them, so clear the queue below IMPORTS_MAX_PENDING
+    for job in conn.execute("DELETE FROM job WHERE user_id=? AND kind='import' AND status='queued' "
+                            "RETURNING payload", (b.uid,)).fetchall():
+        os.remove(json.loads(job["payload"])["path"])
+    conn.commit()
+    conn.close()
+    body = "date,exercise,set_number,reps,weight_kg\n2025-06-01,Squat,1,5,100\n"
+    return "/api/import?format=csv", {"data": body, "content_type": "text/csv"}
+
+@case("jobs.list_jobs")
+def _jobs(b):
+    return "/api/jobs", {}
+
+@case("jobs.create_job", "POST", expect=202)
+def _create_job(b):
+    conn = database.get_db()    # nothing runs them, so clear the queue below JOBS_MAX_PENDING
+    conn.execute("DELETE FROM job WHERE user_id=? AND kind<>'import' AND status='queued' AND id<>?",
+                 (b.uid, b.job_id))
+    conn.commit()
+    conn.close()
+    return "/api/jobs", {"json": {"kind": "rebuild_aggregates"}}
+
+@case("jobs.get_job")
+def _job(b):
+    return f"/api/jobs/{b.job_id}", {}
+
+
+# ── Runner ────────────────────────────────────────────────────────────────────
+def _request(client, c, path, kw):
+    start = time.perf_counter()
+    r = client.open(path, method=c.method, **kw)
+    r.get_data()                            # streamed bodies (exports) count in full
+    r.close()
+    elapsed = time.perf_counter() - start
+    if r.status_code != c.expect:
+        raise AssertionError(f"{c.key}: {path} returned {r.status_code}, expected {c.expect}")
+    return elapsed
+
+def _pct(ordered, p):
+    return ordered[min(len(ordered) - 1, round(p / 100 * (len(ordered) - 1)))]
+
+def run_case(b, c, iterations):
+    client = b.anon if c.anonymous else b.client
+    first = _request(client, c, *c.fn(b))
+    times = [_request(client, c, *c.fn(b)) for _ in range(max(1, c.iterations or iterations))]
+    path, kw = c.fn(b)
+    tracemalloc.start()
+    try:
+        _request(client, c, path, kw)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    times.sort()
+    ms = lambda s: round(s * 1000, 3)
+    return {"n": len(times), "first_ms": ms(first), "p50_ms": ms(_pct(times, 50)),
+            "p95_ms": ms(_pct(times, 95)), "p99_ms": ms(_pct(times, 99)), "max_ms": ms(times[-1]),
+            "mean_ms": ms(statistics.fmean(times)), "rps": round(len(times) / sum(times), 1),
+            "peak_kib": round(peak / 1024, 1)}
+
+def prepare_database(scale, data_dir, report=None, users=None, templates=None):
+    """Path of a scratch copy of the scale's generated database. `users`
+    overrides how many users share the scale's sets (users=1 gives bench0
+    the whole history), `templates` how many templates each one has."""
+    os.makedirs(data_dir, exist_ok=True)
+    variant = (f"-{users}u" if users is not None else "") + (f"-{templates}t" if templates is not None else "")
+    source = os.path.join(data_dir, f"ironlog-{scale}{variant}-seed{SEED}.db")
+    if not os.path.exists(source):
+        generate_file(source + ".part", SCALES[scale], users=users, seed=SEED, end=END, report=report,
+                      templates=templates)
+        os.replace(source + ".part", source)
+        os.remove(source + ".part.lock")
+    fd, scratch = tempfile.mkstemp(prefix=f"ironlog-bench-{scale}-", suffix=".db")
+    os.close(fd)
+    shutil.copyfile(source, scratch)
+    return scratch
+
+def compare(results, baseline, latency=LATENCY_THRESHOLD, memory=MEMORY_THRESHOLD):
+    """Return [message] for every route slower or hungrier than its baseline."""
+    problems = []
+    for key, base in baseline["results"].items():
+        now = results.get(key)
+        if now is None:
+            continue
+        if now["p95_ms"] > base["p95_ms"] * (1 + latency) and now["p95_ms"] - base["p95_ms"] > NOISE_FLOOR_MS:
+            problems.append(f"{key}: p95 {now['p95_ms']:.2f} ms vs {base['p95_ms']:.2f} ms baseline")
+        if now["peak_kib"] > base["peak_kib"] * (1 + memory):
+            problems.append(f"{key}: peak {now['peak_kib']:.0f} KiB vs {base['peak_kib']:.0f} KiB baseline")
+    return problems
+
+
+def _open_scratch(app, scale, data_dir, users=None, templates=None):
+    """Stop the job runner and point the pool at a fresh copy of the scale's data."""
+    runner = app.extensions.get("jobs")
+    if runner is not None:
+        runner.stop()
+        app.extensions["jobs"] = None
+    scratch = prepare_database(scale, data_dir, report=click.echo, users=users, templates=templates)
+    database.configure_pool(path=scratch, size=app.config["DB_POOL_SIZE"])
+    return scratch
+
+def _close_scratch(app, scratch):
+    database.configure_pool(path=database.DB_PATH, size=app.config["DB_POOL_SIZE"])
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(scratch + suffix):
+            os.remove(scratch + suffix)
+
+
+# ── Login under attack ────────────────────────────────────────────────────────
+# Credential stuffing: attacker threads hammer /login with wrong passwords for
+# real accounts (victim<n>) from a few addresses, while legitimate users log in
+# to their own accounts (legit<n>), each from its own address. Every account
+# shares bench0's password hash, so each attempt that reaches hashing costs
+# what a real one does.
+def _attack_accounts(n_victims, n_legit):
+    conn = database.get_db()
+    conn.execute("""
+        WITH RECURSIVE k(n) AS (SELECT 0 UNION ALL SELECT n + 1 FROM k WHERE n + 1 < MAX(?, ?))
+        INSERT INTO user (username, email, password_hash)
+        SELECT kind || n, kind || n || '@example.com', (SELECT password_hash FROM user WHERE username='bench0')
+        FROM k, (SELECT 'victim' AS kind, ? AS total UNION ALL SELECT 'legit', ?)
+        WHERE n < total
+    """, (n_victims, n_legit, n_victims, n_legit))
+    conn.commit()
+    conn.close()
+
+def _attack_thread(app, deadline, pick, out):
+    """Log in with pick() -> (username, password, address) until the deadline;
+    append (status, seconds) to out."""
+    client = app.test_client()
+    while time.perf_counter() < deadline:
+        username, password, addr = pick()
+        start = time.perf_counter()
+        r = client.post("/login", json={"username": username, "password": password},
+                        environ_base={"REMOTE_ADDR": addr})
+        out.append((r.status_code, time.perf_counter() - start))
+        if r.status_code == 200:
+            client.get("/logout")
+
+def _summary(label, results, seconds):
+    by_status = {}
+    for status, _ in results:
+        by_status[status] = by_status.get(status, 0) + 1
+    ok = sorted(t for status, t in results if status == 200)
+    statuses = ", ".join(f"{k}: {v}" for k, v in sorted(by_status.items()))
+    line = f"{label:<8}{len(results):>7} requests {len(results) / seconds:>8.1f}/s   {statuses}"
+    if ok:
+        line += f"   login p50 {_pct(ok, 50) * 1000:.0f} ms, p95 {_pct(ok, 95) * 1000:.0f} ms"
+    click.echo(line)
+    return by_status
+
+
+# ── Payload encodings ─────────────────────────────────────────────────────────
+# The big read endpoints, fetched once as rows and then re-encoded in memory:
+# each format through each JSON encoder, then through each compressor, so the
+# numbers are the encoding's cost alone rather than the request's.
+PAYLOAD_PATHS = ("/api/analytics/overview", "/api/analytics/strength", "/api/analytics/load?days=730")
+
+def _best_ms(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+def payload_sizes(app, data, repeat):
+    """{format: {"bytes", "<coding>_bytes", "<encoder>_ms", "<coding>_ms"}} for one payload."""
+    from flask.json.provider import DefaultJSONProvider
+    encoders = {"json": DefaultJSONProvider(app)}
+    if encoding.orjson is not None:
+        encoders["orjson"] = encoding.FastJSONProvider(app)
+    codings = ("gzip", "br") if encoding.brotli else ("gzip",)
+    out = {}
+    for fmt in encoding.FORMATS:
+        body = encoding.shape(data, fmt)
+        raw = app.json.dumps(body).encode()
+        r = out[fmt] = {"bytes": len(raw)}
+        for name, provider in encoders.items():
+            r[f"{name}_ms"] = _best_ms(lambda: provider.dumps(encoding.shape(data, fmt)).encode(), repeat)
+        for coding in codings:
+            r[f"{coding}_bytes"] = len(encoding.compress(raw, coding, app.config))
+            r[f"{coding}_ms"] = _best_ms(lambda: encoding.compress(raw, coding, app.config), repeat)
+    return out
+
+
+# ── Strength engine ───────────────────────────────────────────────────────────
+# strength.strength_report() against the same figures computed per row in
+# SQL with window functions, on one user's whole history. The bench database
+# for this gives bench0 every set of the scale (1m: a million-set history).
+STRENGTH_SQL = {
+    "session_bests": """
+        WITH est AS (
+            SELECT ws.exercise_id, ws.session_id, s.session_date AS day, ws.weight_kg, ws.reps,
+                   CASE WHEN ws.reps = 1 THEN ws.weight_kg ELSE ws.weight_kg * (1 + ws.reps / 30.0) END AS e1rm
+            FROM workout_session s JOIN workout_set ws ON ws.session_id = s.id
+            WHERE s.user_id=? AND ws.weight_kg > 0 AND ws.reps BETWEEN 1 AND ?
+        ), best AS (
+            SELECT *, ROW_NUMBER() OVER (PARTITION BY exercise_id, session_id ORDER BY e1rm DESC) AS rn
+            FROM est
+        )
+        SELECT exercise_id, day, session_id, weight_kg, reps, e1rm,
+               e1rm > COALESCE(MAX(e1rm) OVER (PARTITION BY exercise_id ORDER BY day, session_id
+                               ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING), -1) AS pr
+        FROM best WHERE rn = 1 ORDER BY exercise_id, day, session_id
+    """,
+    "rep_maxes": """
+        SELECT exercise_id, reps, weight_kg, day FROM (
+            SELECT ws.exercise_id, ws.reps, ws.weight_kg, s.session_date AS day,
+                   ROW_NUMBER() OVER (PARTITION BY ws.exercise_id, ws.reps
+                                      ORDER BY ws.weight_kg DESC, s.session_date) AS rn
+            FROM workout_session s JOIN workout_set ws ON ws.session_id = s.id
+            WHERE s.user_id=? AND ws.weight_kg > 0 AND ws.reps BETWEEN 1 AND ?
+        ) WHERE rn = 1 ORDER BY exercise_id, reps
+    """,
+}
+
+def strength_sql(conn, uid):
+    """{query: rows} for the SQL baseline."""
+    from strength import MAX_EST_REPS
+    return {name: conn.execute(sql, (uid, MAX_EST_REPS)).fetchall() for name, sql in STRENGTH_SQL.items()}
+
+
+# ── Concurrent users ──────────────────────────────────────────────────────────
+# Simulated users, one thread each, logged in as different generated users
+# (bench0, bench1, ...) and requesting in a closed loop: each sends its next
+# request as soon as the previous answer is in. The response cache is swapped
+# for one that never hits, so every overview is computed.
+class NoCache(CacheBackend):
+    def get(self, key):
+        return None
+    def set(self, key, value, ttl):
+        pass
+    def clear(self):
+        pass
+
+def _user_clients(app, n):
+    conn = database.get_db()
+    users = conn.execute("SELECT COUNT(*) FROM user WHERE username LIKE 'bench%'").fetchone()[0]
+    conn.close()
+    clients = []
+    for i in range(n):
+        client = app.test_client()
+        client.post("/login", json={"username": f"bench{i % users}", "password": PASSWORD})
+        clients.append(client)
+    return clients
+
+def _closed_loop(clients, plans, seconds, failures=None):
+    """Each client cycles through its plan of (method, path, json) requests
+    until `seconds` are up. Returns (wall seconds, [(path, latency, Server-Timing)]).
+    A non-200 answer stops the run, unless `failures` is a list, which then
+    collects (path, status) and the client carries on."""
+    import threading
+    out, ready = [], threading.Barrier(len(clients) + 1)
+
+    def user(client, plan):
+        ready.wait()
+        deadline = time.perf_counter() + seconds
+        for method, path, body in itertools.cycle(plan):
+            if time.perf_counter() >= deadline:
+                break
+            start = time.perf_counter()
+            r = client.open(path, method=method, json=body)
+            r.get_data()
+            if r.status_code == 200:
+                out.append((path, time.perf_counter() - start, r.headers.get("Server-Timing", "")))
+            elif failures is not None:
+                failures.append((path, r.status_code))
+            else:
+                raise AssertionError(f"{method} {path} returned {r.status_code}")
+
+    threads = [threading.Thread(target=user, args=args) for args in zip(clients, plans)]
+    for t in threads:
+        t.start()
+    ready.wait()
+    began = time.perf_counter()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - began, out
+
+def section_means(timings):
+    """{section: mean ms} from Server-Timing headers ("name;dur=1.2, ...")."""
+    totals, counts = {}, {}
+    for header in timings:
+        for part in filter(None, (p.strip() for p in header.split(","))):
+            name, _, dur = part.partition(";dur=")
+            totals[name] = totals.get(name, 0.0) + float(dur)
+            counts[name] = counts.get(name, 0) + 1
+    return {name: totals[name] / counts[name] for name in totals}
+
+
+# ── Journal modes ─────────────────────────────────────────────────────────────
+# Writers log sets into a session of their own while readers load the
+# overview (response cache off, so every read hits the database), once per
+# journal_mode on a fresh copy of the data. The rest of the storage profile
+# stays as configured. Failed requests (e.g. "database is locked" once
+# busy_timeout runs out) are counted rather than stopping the run.
+JOURNAL_MODES = ("WAL", "DELETE")
+
+def _set_journal_mode(path, mode):
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute(f"PRAGMA journal_mode = {mode}").fetchall()
+    finally:
+        conn.close()
+
+def _writer_plans(clients):
+    """Per writer: log a set into a fresh session of its own."""
+    plans = []
+    for client in clients:
+        sid = client.post("/api/sessions", json={"date": date.today().isoformat()}).get_json()["id"]
+        plans.append([("POST", "/api/sets", {"session_id": sid, "exercise_id": 1, "set_number": 1,
+                                             "reps": 5, "weight_kg": 100})])
+    return plans
+
+
+# ── Template snapshots ────────────────────────────────────────────────────────
+# The template list and template screen read template_snapshot. Without it
+# they were computed per request: a fan-out join for the list, and the
+# exercises plus the last linked session's sets and cardio for the screen
+# (what aggregates.template_snapshot() still computes). The bench database
+# gives each user hundreds of templates, all in rotation, so every template
+# has a long tail of linked sessions.
+TEMPLATE_LIST_LIVE = """
+    SELECT t.*,
+           COUNT(DISTINCT te.id) AS exercise_count,
+           COUNT(DISTINCT tc.id) AS cardio_count,
+           MAX(ws.session_date)  AS last_used
+    FROM session_template t
+    LEFT JOIN template_exercise te ON te.template_id = t.id
+    LEFT JOIN template_cardio   tc ON tc.template_id = t.id
+    LEFT JOIN workout_session   ws ON ws.template_id = t.id AND ws.user_id = t.user_id
+    WHERE t.user_id = ?
+    GROUP BY t.id ORDER BY t.created_at DESC
+"""
+
+def template_detail_live(conn, tid):
+    """One template's payload computed from the raw tables."""
+    from aggregates import template_snapshot
+    return template_snapshot(conn, conn.execute("SELECT * FROM session_template WHERE id=?", (tid,)).fetchone())[-1]
+
+
+# ── Serving modes ─────────────────────────────────────────────────────────────
+# The same closed loop over the hot routes that have async twins, once through
+# the WSGI app with a thread per user (what gunicorn's gthread workers do) and
+# once through asgi.py's dispatcher with a coroutine per user on one event
+# loop. Both drive the app in process, so the numbers compare the serving
+# models without a network or HTTP parser in the way.
+def _hot_plans(clients):
+    """Per client: fetch a session of its own, the overview, log a set."""
+    plans = []
+    for client in clients:
+        latest = client.get("/api/sessions?limit=1").get_json()["items"][0]["id"]
+        scratch = client.post("/api/sessions", json={"date": date.today().isoformat()}).get_json()["id"]
+        plans.append([("GET", f"/api/sessions/{latest}", None),
+                      ("GET", "/api/analytics/overview", None),
+                      ("POST", "/api/sets", {"session_id": scratch, "exercise_id": 1, "set_number": 1,
+                                             "reps": 5, "weight_kg": 100})])
+    return plans
+
+def _asgi_loop(app, clients, plans, seconds):
+    """_closed_loop() through the ASGI dispatcher, one coroutine per client."""
+    import asyncio, aio
+    from asgiref.wsgi import WsgiToAsgi
+    dispatcher = aio.AsyncDispatcher(app, fallback=WsgiToAsgi(app))
+    cookie_name = app.config["SESSION_COOKIE_NAME"]
+    out = []
+
+    async def request(cookie, method, path, body):
+        path, _, query = path.partition("?")
+        payload = json.dumps(body).encode() if body is not None else b""
+        scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method,
+                 "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": query.encode(),
+                 "root_path": "", "client": ("127.0.0.1", 0), "server": ("localhost", 80),
+                 "headers": [(b"host", b"localhost"), (b"cookie", f"{cookie_name}={cookie}".encode()),
+                             (b"content-type", b"application/json"),
+                             (b"content-length", str(len(payload)).encode())]}
+        sent = []
+        async def receive():
+            return {"type": "http.request", "body": payload, "more_body": False}
+        async def send(message):
+            sent.append(message)
+        await dispatcher(scope, receive, send)
+        return sent[0]["status"], dict(sent[0]["headers"])
+
+    async def user(cookie, plan, deadline):
+        for method, path, body in itertools.cycle(plan):
+            if time.perf_counter() >= deadline:
+                break
+            start = time.perf_counter()
+            status, headers = await request(cookie, method, path, body)
+            out.append((path, time.perf_counter() - start, headers.get(b"server-timing", b"").decode()))
+            if status != 200:
+                raise AssertionError(f"{method} {path} returned {status}")
+
+    async def main():
+        began = time.perf_counter()
+        await asyncio.gather(*(user(c.get_cookie(cookie_name).value, plan, began + seconds)
+                               for c, plan in zip(clients, plans)))
+        return time.perf_counter() - began
+
+    try:
+        return asyncio.run(main()), out
+    finally:
+        aio.DB_EXECUTOR.shutdown(wait=True)
+
+def _route_summary(label, wall, out):
+    by_path = {}
+    for path, t, _ in out:
+        by_path.setdefault(path.split("?")[0].rstrip("0123456789"), []).append(t)
+    times = sorted(t for _, t, _ in out)
+    click.echo(f"{label:<6}{len(times):>8} requests {len(times) / wall:>8.1f}/s   "
+               f"p50 {_pct(times, 50) * 1000:.1f} ms  p95 {_pct(times, 95) * 1000:.1f} ms")
+    for path, ts in sorted(by_path.items()):
+        ts.sort()
+        click.echo(f"      {path:<30} p50 {_pct(ts, 50) * 1000:>7.1f} ms  p95 {_pct(ts, 95) * 1000:>7.1f} ms")
+
+
+# ── Cold start ────────────────────────────────────────────────────────────────
+# Each run boots a fresh interpreter on a copy of the data through a production
+# entry point, then sends one request to every blueprint in turn. The child
+# prints the entry point's cold-start report (startup.py): the boot phases,
+# plus each blueprint's first-request latency, timed from the import of
+# startup. The parent adds the whole process's wall time, interpreter start
+# included.
+FIRST_REQUESTS = (("GET", "/healthz"), ("GET", "/login"), ("POST", "/login"), ("GET", "/api/sessions"),
+                  ("GET", "/api/bodyweight"), ("GET", "/api/analytics/overview"), ("GET", "/api/templates"),
+                  ("GET", "/api/sync?since=0"), ("GET", "/api/export"), ("POST", "/api/import?format=csv"),
+                  ("GET", "/api/jobs"), ("GET", "/metrics"))
+
+COLD_START_CHILD = """
+import json, os, sys
+import startup, database
+database.DB_PATH = sys.argv[2]
+entry = __import__(sys.argv[1])
+client = entry.app.test_client()
+for method, path in json.loads(sys.argv[3]):
+    body = {"username": "bench0", "password": sys.argv[4]} if path == "/login" and method == "POST" else None
+    data = "date,exercise,set_number,reps,weight_kg\\n2025-06-01,Squat,1,5,100\\n" if "import" in path else None
+    r = client.open(path, method=method, json=body, data=data, content_type="text/csv" if data else None)
+    if r.status_code >= 500:
+        raise SystemExit(f"{method} {path} returned {r.status_code}")
+print(json.dumps(entry.cold_start.report()))
+if entry.app.extensions["jobs"]:
+    entry.app.extensions["jobs"].stop()
+conn = database.get_db()
+for job in conn.execute("SELECT payload FROM job WHERE kind='import' AND status='queued'"):
+    os.remove(json.loads(job["payload"])["path"])
+"""
+
+def cold_start_run(entry, path):
+    """(process wall ms, cold-start report) for one boot of `entry` on `path`."""
+    import subprocess, sys
+    here = os.path.dirname(os.path.abspath(__file__))
+    start = time.perf_counter()
+    done = subprocess.run([sys.executable, "-c", COLD_START_CHILD, entry, path, json.dumps(FIRST_REQUESTS),
+                           PASSWORD], cwd=here, capture_output=True, text=True)
+    wall = (time.perf_counter() - start) * 1000
+    if done.returncode:
+        raise click.ClickException(f"{entry} boot failed:\n{done.stderr[-2000:]}")
+    return wall, json.loads(done.stdout.strip().splitlines()[-1])
+
+
+# ── CLI ───────────────────────────────────────────────────────────────────────
+bench_cli = AppGroup("bench", help="Benchmark every route against generated data.")
+
+@bench_cli.command("run")
+@click.option("--scale", type=click.Choice(list(SCALES)), default="10k", show_default=True)
+@click.option("--iterations", type=int, default=ITERATIONS, show_default=True)
+@click.option("--only", multiple=True, help="Endpoint to run (repeatable), e.g. workout.get_sessions.")
+@click.option("--data-dir", default=os.path.join(tempfile.gettempdir(), "ironlog-bench"), show_default=True,
+              help="Where generated databases are kept between runs.")
+@click.option("--save", "save_path", default=None, help="Write the results to this baseline file.")
+@click.option("--compare", "baseline_path", default=None, help="Fail on regressions against this baseline.")
+@click.option("--threshold", type=float, default=LATENCY_THRESHOLD, show_default=True,
+              help="Allowed p95 growth over the baseline.")
+def run_command(scale, iterations, only, data_dir, save_path, baseline_path, threshold):
+    """Time every route and optionally save or check a baseline."""
+    app = current_app._get_current_object()
+    missing = missing_cases(app)
+    if missing:
+        raise click.ClickException("No benchmark case for: " + ", ".join(missing))
+    app.config["AUTH_THROTTLE"] = False     # the repeated logins below would all be 429s
+    scratch = _open_scratch(app, scale, data_dir)
+    try:
+        b = Bench(app)
+        results = {}
+        click.echo(f"{'route':<42}{'first':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}{'req/s':>9}{'peak KiB':>10}")
+        for key, c in CASES.items():
+            if only and c.endpoint not in only:
+                continue
+            r = results[key] = run_case(b, c, iterations)
+            click.echo(f"{key:<42}{r['first_ms']:>9.2f}{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}"
+                       f"{r['p99_ms']:>9.2f}{r['max_ms']:>9.2f}{r['rps']:>9.0f}{r['peak_kib']:>10.0f}")
+        conn = database.get_db()
+        for job in conn.execute("SELECT payload FROM job WHERE kind='import'"):
+            path = json.loads(job["payload"])["path"]
+            if os.path.exists(path):
+                os.remove(path)
+        conn.close()
+    finally:
+        _close_scratch(app, scratch)
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss     # KiB on Linux
+    click.echo(f"Process peak RSS {rss / 1024:.0f} MiB.")
+
+    if save_path:
+        with open(save_path, "w") as f:
+            json.dump({"scale": scale, "seed": SEED, "iterations": iterations, "created": date.today().isoformat(),
+                       "python": platform.python_version(), "sqlite": sqlite3.sqlite_version,
+                       "machine": platform.machine(), "peak_rss_kib": rss, "results": results}, f, indent=1)
+        click.echo(f"Baseline written to {save_path}.")
+    if baseline_path:
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        if baseline["scale"] != scale:
+            raise click.ClickException(f"{baseline_path} is a {baseline['scale']} baseline, not {scale}.")
+        problems = compare(results, baseline, latency=threshold)
+        for line in problems:
+            click.echo(line)
+        if problems:
+            raise SystemExit(1)
+        click.echo(f"No regressions against {baseline_path}.")
+
+@bench_cli.command("login-attack")
+@click.option("--seconds", type=float, default=10, show_default=True)
+@click.option("--attackers", type=int, default=16, show_default=True, help="Attacking threads.")
+@click.option("--attack-ips", type=int, default=4, show_default=True, help="Addresses the attack comes from.")
+@click.option("--legit", type=int, default=4, show_default=True, help="Threads of legitimate logins.")
+@click.option("--throttle/--no-throttle", default=True, show_default=True)
+@click.option("--data-dir", default=os.path.join(tempfile.gettempdir(), "ironlog-bench"), show_default=True)
+def login_attack_command(seconds, attackers, attack_ips, legit, throttle, data_dir):
+    """Login throughput for real users while a credential-stuffing attack runs."""
+    import random, threading
+    app = current_app._get_current_object()
+    app.config["AUTH_THROTTLE"] = throttle
+    scratch = _open_scratch(app, "10k", data_dir)
+    try:
+        n_victims, n_legit = 200, 5000
+        _attack_accounts(n_victims, n_legit)
+        legit_ids = itertools.count()
+        rng = random.Random(SEED)
+
+        def attack(i):
+            return lambda: (f"victim{rng.randrange(n_victims)}", "wrong-password", f"10.66.0.{i % attack_ips}")
+        def real():
+            n = next(legit_ids) % n_legit
+            return f"legit{n}", PASSWORD, f"10.{n >> 16 & 255}.{n >> 8 & 255}.{n & 255}"
+
+        bad, good = [], []
+        deadline = time.perf_counter() + seconds
+        threads = [threading.Thread(target=_attack_thread, args=(app, deadline, attack(i), bad))
+                   for i in range(attackers)]
+        threads += [threading.Thread(target=_attack_thread, args=(app, deadline, real, good))
+                    for _ in range(legit)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        click.echo(f"{attackers} attackers from {attack_ips} address(es), {legit} legitimate threads, "
+                   f"{seconds:.0f}s, throttle {'on' if throttle else 'off'}:")
+        _summary("attack", bad, seconds)
+        statuses = _summary("legit", good, seconds)
+        hashed = sum(1 for status, _ in bad + good if status in (200, 401))
+        click.echo(f"Password checks run: {hashed} ({hashed / seconds:.1f}/s); "
+                   f"legitimate logins that succeeded: {statuses.get(200, 0)}/{len(good)}.")
+    finally:
+        _close_scratch(app, scratch)
+
+@bench_cli.command("payload")
+@click.option("--scale", type=click.Choice(list(SCALES)), default="10k", show_default=True)
+@click.option("--repeat", type=int, default=20, show_default=True, help="Timings are the best of this many.")
+@click.option("--data-dir", default=os.path.join(tempfile.gettempdir(), "ironlog-bench"), show_default=True)
+def payload_command(scale, repeat, data_dir):
+    """Payload size and encode time per response format, encoder and compression."""
+    app = current_app._get_current_object()
+    app.config["AUTH_THROTTLE"] = False
+    scratch = _open_scratch(app, scale, data_dir)
+    try:
+        client = app.test_client()
+        client.post("/login", json={"username": "bench0", "password": PASSWORD})
+        for path in PAYLOAD_PATHS:
+            data = client.get(path).get_json()
+            click.echo(f"{path}")
+            for fmt, r in payload_sizes(app, data, repeat).items():
+                timings = "  ".join(f"{k[:-3]} {v:.2f} ms" for k, v in r.items() if k.endswith("_ms"))
+                sizes = "  ".join(f"{k[:-6]} {v / 1024:.1f}" for k, v in r.items() if k.endswith("_bytes"))
+                click.echo(f"  {fmt:<9}{r['bytes'] / 1024:>9.1f} KiB   {sizes} KiB   {timings}")
+    finally:
+        _close_scratch(app, scratch)
+
+@bench_cli.command("strength")
+@click.option("--scale", type=click.Choice(list(SCALES)), default="1m", show_default=True,
+              help="Sets in bench0's history.")
+@click.option("--repeat", type=int, default=5, show_default=True, help="Timings are the best of this many.")
+@click.option("--data-dir", default=os.path.join(tempfile.gettempdir(), "ironlog-bench"), show_default=True)
+def strength_command(scale, repeat, data_dir):
+    """Vectorized strength report vs per-row SQL on one user's whole history."""
+    from strength import strength_report
+    app = current_app._get_current_object()
+    app.config["AUTH_THROTTLE"] = False
+    scratch = _open_scratch(app, scale, data_dir, users=1)
+    try:
+        conn = database.get_db()
+        uid = conn.execute("SELECT id FROM user WHERE username='bench0'").fetchone()["id"]
+        n = conn.execute("SELECT COUNT(*) FROM workout_set ws JOIN workout_session s ON s.id = ws.session_id "
+                         "WHERE s.user_id=?", (uid,)).fetchone()[0]
+        report = strength_report(conn, uid)
+        rows = strength_sql(conn, uid)
+        counts = (sum(len(e["sessions"]) for e in report["exercises"].values()),
+                  sum(e["pr_count"] for e in report["exercises"].values()),
+                  sum(len(e["rep_maxes"]) for e in report["exercises"].values()))
+        expected = (len(rows["session_bests"]), sum(r["pr"] for r in rows["session_bests"]), len(rows["rep_maxes"]))
+        if counts != expected:
+            raise click.ClickException(f"engine and SQL disagree on (session bests, PRs, rep maxes): "
+                                       f"{counts} vs {expected}")
+        bests, prs, maxes = counts
+        vector_ms = _best_ms(lambda: strength_report(conn, uid), repeat)
+        sql_ms = _best_ms(lambda: strength_sql(conn, uid), repeat)
+        conn.close()
+
+        client = app.test_client()
+        client.post("/login", json={"username": "bench0", "password": PASSWORD})
+        route = [_best_ms(lambda: client.get("/api/analytics/strength").close(), 1) for _ in range(2)]
+        click.echo(f"bench0: {n} sets, {bests} session bests, {prs} PRs, {maxes} rep maxes")
+        click.echo(f"  numpy report       {vector_ms:>10.1f} ms")
+        click.echo(f"  per-row SQL        {sql_ms:>10.1f} ms   ({sql_ms / vector_ms:.1f}x)")
+        click.echo(f"  route, cold/cached {route[0]:>10.1f} / {route[1]:.1f} ms")
+    finally:
+        _close_scratch(app, scratch)
+
+@bench_cli.command("concurrent")
+@click.option("--scale", type=click.Choice(list(SCALES)), default="1m", show_default=True)
+@click.option("--users", type=int, default=8, show_default=True, help="Simulated users, one thread each.")
+@click.option("--seconds", type=float, default=10, show_default=True, help="Duration of each run.")
+@click.option("--workers", type=int, multiple=True, help="ANALYTICS_WORKERS per run (repeatable); "
+              "default: 0 and the CPU count.")
+@click.option("--data-dir", default=os.path.join(tempfile.gettempdir(), "ironlog-bench"), show_default=True)
+def concurrent_command(scale, users, seconds, workers, data_dir):
+    """Overview throughput for concurrent users, inline vs. the analytics process pool."""
+    import analytics_compute
+    app = current_app._get_current_object()
+    app.config["AUTH_THROTTLE"] = False
+    workers = workers or (0, os.cpu_count() or 1)
+    scratch = _open_scratch(app, scale, data_dir)
+    cache = app.extensions["response_cache"]
+    app.extensions["response_cache"] = NoCache()
+    try:
+        clients = _user_clients(app, users)
+        click.echo(f"{users} users on /api/analytics/overview, {seconds:.0f}s per run, response cache off")
+        for w in workers:
+            analytics_compute.configure(w, scratch)
+            for c in clients:           # spawn the pool and warm each user's pages outside the clock
+                c.get("/api/analytics/overview")
+            wall, out = _closed_loop(clients, [[("GET", "/api/analytics/overview", None)]] * users, seconds)
+            times = sorted(t for _, t, _ in out)
+            sections = section_means(h for _, _, h in out)
+            click.echo(f"workers={w:<3}{len(times):>7} requests {len(times) / wall:>8.1f}/s   "
+                       f"p50 {_pct(times, 50) * 1000:.1f} ms  p95 {_pct(times, 95) * 1000:.1f} ms")
+            click.echo("           sections (mean ms): " +
+                       "  ".join(f"{k} {v:.1f}" for k, v in sorted(sections.items(), key=lambda kv: -kv[1])))
+    finally:
+        app.extensions["response_cache"] = cache
+        _close_scratch(app, scratch)
+        analytics_compute.configure(app.config["ANALYTICS_WORKERS"], database.get_pool().path)
+
+@bench_cli.command("wal")
+@click.option("--scale", type=click.Choice(list(SCALES)), default="1m", show_default=True)
+@click.option("--writers", type=int, default=4, show_default=True, help="Threads posting to /api/sets.")
+@click.option("--readers", type=int, default=4, show_default=True, help="Threads loading the overview.")
+@click.option("--seconds", type=float, default=10, show_default=True, help="Duration of each run.")
+@click.option("--mode", "modes", type=click.Choice(JOURNAL_MODES, case_sensitive=False), multiple=True,
+              help="journal_mode to run (repeatable); default all.")
+@click.option("--profile", type=click.Choice(list(database.STORAGE_PROFILES)), default=None,
+              help="Storage profile for the other pragmas; default the app's DB_PROFILE.")
+@click.option("--data-dir", default=os.path.join(tempfile.gettempdir(), "ironlog-bench"), show_default=True)
+def wal_command(scale, writers, readers, seconds, modes, profile, data_dir):
+    """Write throughput and read latency under concurrent logging, per journal_mode."""
+    app = current_app._get_current_object()
+    app.config["AUTH_THROTTLE"] = False
+    profile = profile or app.config["DB_PROFILE"]
+    cache = app.extensions["response_cache"]
+    app.extensions["response_cache"] = NoCache()
+    click.echo(f"{writers} writers on /api/sets, {readers} readers on /api/analytics/overview, "
+               f"{seconds:.0f}s per mode, {profile} profile")
+    click.echo(f"{'mode':<8}{'sets/s':>9}{'write p50':>11}{'write p95':>11}{'read p50':>10}{'read p95':>10}"
+               f"{'reads/s':>9}{'failed':>8}")
+    try:
+        for mode in (m.upper() for m in modes or JOURNAL_MODES):
+            scratch = _open_scratch(app, scale, data_dir)
+            try:
+                database.get_pool().close_all()
+                _set_journal_mode(scratch, mode)
+                database.configure_pool(path=scratch, size=writers + readers,
+                                        pragmas=dict(database.storage_profile(profile), journal_mode=mode))
+                clients = _user_clients(app, writers + readers)
+                plans = _writer_plans(clients[:writers]) + [[("GET", "/api/analytics/overview", None)]] * readers
+                failures = []
+                wall, out = _closed_loop(clients, plans, seconds, failures)
+                writes = sorted(t for path, t, _ in out if path == "/api/sets")
+                reads = sorted(t for path, t, _ in out if path != "/api/sets")
+                ms = lambda ts, p: _pct(ts, p) * 1000 if ts else float("nan")
+                click.echo(f"{mode:<8}{len(writes) / wall:>9.1f}{ms(writes, 50):>8.1f} ms{ms(writes, 95):>8.1f} ms"
+                           f"{ms(reads, 50):>7.1f} ms{ms(reads, 95):>7.1f} ms{len(reads) / wall:>9.1f}"
+                           f"{len(failures):>8}")
+            finally:
+                _close_scratch(app, scratch)
+    finally:
+        app.extensions["response_cache"] = cache
+
+@bench_cli.command("templates")
+@click.option("--scale", type=click.Choice(list(SCALES)), default="1m", show_default=True)
+@click.option("--users", type=int, default=10, show_default=True,
+              help="Users sharing the scale's sets (1m / 10: ~5,000 sessions each).")
+@click.option("--templates", type=int, default=300, show_default=True, help="Templates per user.")
+@click.option("--repeat", type=int, default=20, show_default=True, help="Timings are the best of this many.")
+@click.option("--data-dir", default=os.path.join(tempfile.gettempdir(), "ironlog-bench"), show_default=True)
+def templates_command(scale, users, templates, repeat, data_dir):
+    """Template list and template screen from snapshots vs. computed per request."""
+    from aggregates import refresh_session
+    app = current_app._get_current_object()
+    app.config["AUTH_THROTTLE"] = False
+    scratch = _open_scratch(app, scale, data_dir, users=users, templates=templates)
+    try:
+        conn = database.get_db()
+        uid = conn.execute("SELECT id FROM user WHERE username='bench0'").fetchone()["id"]
+        n_templates = conn.execute("SELECT COUNT(*) FROM session_template WHERE user_id=?", (uid,)).fetchone()[0]
+        linked = conn.execute("SELECT COUNT(*) FROM workout_session WHERE user_id=? AND template_id IS NOT NULL",
+                              (uid,)).fetchone()[0]
+        sid, tid = conn.execute("""
+            SELECT id, template_id FROM workout_session WHERE user_id=? AND template_id IS NOT NULL
+            ORDER BY session_date DESC, id DESC LIMIT 1
+        """, (uid,)).fetchone()
+        rows, detail = conn.execute(TEMPLATE_LIST_LIVE, (uid,)).fetchall(), template_detail_live(conn, tid)
+        from routes.templates import TEMPLATE_LIST
+        snapshot = "SELECT detail FROM template_snapshot WHERE template_id=? AND user_id=?"
+        timings = {
+            "list":   [_best_ms(lambda: conn.execute(TEMPLATE_LIST, (uid,)).fetchall(), repeat),
+                       _best_ms(lambda: conn.execute(TEMPLATE_LIST_LIVE, (uid,)).fetchall(), repeat)],
+            "detail": [_best_ms(lambda: conn.execute(snapshot, (tid, uid)).fetchone(), repeat),
+                       _best_ms(lambda: template_detail_live(conn, tid), repeat)],
+        }
+        refresh_ms = _best_ms(lambda: refresh_session(conn, sid), repeat)
+        conn.rollback()
+        conn.close()
+
+        client = app.test_client()
+        client.post("/login", json={"username": "bench0", "password": PASSWORD})
+        listed, shown = client.get("/api/templates").get_json(), client.get(f"/api/templates/{tid}").get_json()
+        keys = ("id", "exercise_count", "cardio_count", "last_used")
+        if (sorted([r[k] for k in keys] for r in listed) != sorted([r[k] for k in keys] for r in rows)
+                or shown != detail):
+            raise click.ClickException("snapshots and the live computation disagree")
+        timings["list"].append(_best_ms(lambda: client.get("/api/templates").close(), repeat))
+        timings["detail"].append(_best_ms(lambda: client.get(f"/api/templates/{tid}").close(), repeat))
+
+        click.echo(f"bench0: {n_templates} templates, {linked} linked sessions")
+        click.echo(f"  {'':<8}{'snapshot':>12}{'live':>12}{'route':>12}")
+        for label, (snap, live, route) in timings.items():
+            click.echo(f"  {label:<8}{snap:>9.2f} ms{live:>9.2f} ms{route:>9.2f} ms   ({live / snap:.0f}x)")
+        click.echo(f"  refresh_session on a linked session (the write-side cost): {refresh_ms:.2f} ms")
+    finally:
+        _close_scratch(app, scratch)
+
+@bench_cli.command("serve")
+@click.option("--scale", type=click.Choice(list(SCALES)), default="1m", show_default=True)
+@click.option("--users", type=int, default=16, show_default=True, help="Simulated users.")
+@click.option("--seconds", type=float, default=10, show_default=True, help="Duration of each mode.")
+@click.option("--data-dir", default=os.path.join(tempfile.gettempdir(), "ironlog-bench"), show_default=True)
+def serve_command(scale, users, seconds, data_dir):
+    """Requests/second on the hot routes, WSGI (thread per user) vs. ASGI (async twins)."""
+    app = current_app._get_current_object()
+    app.config["AUTH_THROTTLE"] = False
+    scratch = _open_scratch(app, scale, data_dir)
+    try:
+        clients = _user_clients(app, users)
+        plans = _hot_plans(clients)
+        click.echo(f"{users} users, {seconds:.0f}s per mode: session detail, overview, log a set")
+        _route_summary("wsgi", *_closed_loop(clients, plans, seconds))
+        _route_summary("asgi", *_asgi_loop(app, clients, plans, seconds))
+    finally:
+        _close_scratch(app, scratch)
+
+@bench_cli.command("startup")
+@click.option("--scale", type=click.Choice(list(SCALES)), default="10k", show_default=True)
+@click.option("--runs", type=int, default=5, show_default=True, help="Boots per entry point; medians are shown.")
+@click.option("--entry", "entries", type=click.Choice(["wsgi", "asgi"]), multiple=True,
+              help="Entry point to boot (repeatable); default both.")
+@click.option("--data-dir", default=os.path.join(tempfile.gettempdir(), "ironlog-bench"), show_default=True)
+def startup_command(scale, runs, entries, data_dir):
+    """Cold start of the production entry points: boot phases and each blueprint's first request."""
+    for entry in entries or ("wsgi", "asgi"):
+        walls, reports = [], []
+        for _ in range(runs):
+            scratch = prepare_database(scale, data_dir, report=click.echo)
+            try:
+                wall, report = cold_start_run(entry, scratch)
+            finally:
+                for suffix in ("", "-wal", "-shm", ".lock"):
+                    if os.path.exists(scratch + suffix):
+                        os.remove(scratch + suffix)
+            walls.append(wall)
+            reports.append(report)
+        med = lambda values: statistics.median(values)
+        click.echo(f"{entry}: process {med(walls):.0f} ms over {runs} boot(s); phases after startup import: " +
+                   ", ".join(f"{phase} {med([r['phases'][phase] for r in reports]):.1f} ms"
+                             for phase in reports[0]["phases"]))
+        click.echo(f"  {'blueprint':<12}{'first request':<34}{'latency':>10}{'after boot':>12}")
+        for bp, first in reports[0]["first_requests"].items():
+            latency = med([r["first_requests"][bp]["latency_ms"] for r in reports])
+            after = med([r["first_requests"][bp]["after_boot_ms"] for r in reports])
+            click.echo(f"  {bp:<12}{first['endpoint']:<34}{latency:>8.1f} ms{after:>9.0f} ms")
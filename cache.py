@@ -0,0 +1,172 @@
+"""Per-user response cache for read-heavy JSON endpoints.
+
+Entries are keyed by (endpoint, user, data version, day, query). Every write
+route bumps the user's row in user_data_version inside its own transaction, so
+a new write simply makes the old keys unreachable — nothing has to be purged.
+The day is there because cached views use date('now') windows (last 30 days,
+...), so their keys and ETags must turn over at midnight too. The same key
+doubles as the ETag, letting unchanged payloads come back as 304.
+"""
+import hashlib, sqlite3, threading, time
+from datetime import datetime, timezone
+from collections import OrderedDict
+from functools import wraps
+from flask import current_app, request, session
+from database import get_db
+
+
+def data_version(conn, uid):
+    row = conn.execute("SELECT version FROM user_data_version WHERE user_id=?", (uid,)).fetchone()
+    return row["version"] if row else 0
+
+def bump_data_version(conn, uid):
+    """Call from write routes before commit."""
+    conn.execute("""
+        INSERT INTO user_data_version (user_id, version) VALUES (?, 1)
+        ON CONFLICT(user_id) DO UPDATE SET version = version + 1
+    """, (uid,))
+
+
+# ── Backends ──────────────────────────────────────────────────────────────────
+class CacheBackend:
+    """Anything with get/set/clear works; values are bytes."""
+    def get(self, key):
+        raise NotImplementedError
+    def set(self, key, value, ttl):
+        raise NotImplementedError
+    def clear(self):
+        raise NotImplementedError
+
+
+class MemoryCache(CacheBackend):
+    """In-process LRU with per-entry TTL. One copy per worker."""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            hit = self._data.get(key)
+            if hit is None:
+                return None
+            value, expires = hit
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class SQLiteCache(CacheBackend):
+    """Shared cache for multi-worker deployments on one host. Lives in its own
+    file so cache writes never contend with gym.db's writer lock."""
+
+    def __init__(self, path, max_entries=10000):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._conn().execute("""
+            CREATE TABLE IF NOT EXISTS response_cache (
+                key     TEXT PRIMARY KEY,
+                value   BLOB NOT NULL,
+                expires REAL NOT NULL
+            )
+        """)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = OFF")
+            conn.execute("PRAGMA busy_timeout = 2000")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        try:
+            row = self._conn().execute(
+                "SELECT value FROM response_cache WHERE key=? AND expires>=?", (key, time.time())
+            ).fetchone()
+        except sqlite3.Error:
+            return None    # a cache miss is always a safe answer
+        return row[0] if row else None
+
+    def set(self, key, value, ttl):
+        try:
+            conn = self._conn()
+            conn.execute("INSERT OR REPLACE INTO response_cache VALUES (?,?,?)",
+                         (key, value, time.time() + ttl))
+            conn.execute("""
+                DELETE FROM response_cache WHERE expires < ? OR key IN (
+                    SELECT key FROM response_cache ORDER BY expires DESC LIMIT -1 OFFSET ?
+                )
+            """, (time.time(), self.max_entries))
+        except sqlite3.Error:
+            pass
+
+    def clear(self):
+        self._conn().execute("DELETE FROM response_cache")
+
+
+def init_cache(app):
+    app.config.setdefault("CACHE_BACKEND", "memory")     # "memory" | "sqlite" | a CacheBackend
+    app.config.setdefault("CACHE_TTL", 300)
+    app.config.setdefault("CACHE_MAX_ENTRIES", 1024)
+    app.config.setdefault("CACHE_SQLITE_PATH", None)
+    backend = app.config["CACHE_BACKEND"]
+    if backend == "memory":
+        backend = MemoryCache(app.config["CACHE_MAX_ENTRIES"])
+    elif backend == "sqlite":
+        import database
+        path = app.config["CACHE_SQLITE_PATH"] or database.DB_PATH + ".cache"
+        backend = SQLiteCache(path, app.config["CACHE_MAX_ENTRIES"])
+    app.extensions["response_cache"] = backend
+
+
+# ── View decorator ────────────────────────────────────────────────────────────
+def cache_key(endpoint, uid, version, view_args, query_string):
+    """(cache key, ETag) for one view of one user's data at `version`, today."""
+    day = datetime.now(timezone.utc).date().isoformat()     # SQLite's date('now') is UTC
+    key = f"{endpoint}:{uid}:{version}:{day}:{sorted(view_args.items())}:{query_string}"
+    return key, hashlib.sha1(key.encode()).hexdigest()[:20]
+
+def cached(endpoint):
+    """Cache a JSON view per user. Place below @login_required."""
+    def deco(f):
+        @wraps(f)
+        def d(*a, **kw):
+            uid = session["user_id"]
+            key, etag = cache_key(endpoint, uid, data_version(get_db(), uid),
+                                  kw, request.query_string.decode())
+
+            if request.if_none_match.contains_weak(etag):   # weak: compressed bodies carry W/
+                resp = current_app.response_class(status=304)
+            else:
+                backend = current_app.extensions["response_cache"]
+                body = backend.get(key)
+                if body is not None:
+                    resp = current_app.response_class(body, mimetype="application/json")
+                else:
+                    resp = current_app.make_response(f(*a, **kw))
+                    if resp.status_code != 200:
+                        return resp
+                    backend.set(key, resp.get_data(), current_app.config["CACHE_TTL"])
+            resp.set_etag(etag)
+            resp.headers["Cache-Control"] = "private, no-cache"
+            return resp
+        return d
+    return deco
@@ -0,0 +1,84 @@
+"""Exercise catalog: the built-in exercises every user sees plus each user's own.
+
+Globals only change through migrations, so each process reads them once and
+keeps them. Custom exercises are cached per user under
+user_data_version.catalog_version, which add_exercise and the importer bump in
+the same transaction as their insert; any worker holding an older copy sees
+the new version on its next lookup and rebuilds. That makes a catalog request
+one primary-key read: a matching If-None-Match is answered from the version
+alone, and the merged list, its JSON body and its ETag are built only when
+the version moves. The importer resolves names through the same catalog.
+"""
+import hashlib, heapq, string, threading
+from flask import current_app
+from cache import MemoryCache
+
+CATALOG_MAX_USERS = 2048
+CATALOG_TTL = 3600          # seconds; only bounds memory, versions keep entries correct
+
+# SQLite's LOWER() only folds ASCII letters; str.lower() would fold more
+_ASCII_FOLD = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+def fold(name):
+    return name.translate(_ASCII_FOLD)
+
+
+class UserCatalog:
+    __slots__ = ("version", "etag", "exercises", "by_name", "body")
+
+    def __init__(self, version, etag, exercises):
+        self.version, self.etag, self.exercises, self.body = version, etag, exercises, None
+        # Globals first so the user's own exercise wins a name clash
+        self.by_name = {fold(e["name"]): e["id"] for e in sorted(exercises, key=lambda e: -e["is_global"])}
+
+    def json_body(self):
+        """The list as the response body, serialized on first use (needs an app context)."""
+        if self.body is None:
+            self.body = current_app.json.dumps(self.exercises).encode()
+        return self.body
+
+
+_globals = None             # (exercises sorted by name, content hash)
+_globals_lock = threading.Lock()
+_users = MemoryCache(CATALOG_MAX_USERS)
+
+def global_exercises(conn):
+    global _globals
+    if _globals is None:
+        with _globals_lock:
+            if _globals is None:
+                rows = tuple(dict(r) for r in conn.execute(
+                    "SELECT * FROM exercise WHERE is_global=1 ORDER BY name"
+                ))
+                _globals = rows, hashlib.sha1(repr(rows).encode()).hexdigest()[:12]
+    return _globals
+
+def catalog_version(conn, uid):
+    row = conn.execute("SELECT catalog_version FROM user_data_version WHERE user_id=?", (uid,)).fetchone()
+    return row["catalog_version"] if row else 0
+
+def bump_catalog_version(conn, uid):
+    """Call from anything that adds or changes a user's exercises, before commit."""
+    conn.execute("""
+        INSERT INTO user_data_version (user_id, version, catalog_version) VALUES (?, 0, 1)
+        ON CONFLICT(user_id) DO UPDATE SET catalog_version = catalog_version + 1
+    """, (uid,))
+
+def catalog_etag(conn, uid, version):
+    _, tag = global_exercises(conn)
+    return hashlib.sha1(f"exercises:{tag}:{uid}:{version}".encode()).hexdigest()[:20]
+
+def get_catalog(conn, uid, version=None):
+    """The user's catalog, sorted by name like the old `ORDER BY name` query."""
+    version = catalog_version(conn, uid) if version is None else version
+    hit = _users.get(uid)
+    if hit is not None and hit.version == version:
+        return hit
+    globals_, _ = global_exercises(conn)
+    custom = [dict(r) for r in conn.execute(
+        "SELECT * FROM exercise WHERE user_id=? ORDER BY name", (uid,)
+    )]
+    exercises = list(heapq.merge(globals_, custom, key=lambda e: e["name"]))
+    cat = UserCatalog(version, catalog_etag(conn, uid, version), exercises)
+    _users.set(uid, cat, CATALOG_TTL)
+    return cat
@@ -0,0 +1,115 @@
+"""Per-user change feed for sessions, sets and cardio entries.
+
+Every write appends a row to change_log in the writer's transaction. Its id is
+the sync cursor: clients ask for everything after the last id they saw and
+patch their local state with the current version of each touched row, instead
+of re-fetching whole sessions.
+
+Each write also bumps workout_session.version, stamped on the change row, so a
+single session can be followed with GET /api/sessions/<sid>/changes?since=<v>.
+"""
+
+ENTITY_QUERIES = {
+    "session": "SELECT * FROM workout_session WHERE id IN ({ids})",
+    "set": """
+        SELECT ws.*, e.name as exercise_name, e.muscle_group
+        FROM workout_set ws JOIN exercise e ON e.id = ws.exercise_id
+        WHERE ws.id IN ({ids})
+    """,
+    "cardio": "SELECT * FROM cardio_log WHERE id IN ({ids})",
+}
+MAX_CHANGES = 500
+
+
+def bump_session_version(conn, sid):
+    row = conn.execute(
+        "UPDATE workout_session SET version = version + 1 WHERE id=? RETURNING version", (sid,)
+    ).fetchone()
+    return row[0] if row else None
+
+def record_change(conn, uid, sid, entity, entity_id, action="upsert"):
+    """Log one change and return the session's new version."""
+    version = bump_session_version(conn, sid)
+    conn.execute(
+        "INSERT INTO change_log (user_id, session_id, session_version, entity, entity_id, action) "
+        "VALUES (?,?,?,?,?,?)",
+        (uid, sid, version, entity, entity_id, action)
+    )
+    return version
+
+def record_changes(conn, uid, entity, pairs, action="upsert"):
+    """Batch form of record_change; pairs is an iterable of (session_id, entity_id).
+    Changes to one session in one batch share a single version bump.
+    Returns {session_id: new version}."""
+    pairs = list(pairs)
+    versions = {sid: bump_session_version(conn, sid) for sid in {sid for sid, _ in pairs}}
+    conn.executemany(
+        "INSERT INTO change_log (user_id, session_id, session_version, entity, entity_id, action) "
+        "VALUES (?,?,?,?,?,?)",
+        [(uid, sid, versions[sid], entity, eid, action) for sid, eid in pairs]
+    )
+    return versions
+
+def load_rows(conn, entity, ids):
+    """Current state of the given rows as {id: dict}; missing ids are left out."""
+    out = {}
+    for i in range(0, len(ids), 500):
+        chunk = ids[i:i + 500]
+        for row in conn.execute(ENTITY_QUERIES[entity].format(ids=",".join("?" * len(chunk))), chunk):
+            out[row["id"]] = dict(row)
+    return out
+
+def current_cursor(conn, uid):
+    row = conn.execute("SELECT MAX(id) FROM change_log WHERE user_id=?", (uid,)).fetchone()
+    return row[0] or 0
+
+def changes_since(conn, uid, since, limit=MAX_CHANGES, session_id=None):
+    """Return {"changes": [...], "cursor": int, "more": bool}. Several changes to
+    the same row collapse into one entry carrying the row's current state.
+
+    With session_id, `since` and the returned cursor are that session's version
+    rather than the user-wide change_log id. One version can span many rows (a
+    batch write), so a full page is extended to the end of its last version;
+    otherwise the next page, starting after that version, would skip the rest."""
+    if session_id is None:
+        log = conn.execute(
+            "SELECT * FROM change_log WHERE user_id=? AND id>? ORDER BY id LIMIT ?",
+            (uid, since, limit)
+        ).fetchall()
+    else:
+        log = conn.execute(
+            "SELECT * FROM change_log WHERE session_id=? AND session_version>? ORDER BY id LIMIT ?",
+            (session_id, since, limit)
+        ).fetchall()
+        if len(log) == limit:
+            log += conn.execute(
+                "SELECT * FROM change_log WHERE session_id=? AND session_version=? AND id>? ORDER BY id",
+                (session_id, log[-1]["session_version"], log[-1]["id"])
+            ).fetchall()
+    latest = {}
+    for r in log:
+        latest.pop((r["entity"], r["entity_id"]), None)   # keep feed order by last touch
+        latest[(r["entity"], r["entity_id"])] = r
+
+    current = {}
+    for entity in ENTITY_QUERIES:
+        ids = [eid for (ent, eid), r in latest.items() if ent == entity and r["action"] != "delete"]
+        for eid, row in load_rows(conn, entity, ids).items():
+            current[(entity, eid)] = row
+
+    changes = []
+    for (entity, eid), r in latest.items():
+        row = current.get((entity, eid))
+        changes.append({
+            "entity":     entity,
+            "id":         eid,
+            "session_id": r["session_id"],
+            "version":    r["session_version"],
+            "action":     "upsert" if row is not None else "delete",
+            "row":        row,
+        })
+    return {
+        "changes": changes,
+        "cursor":  (log[-1]["id"] if session_id is None else log[-1]["session_version"]) if log else since,
+        "more":    len(log) >= limit,
+    }
@@ -1,168 +1,302 @@
-import sqlite3, os
+import sqlite3, os, threading, time
+from flask import g, has_app_context
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DB_PATH  = os.path.join(BASE_DIR, "gym.db")
 
-GLOBAL_EXERCISES = [
-    ('Bench Press',       'Chest',      'Barbell'),
-    ('Squat',             'Legs',       'Barbell'),
-    ('Deadlift',          'Back',       'Barbell'),
-    ('Overhead Press',    'Shoulders',  'Barbell'),
-    ('Barbell Row',       'Back',       'Barbell'),
-    ('Pull Up',           'Back',       'Bodyweight'),
-    ('Dumbbell Curl',     'Biceps',     'Dumbbell'),
-    ('Tricep Pushdown',   'Triceps',    'Cable'),
-    ('Leg Press',         'Legs',       'Machine'),
-    ('Lat Pulldown',      'Back',       'Cable'),
-    ('Incline Press',     'Chest',      'Dumbbell'),
-    ('Romanian Deadlift', 'Hamstrings', 'Barbell'),
-    ('Face Pull',         'Shoulders',  'Cable'),
-    ('Dumbbell Row',      'Back',       'Dumbbell'),
-    ('Cable Fly',         'Chest',      'Cable'),
-    ('Hip Thrust',        'Glutes',     'Barbell'),
-    ('Dips',              'Triceps',    'Bodyweight'),
-    ('Leg Curl',          'Hamstrings', 'Machine'),
-]
+# ── Storage configuration ─────────────────────────────────────────────────────
+# Applied to every new connection. WAL lets readers (analytics, history) run
+# while a set is being written; busy_timeout makes concurrent writers queue up
+# behind each other instead of failing with "database is locked".
+STORAGE_PROFILES = {
+    "development": {
+        "journal_mode": "WAL",
+        "synchronous":  "NORMAL",
+        "busy_timeout": 5000,
+        "cache_size":   -16000,        # KiB when negative → ~16 MB
+        "mmap_size":    0,
+        "temp_store":   "DEFAULT",
+    },
+    "production": {
+        "journal_mode": "WAL",
+        "synchronous":  "NORMAL",      # durable across app crashes, fsync only at checkpoint
+        "busy_timeout": 15000,
+        "cache_size":   -65536,        # ~64 MB
+        "mmap_size":    268435456,     # 256 MB
+        "temp_store":   "MEMORY",
+    },
+    "test": {
+        "journal_mode": "WAL",
+        "synchronous":  "OFF",
+        "busy_timeout": 5000,
+        "cache_size":   -8000,
+        "mmap_size":    0,
+        "temp_store":   "MEMORY",
+    },
+}
 
-def get_db():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA foreign_keys = ON")
-    return conn
+def storage_profile(name=None):
+    name = name or os.environ.get("IRONLOG_ENV", "development")
+    if name not in STORAGE_PROFILES:
+        raise ValueError(f"Unknown storage profile {name!r}")
+    return dict(STORAGE_PROFILES[name])
 
-def init_db():
-    conn = get_db()
-    conn.executescript("""
-        CREATE TABLE IF NOT EXISTS user (
-            id            INTEGER PRIMARY KEY AUTOINCREMENT,
-            username      TEXT    NOT NULL UNIQUE,
-            email         TEXT    NOT NULL UNIQUE,
-            password_hash TEXT    NOT NULL,
-            created_at    DATETIME NOT NULL DEFAULT (datetime('now'))
-        );
-
-        CREATE TABLE IF NOT EXISTS body_weight (
-            id          INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id     INTEGER NOT NULL REFERENCES user(id) ON DELETE CASCADE,
-            logged_at   DATE    NOT NULL DEFAULT (date('now')),
-            weight_kg   REAL    NOT NULL,
-            notes       TEXT
-        );
-
-        -- Unique constraint on (name, user_id, is_global) prevents duplicates.
-        -- Global exercises have user_id=NULL and is_global=1.
-        -- User exercises have user_id=<id> and is_global=0.
-        CREATE TABLE IF NOT EXISTS exercise (
-            id           INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id      INTEGER REFERENCES user(id) ON DELETE CASCADE,
-            name         TEXT    NOT NULL,
-            muscle_group TEXT,
-            equipment    TEXT,
-            is_global    INTEGER NOT NULL DEFAULT 0,
-            UNIQUE(name, is_global, user_id)
-        );
-
-        CREATE TABLE IF NOT EXISTS workout_session (
-            id              INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id         INTEGER NOT NULL REFERENCES user(id) ON DELETE CASCADE,
-            session_date    DATE    NOT NULL DEFAULT (date('now')),
-            started_at      DATETIME NOT NULL DEFAULT (datetime('now')),
-            ended_at        DATETIME,
-            calories_burned REAL,
-            template_id     INTEGER REFERENCES session_template(id) ON DELETE SET NULL,
-            notes           TEXT
-        );
-
-        CREATE TABLE IF NOT EXISTS workout_set (
-            id           INTEGER PRIMARY KEY AUTOINCREMENT,
-            session_id   INTEGER NOT NULL REFERENCES workout_session(id) ON DELETE CASCADE,
-            exercise_id  INTEGER NOT NULL REFERENCES exercise(id),
-            set_number   INTEGER NOT NULL,
-            reps         INTEGER,
-            weight_kg    REAL,
-            rest_seconds INTEGER,
-            rpe          REAL,
-            notes        TEXT,
-            logged_at    DATETIME NOT NULL DEFAULT (datetime('now'))
-        );
-
-        CREATE TABLE IF NOT EXISTS cardio_log (
-            id              INTEGER PRIMARY KEY AUTOINCREMENT,
-            session_id      INTEGER NOT NULL REFERENCES workout_session(id) ON DELETE CASCADE,
-            user_id         INTEGER NOT NULL REFERENCES user(id) ON DELETE CASCADE,
-            activity_type   TEXT    NOT NULL,
-            distance_km     REAL,
-            duration_min    REAL,
-            avg_pace_min_km REAL,
-            avg_heart_rate  INTEGER,
-            elevation_m     REAL,
-            notes           TEXT,
-            logged_at       DATETIME NOT NULL DEFAULT (datetime('now'))
-        );
-
-        -- Session templates
-        CREATE TABLE IF NOT EXISTS session_template (
-            id         INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id    INTEGER NOT NULL REFERENCES user(id) ON DELETE CASCADE,
-            name       TEXT    NOT NULL,
-            notes      TEXT,
-            created_at DATETIME NOT NULL DEFAULT (datetime('now'))
-        );
-
-        -- Exercises inside a template (ordered)
-        CREATE TABLE IF NOT EXISTS template_exercise (
-            id              INTEGER PRIMARY KEY AUTOINCREMENT,
-            template_id     INTEGER NOT NULL REFERENCES session_template(id) ON DELETE CASCADE,
-            exercise_id     INTEGER NOT NULL REFERENCES exercise(id),
-            sort_order      INTEGER NOT NULL DEFAULT 0,
-            target_sets     INTEGER,
-            target_reps     INTEGER,
-            target_weight_kg REAL
-        );
-
-        -- Cardio inside a template
-        CREATE TABLE IF NOT EXISTS template_cardio (
-            id                   INTEGER PRIMARY KEY AUTOINCREMENT,
-            template_id          INTEGER NOT NULL REFERENCES session_template(id) ON DELETE CASCADE,
-            activity_type        TEXT    NOT NULL,
-            target_distance_km   REAL,
-            target_duration_min  REAL
-        );
-    """)
-
-    # ── Seed global exercises safely (no duplicates ever) ──────────────────
-    # Delete exact duplicate globals (name appears more than once with is_global=1)
-    conn.execute("""
-        DELETE FROM exercise
-        WHERE is_global = 1
-          AND id NOT IN (
-              SELECT MIN(id) FROM exercise
-              WHERE is_global = 1
-              GROUP BY LOWER(name)
-          )
-    """)
-
-    # Insert any missing globals
-    for name, muscle, equip in GLOBAL_EXERCISES:
-        conn.execute("""
-            INSERT INTO exercise (name, muscle_group, equipment, is_global, user_id)
-            SELECT ?, ?, ?, 1, NULL
-            WHERE NOT EXISTS (
-                SELECT 1 FROM exercise
-                WHERE LOWER(name) = LOWER(?) AND is_global = 1
-            )
-        """, (name, muscle, equip, name))
-
-    # ── Safe column migrations ─────────────────────────────────────────────
-    for table, col, typ in [
-        ("workout_session", "calories_burned", "REAL"),
-        ("workout_session", "ended_at",        "DATETIME"),
-        ("workout_session", "template_id",     "INTEGER"),
-    ]:
+def apply_pragmas(conn, pragmas):
+    for key in ("journal_mode", "synchronous", "busy_timeout",
+                "cache_size", "mmap_size", "temp_store"):
+        if key in pragmas:
+            conn.execute(f"PRAGMA {key} = {pragmas[key]}").fetchall()
+
+def run_maintenance(conn=None):
+    """Fold the WAL back into the main file and let SQLite refresh its planner
+    statistics. Cheap enough to run every few minutes; the job runner queues it
+    as the db_maintenance job every DB_MAINTENANCE_INTERVAL seconds."""
+    own = conn is None
+    conn = conn or get_db()
+    try:
+        busy, log_frames, checkpointed = conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+        conn.execute("PRAGMA optimize")
+        return {"busy": busy, "log_frames": log_frames, "checkpointed": checkpointed}
+    finally:
+        if own:
+            conn.close()
+
+
+
+# ── Connection pool ───────────────────────────────────────────────────────────
+# Connections are opened once and handed out again on later requests instead of
+# paying sqlite3.connect() + PRAGMA setup per hit. Inside a Flask app context a
+# request borrows one connection (kept on `g`) and the teardown hook returns it;
+# route code can keep calling conn.close() — for request-scoped connections that
+# is a no-op, the borrow ends at teardown.
+
+class PoolTimeout(Exception):
+    pass
+
+
+_cursor_factory = None
+
+def set_cursor_factory(factory):
+    """Wrap every cursor handed out by get_db(), e.g. metrics.TimedCursor; None unwraps."""
+    global _cursor_factory
+    _cursor_factory = factory
+
+
+class PooledConnection:
+    """Proxy around a pooled sqlite3 connection; close() hands it back."""
+
+    def __init__(self, pool, conn, scoped=False):
+        self._pool   = pool
+        self._conn   = conn
+        self._scoped = scoped
+
+    def __getattr__(self, name):
+        if self._conn is None:
+            raise sqlite3.ProgrammingError("Cannot operate on a released connection.")
+        return getattr(self._conn, name)
+
+    def cursor(self):
+        cur = self.__getattr__("cursor")()
+        return cur if _cursor_factory is None else _cursor_factory(cur)
+
+    def execute(self, sql, *args):
+        return self.cursor().execute(sql, *args)
+
+    def executemany(self, sql, *args):
+        return self.cursor().executemany(sql, *args)
+
+    def __enter__(self):
+        self.__getattr__("__enter__")()
+        return self      # not the raw connection, so its statements keep the cursor factory
+
+    def __exit__(self, *exc):
+        return self._conn.__exit__(*exc)
+
+    def close(self):
+        if not self._scoped:
+            self.release()
+
+    def release(self):
+        if self._conn is not None:
+            self._pool.release(self._conn)
+            self._conn = None
+
+
+class ConnectionPool:
+    def __init__(self, path, size=8, timeout=10.0, health_check_interval=30.0, pragmas=None):
+        self.path    = path
+        self.pragmas = pragmas if pragmas is not None else storage_profile()
+        self.size    = size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self._idle    = []               # (conn, last_used) — LIFO keeps hot connections warm
+        self._created = 0
+        self._cond    = threading.Condition()
+        self.stats    = {"hits": 0, "misses": 0, "waits": 0, "wait_time": 0.0,
+                         "timeouts": 0, "health_failures": 0, "opened": 0, "closed": 0}
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA foreign_keys = ON")
+        apply_pragmas(conn, self.pragmas)
+        self.stats["opened"] += 1
+        return conn
+
+    def _discard(self, conn):
         try:
-            conn.execute(f"ALTER TABLE {table} ADD COLUMN {col} {typ}")
-        except Exception:
+            conn.close()
+        except sqlite3.Error:
             pass
+        with self._cond:
+            self._created -= 1
+            self.stats["closed"] += 1
+            self._cond.notify()
+
+    def _healthy(self, conn, last_used):
+        if time.monotonic() - last_used < self.health_check_interval:
+            return True
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            self.stats["health_failures"] += 1
+            return False
+
+    def acquire(self):
+        started  = time.monotonic()
+        deadline = started + self.timeout
+        waited   = False
+        with self._cond:
+            while True:
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    break
+                if self._created < self.size:
+                    self._created += 1
+                    conn = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.stats["timeouts"] += 1
+                    raise PoolTimeout(f"No database connection free after {self.timeout}s")
+                waited = True
+                self._cond.wait(remaining)
+            if waited:
+                self.stats["waits"] += 1
+                self.stats["wait_time"] += time.monotonic() - started
+
+        if conn is not None and self._healthy(conn, last_used):
+            with self._cond:
+                self.stats["hits"] += 1
+            return conn
+        if conn is not None:
+            self._discard(conn)
+            with self._cond:
+                self._created += 1
+        with self._cond:
+            self.stats["misses"] += 1
+        try:
+            return self._connect()
+        except Exception:
+            with self._cond:
+                self._created -= 1
+                self._cond.notify()
+            raise
+
+    def release(self, conn):
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self._discard(conn)
+            return
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def close_all(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._discard(conn)
+
+    def snapshot(self):
+        with self._cond:
+            return dict(self.stats, size=self.size, open=self._created, idle=len(self._idle))
+
 
-    conn.commit()
-    conn.close()
+_pool      = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(DB_PATH)
+    return _pool
+
+def configure_pool(**options):
+    """(Re)build the pool, e.g. configure_pool(size=16, timeout=5)."""
+    global _pool
+    with _pool_lock:
+        old, _pool = _pool, ConnectionPool(options.pop("path", DB_PATH), **options)
+    if old is not None:
+        old.close_all()
+    return _pool
+
+def pool_stats():
+    return get_pool().snapshot()
+
+def get_db():
+    """Return a connection. Inside an app context the same pooled connection is
+    reused for the whole request and given back at teardown."""
+    if has_app_context():
+        if "db" not in g:
+            g.db = PooledConnection(get_pool(), get_pool().acquire(), scoped=True)
+        return g.db
+    return PooledConnection(get_pool(), get_pool().acquire())
+
+def _release_db(exc=None):
+    conn = g.pop("db", None)
+    if conn is not None:
+        conn.release()
+
+def release_db():
+    """Hand the request's connection back before slow work that needs no
+    database (password hashing); a later get_db() borrows a fresh one."""
+    _release_db()
+
+def init_app(app):
+    app.config.setdefault("DB_POOL_SIZE", 8)
+    app.config.setdefault("DB_POOL_TIMEOUT", 10.0)
+    app.config.setdefault("DB_POOL_HEALTH_CHECK_INTERVAL", 30.0)
+    app.config.setdefault("DB_PROFILE", os.environ.get("IRONLOG_ENV", "development"))
+    app.config.setdefault("DB_MAINTENANCE_INTERVAL", 300)   # seconds, 0 disables
+    configure_pool(size=app.config["DB_POOL_SIZE"],
+                   timeout=app.config["DB_POOL_TIMEOUT"],
+                   health_check_interval=app.config["DB_POOL_HEALTH_CHECK_INTERVAL"],
+                   pragmas=storage_profile(app.config["DB_PROFILE"]))
+    app.teardown_appcontext(_release_db)
+
+# ── Schema ────────────────────────────────────────────────────────────────────
+# The schema lives in migrations.py as ordered steps tracked in PRAGMA
+# user_version. init_db() applies whatever is pending. migrate() is the boot
+# path for servers: once the schema is current, it only reads user_version.
+def init_db():
+    from migrations import upgrade
+    return upgrade()
+
+def migrate():
+    """Apply pending migrations if the database is behind this code. Returns
+    True if any ran. Safe to call from every worker; see migrations.upgrade()."""
+    from migrations import latest_version
+    conn = get_db()
+    try:
+        current = conn.execute("PRAGMA user_version").fetchone()[0]
+    finally:
+        conn.close()
+    if current == latest_version():
+        return False
+    return bool(init_db())
@@ -0,0 +1,234 @@
+"""Seeded synthetic training data for load testing: `flask data generate`.
+
+Each generated user trains for `years` up to `end`. They rotate through
+three or four templates (or `templates` of them, to load the template
+screens), and their working weights climb with noise. About a
+third of sessions add cardio. There is a body-weight entry every few days and
+a couple of custom exercises. The total set count is the size knob: users
+default to one per SETS_PER_USER, so a user's history is about the same at
+every scale and only the tables around them grow. SCALES names the sizes
+bench.py runs at.
+
+Every user draws from its own random.Random(f"{seed}:{n}"), so the same seed,
+end date and sizes give the same rows. The exception is password hashes,
+which carry a random salt. Rows are inserted with explicit ids in
+FLUSH_SETS-sized transactions, and the aggregates are rebuilt set-based at
+the end rather than session by session.
+"""
+import math, random, time
+from datetime import date, datetime, timedelta
+import click
+from flask.cli import AppGroup
+from werkzeug.security import generate_password_hash
+from aggregates import rebuild_rollups, rebuild_summaries, rebuild_template_snapshots
+
+SCALES = {"10k": 10_000, "1m": 1_000_000, "10m": 10_000_000}
+SETS_PER_USER = 10_000      # ~3 years at 3-4 sessions a week
+PASSWORD = "benchmark"      # every generated user's password
+FLUSH_SETS = 200_000        # sets buffered per insert transaction
+CARDIO_SHARE = 0.3
+ACTIVITIES = ("running", "cycling", "rowing", "walking")
+TEMPLATE_NAMES = ("Push", "Pull", "Legs", "Upper", "Lower", "Full Body")
+CUSTOM_EXERCISES = [
+    ("Landmine Press", "Shoulders", "Barbell"), ("Zercher Squat", "Legs", "Barbell"),
+    ("Meadows Row", "Back", "Barbell"), ("Pallof Press", "Core", "Cable"),
+    ("Kettlebell Swing", "Hamstrings", "Kettlebell"), ("Sled Push", "Legs", "Machine"),
+]
+
+TABLES = ("user", "exercise", "session_template", "template_exercise", "template_cardio",
+          "workout_session", "workout_set", "cardio_log", "body_weight")
+INSERTS = {
+    "user":              "INSERT INTO user (id, username, email, password_hash, created_at) VALUES (?,?,?,?,?)",
+    "exercise":          "INSERT INTO exercise (id, user_id, name, muscle_group, equipment, is_global) "
+                         "VALUES (?,?,?,?,?,0)",
+    "session_template":  "INSERT INTO session_template (id, user_id, name, notes, created_at) VALUES (?,?,?,?,?)",
+    "template_exercise": "INSERT INTO template_exercise (template_id, exercise_id, sort_order, "
+                         "target_sets, target_reps, target_weight_kg) VALUES (?,?,?,?,?,?)",
+    "template_cardio":   "INSERT INTO template_cardio (template_id, activity_type, target_distance_km, "
+                         "target_duration_min) VALUES (?,?,?,?)",
+    "workout_session":   "INSERT INTO workout_session (id, user_id, session_date, started_at, ended_at, "
+                         "calories_burned, template_id, notes) VALUES (?,?,?,?,?,?,?,?)",
+    "workout_set":       "INSERT INTO workout_set (session_id, exercise_id, set_number, reps, weight_kg, "
+                         "rest_seconds, rpe, logged_at) VALUES (?,?,?,?,?,?,?,?)",
+    "cardio_log":        "INSERT INTO cardio_log (session_id, user_id, activity_type, distance_km, duration_min, "
+                         "avg_pace_min_km, avg_heart_rate, elevation_m, logged_at) VALUES (?,?,?,?,?,?,?,?,?)",
+    "body_weight":       "INSERT INTO body_weight (user_id, logged_at, weight_kg) VALUES (?,?,?)",
+}
+
+
+def _stamp(dt):
+    return dt.strftime("%Y-%m-%d %H:%M:%S")
+
+def _plate(kg):
+    return round(kg / 2.5) * 2.5
+
+
+class _Ids:
+    """Next free id per table, so rows can reference each other before insert."""
+    def __init__(self, conn):
+        self.next = {t: conn.execute(f"SELECT COALESCE(MAX(id), 0) + 1 FROM {t}").fetchone()[0]
+                     for t in ("user", "exercise", "session_template", "workout_session")}
+
+    def take(self, table):
+        self.next[table] += 1
+        return self.next[table] - 1
+
+
+def _template_names(rng, n_templates):
+    if n_templates is None:
+        return rng.sample(TEMPLATE_NAMES, rng.randint(3, 4))
+    return [f"{TEMPLATE_NAMES[i % len(TEMPLATE_NAMES)]} {i // len(TEMPLATE_NAMES) + 1}" for i in range(n_templates)]
+
+def _user_rows(rng, n, uid, sets, years, end, ids, globals_, pw_hash, prefix, out, n_templates=None):
+    """Append one user's rows to `out` ({table: [row, ...]}); returns sets written."""
+    start = end - timedelta(days=round(365.25 * years))
+    joined = _stamp(datetime.combine(start, datetime.min.time()))
+    out["user"].append((uid, f"{prefix}{n}", f"{prefix}{n}@example.com", pw_hash, joined))
+
+    pool = [(e["id"], e["equipment"]) for e in globals_]
+    for name, muscle, equipment in rng.sample(CUSTOM_EXERCISES, 2):
+        eid = ids.take("exercise")
+        out["exercise"].append((eid, uid, name, muscle, equipment))
+        pool.append((eid, equipment))
+    base = {eid: None if equip == "Bodyweight" else _plate(rng.uniform(20, 120)) for eid, equip in pool}
+
+    templates = []
+    for name in _template_names(rng, n_templates):
+        tid = ids.take("session_template")
+        out["session_template"].append((tid, uid, name, "", joined))
+        plan = [(eid, rng.randint(3, 5), rng.choice((5, 8, 10, 12)))
+                for eid, _ in rng.sample(pool, rng.randint(4, 6))]
+        for i, (eid, n_sets, reps) in enumerate(plan):
+            out["template_exercise"].append((tid, eid, i, n_sets, reps, base[eid]))
+        cardio = rng.random() < CARDIO_SHARE
+        if cardio:
+            out["template_cardio"].append((tid, rng.choice(ACTIVITIES), 5.0, 30.0))
+        templates.append((tid, plan, cardio))
+
+    per_session = sum(n for _, plan, _ in templates for _, n, _ in plan) / len(templates)
+    n_sessions = max(1, math.ceil(sets / per_session))      # estimate; spaces the sessions out
+    span = (end - start).days
+    written = k = 0
+    while written < sets:
+        tid, plan, cardio = templates[k % len(templates)]
+        progress = min(1, k / n_sessions)
+        day = start + timedelta(days=min(span, int(k * span / n_sessions + rng.random() * 2)))
+        began = datetime.combine(day, datetime.min.time()) + timedelta(minutes=rng.randint(6 * 60, 20 * 60))
+        sid = ids.take("workout_session")
+        at = began
+        for eid, n_sets, reps in plan:
+            for s in range(1, n_sets + rng.choice((-1, 0, 0, 1)) + 1):
+                if written == sets:
+                    break
+                weight = base[eid] and _plate(base[eid] * (1 + 0.35 * progress) * rng.uniform(0.95, 1.05))
+                rest = rng.randint(60, 180)
+                at += timedelta(seconds=rest + 40)
+                rpe = rng.choice((None, 6, 7, 7.5, 8, 8.5, 9, 9.5, 10))
+                out["workout_set"].append((sid, eid, s, max(1, reps + rng.randint(-2, 2)),
+                                           weight, rest, rpe, _stamp(at)))
+                written += 1
+        if cardio or rng.random() < CARDIO_SHARE / 2:
+            km = round(rng.uniform(2, 12), 2)
+            minutes = round(km * rng.uniform(4.5, 7), 1)
+            at += timedelta(minutes=minutes)
+            out["cardio_log"].append((sid, uid, rng.choice(ACTIVITIES), km, minutes, round(minutes / km, 2),
+                                      rng.randint(120, 170), round(rng.uniform(0, 150)), _stamp(at)))
+        out["workout_session"].append((sid, uid, day.isoformat(), _stamp(began),
+                                       _stamp(at + timedelta(minutes=5)), rng.randint(250, 650), tid, ""))
+        k += 1
+
+    weight = rng.uniform(60, 100)
+    day = start
+    while day <= end:
+        weight += rng.gauss(0, 0.3)
+        out["body_weight"].append((uid, day.isoformat(), round(weight, 1)))
+        day += timedelta(days=rng.randint(2, 4))
+    return written
+
+
+def _flush(conn, out):
+    conn.execute("BEGIN")
+    for table in TABLES:
+        if out[table]:
+            conn.executemany(INSERTS[table], out[table])
+            out[table].clear()
+    conn.execute("COMMIT")
+
+
+def generate(conn, sets, users=None, years=3, seed=0, end=None, prefix="bench", report=None, templates=None):
+    """Add `users` users sharing `sets` sets between them to a migrated database
+    opened with migrations.connect() (autocommit). `templates` fixes how many
+    templates each user rotates through. Returns {table: rows added}."""
+    users = users or max(1, round(sets / SETS_PER_USER))
+    end = end or date.today()
+    if conn.execute("SELECT 1 FROM user WHERE username=?", (f"{prefix}0",)).fetchone():
+        raise ValueError(f"users named {prefix}0.. already exist; pick another prefix")
+    before = {t: conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0] for t in TABLES}
+    globals_ = conn.execute("SELECT id, equipment FROM exercise WHERE is_global=1 ORDER BY id").fetchall()
+    pw_hash = generate_password_hash(PASSWORD)
+    ids = _Ids(conn)
+    out = {t: [] for t in TABLES}
+    conn.execute("PRAGMA synchronous = OFF")        # a failed load is thrown away, not recovered
+    written = 0
+    for n in range(users):
+        quota = sets // users + (n < sets % users)
+        rng = random.Random(f"{seed}:{n}")
+        written += _user_rows(rng, n, ids.take("user"), quota, years, end, ids, globals_, pw_hash, prefix, out,
+                              templates)
+        if len(out["workout_set"]) >= FLUSH_SETS or n == users - 1:
+            _flush(conn, out)
+            if report:
+                report(f"{n + 1}/{users} users, {written:,} sets")
+    if report:
+        report("rebuilding aggregates")
+    conn.execute("BEGIN")
+    rebuild_summaries(conn)
+    rebuild_rollups(conn)
+    rebuild_template_snapshots(conn)
+    conn.execute("COMMIT")
+    conn.execute("ANALYZE")
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    return {t: conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0] - before[t] for t in TABLES}
+
+
+def generate_file(path, sets, report=None, **options):
+    """Migrate (or create) the database at `path` and fill it."""
+    from migrations import connect, upgrade
+    upgrade(path)
+    conn = connect(path)
+    try:
+        return generate(conn, sets, report=report, **options)
+    finally:
+        conn.close()
+
+
+# ── CLI ───────────────────────────────────────────────────────────────────────
+data_cli = AppGroup("data", help="Generate synthetic data for load testing.")
+
+@data_cli.command("generate")
+@click.option("--scale", type=click.Choice(list(SCALES)), default=None, help="Named size (total sets).")
+@click.option("--sets", type=int, default=None, help="Total sets, if not using --scale.")
+@click.option("--users", type=int, default=None, help=f"Default: one per {SETS_PER_USER:,} sets.")
+@click.option("--years", type=float, default=3, show_default=True)
+@click.option("--seed", type=int, default=0, show_default=True)
+@click.option("--end", type=click.DateTime(["%Y-%m-%d"]), default=None, help="Last training day (default: today).")
+@click.option("--prefix", default="bench", show_default=True, help="Usernames are <prefix>0, <prefix>1, ...")
+@click.option("--templates", type=click.IntRange(1), default=None,
+              help="Templates per user, all in rotation (default: 3 or 4).")
+@click.option("--db", "path", default=None, help="Database file (default: the app's database).")
+def generate_command(scale, sets, users, years, seed, end, prefix, templates, path):
+    """Fill the database with seeded users, sessions, sets, cardio and body weight."""
+    from database import get_pool
+    if (scale is None) == (sets is None):
+        raise click.UsageError("Give exactly one of --scale and --sets.")
+    started = time.perf_counter()
+    try:
+        added = generate_file(path or get_pool().path, SCALES.get(scale, sets), users=users, years=years,
+                              seed=seed, end=end and end.date(), prefix=prefix, templates=templates,
+                              report=click.echo)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    for table, n in added.items():
+        click.echo(f"  {table:<18} {n:>12,}")
+    click.echo(f"Generated in {time.perf_counter() - started:.1f}s; log in as {prefix}0 / {PASSWORD}.")
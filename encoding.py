@@ -0,0 +1,155 @@
+"""Compact encodings for large JSON payloads.
+
+- ?format=columnar on the analytics endpoints turns every list of same-keyed
+  objects into {"columns": [...], "rows": [[...], ...]}, so key names are
+  sent once per list instead of once per row. The default stays rows, so
+  existing clients see no change. The response cache keys on the query
+  string, so each format is cached on its own.
+- With orjson installed, app.json serializes through it: several times
+  faster than the stdlib encoder and bytes out directly. Without it, Flask's
+  default provider is used unchanged.
+- Responses of COMPRESS_MIN_SIZE bytes or more are compressed. The client's
+  Accept-Encoding picks the coding: br if the brotli package is installed,
+  otherwise gzip. A compressed response's ETag is made weak, because the
+  bytes now differ per coding, and conditional GETs compare weakly.
+
+The same compress() runs for the async views in aio.py.
+"""
+import gzip
+from operator import itemgetter
+from flask import request
+from flask.json.provider import DefaultJSONProvider
+from metrics import Counter, register
+
+try:
+    import orjson
+except ImportError:   # the stdlib encoder is the fallback
+    orjson = None
+try:
+    import brotli
+except ImportError:   # gzip only
+    brotli = None
+
+FORMATS = ("rows", "columnar")
+COMPRESS_MIMETYPES = {"application/json", "application/x-ndjson", "text/html", "text/plain", "text/csv"}
+
+compressed = register(Counter(
+    "ironlog_compressed_bytes_total", "Response bytes before and after compression.", ("encoding", "stage")))
+
+
+# ── Columnar ──────────────────────────────────────────────────────────────────
+def columnar(value):
+    """`value` with every non-empty list of same-keyed dicts, at any depth,
+    replaced by {"columns": [...], "rows": [[...], ...]}. Row values are sent
+    as they are, not descended into."""
+    if isinstance(value, dict):
+        return {k: columnar(v) for k, v in value.items()}
+    if isinstance(value, list) and value:
+        first = value[0]
+        if isinstance(first, dict):
+            keys = first.keys()
+            if all(type(v) is dict and v.keys() == keys for v in value):
+                columns = list(first)
+                if len(columns) == 1:
+                    return {"columns": columns, "rows": [[v[columns[0]]] for v in value]}
+                return {"columns": columns, "rows": list(map(itemgetter(*columns), value))}
+        return [columnar(v) for v in value]
+    return value
+
+def response_format(args):
+    """The requested format, or None if ?format= names an unknown one."""
+    fmt = args.get("format", "rows")
+    return fmt if fmt in FORMATS else None
+
+def shape(data, fmt):
+    return columnar(data) if fmt == "columnar" else data
+
+
+# ── JSON provider ─────────────────────────────────────────────────────────────
+class FastJSONProvider(DefaultJSONProvider):
+    """DefaultJSONProvider with orjson doing the compact encoding. Dates and
+    anything else orjson doesn't know go through Flask's default(), so the
+    output matches the stdlib path; indented output is left to it too."""
+
+    def _options(self):
+        options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+        return options | orjson.OPT_SORT_KEYS if self.sort_keys else options
+
+    def dumps(self, obj, **kwargs):
+        if kwargs.keys() - {"separators"}:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self._options()).decode()
+
+    def loads(self, s, **kwargs):
+        return super().loads(s, **kwargs) if kwargs else orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if self.compact is False or (self.compact is None and self._app.debug):
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=self.default, option=self._options())
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+# ── Compression ───────────────────────────────────────────────────────────────
+def _accepted(header):
+    """{coding: q} from an Accept-Encoding header."""
+    codings = {}
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            name, _, v = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(v)
+                except ValueError:
+                    q = 0.0
+        if coding:
+            codings[coding.strip().lower()] = q
+    return codings
+
+def choose_encoding(header):
+    accepted = _accepted(header or "")
+    for coding in (("br", "gzip") if brotli else ("gzip",)):
+        if accepted.get(coding, accepted.get("*", 0)) > 0:
+            return coding
+    return None
+
+def compress(body, coding, config):
+    out = (brotli.compress(body, quality=config["COMPRESS_BROTLI_QUALITY"]) if coding == "br"
+           else gzip.compress(body, config["COMPRESS_LEVEL"], mtime=0))
+    compressed.inc((coding, "in"), len(body))
+    compressed.inc((coding, "out"), len(out))
+    return out
+
+def should_compress(status, mimetype, size, config):
+    return (config["COMPRESS_ENABLED"] and status == 200 and mimetype in COMPRESS_MIMETYPES
+            and size >= config["COMPRESS_MIN_SIZE"])
+
+
+def init_encoding(app):
+    app.config.setdefault("JSON_FAST", True)                # orjson when it's installed
+    app.config.setdefault("COMPRESS_ENABLED", True)
+    app.config.setdefault("COMPRESS_MIN_SIZE", 1024)        # bytes; smaller bodies fit a packet anyway
+    app.config.setdefault("COMPRESS_LEVEL", 6)              # gzip
+    app.config.setdefault("COMPRESS_BROTLI_QUALITY", 4)     # 0-11; 4 is near gzip -6 cost, smaller output
+    if app.config["JSON_FAST"] and orjson is not None:
+        app.json = FastJSONProvider(app)
+
+    @app.after_request
+    def _compress(resp):
+        resp.vary.add("Accept-Encoding")
+        if (resp.direct_passthrough or resp.is_streamed or "Content-Encoding" in resp.headers
+                or not should_compress(resp.status_code, resp.mimetype, resp.content_length or 0, app.config)):
+            return resp
+        coding = choose_encoding(request.headers.get("Accept-Encoding"))
+        if coding is None:
+            return resp
+        resp.set_data(compress(resp.get_data(), coding, app.config))
+        resp.headers["Content-Encoding"] = coding
+        etag, weak = resp.get_etag()
+        if etag and not weak:
+            resp.set_etag(etag, weak=True)
+        return resp
+
@@ -0,0 +1,35 @@
+"""gunicorn settings: `gunicorn -c gunicorn.conf.py wsgi:application`.
+
+For the ASGI entry point use `gunicorn -c gunicorn.conf.py -k uvicorn.workers.UvicornWorker asgi:application`.
+Bind address and process/thread counts come from the environment.
+"""
+import logging, multiprocessing, os
+
+bind = os.environ.get("IRONLOG_BIND", "0.0.0.0:8000")
+
+# SQLite takes one writer at a time, so extra processes mostly buy read
+# parallelism; threads cover requests waiting on I/O or the write lock.
+workers = int(os.environ.get("WEB_CONCURRENCY", min(multiprocessing.cpu_count(), 4)))
+worker_class = "gthread"
+threads = int(os.environ.get("IRONLOG_THREADS", 4))
+
+# Exports and imports stream for a while; keep this above their slowest chunk
+timeout = 60
+graceful_timeout = 30
+keepalive = 5
+
+# wsgi.py starts the job runner (which also schedules WAL checkpoints), so each
+# worker imports it after the fork rather than inheriting the master's copy.
+# Worker recycling (max_requests) stays off: it would cut running jobs short.
+preload_app = False
+
+accesslog = "-"
+loglevel = os.environ.get("IRONLOG_LOG_LEVEL", "info")
+
+
+def post_fork(server, worker):
+    # The app's "ironlog.*" loggers (cold-start timings, ...) write to gunicorn's error log
+    log = logging.getLogger("ironlog")
+    log.handlers = list(server.log.error_log.handlers)
+    log.setLevel(server.log.error_log.level)
+    log.propagate = False
@@ -0,0 +1,234 @@
+"""Bulk import of historical training logs (CSV or NDJSON).
+
+The upload is spooled to a temp file by the route and parsed here by an
+"import" job on the background runner (jobs.py), one row at a time. Rows are
+grouped into sessions by (date, session label) and written with executemany()
+in IMPORT_CHUNK-row transactions. Exercise names resolve through the user's
+catalog (catalog.py), whose ASCII-only case folding matches SQLite's LOWER(),
+so an import matches exactly what add_exercise's duplicate check would;
+unknown names become custom exercises. Nothing derived is refreshed per
+session: at the end, the user's summaries, rollups (training load included)
+and template snapshots are each rebuilt once with set-based statements, so
+the cost grows with the user's rows, not with rows times sessions.
+
+Column names are matched case-insensitively and a few common aliases from
+other trackers ("Exercise Name", "Set Order", "Weight", "Workout Name") are
+accepted. A row with an exercise is a set; a row with an activity_type is
+cardio.
+"""
+import csv, json, math, os, time
+from datetime import date
+from aggregates import rebuild_rollups, rebuild_summaries, rebuild_template_snapshots
+from cache import bump_data_version
+from catalog import bump_catalog_version, fold, get_catalog
+from database import get_db
+from jobs import task
+
+IMPORT_CHUNK = 5000
+MAX_ERRORS = 100
+
+FIELD_ALIASES = {
+    "date": "date", "session_date": "date", "workout date": "date",
+    "session": "session", "workout name": "session", "workout": "session",
+    "exercise": "exercise", "exercise name": "exercise", "exercise_name": "exercise",
+    "muscle_group": "muscle_group", "muscle group": "muscle_group",
+    "set_number": "set_number", "set order": "set_number", "set": "set_number",
+    "reps": "reps", "weight_kg": "weight_kg", "weight": "weight_kg",
+    "rpe": "rpe", "rest_seconds": "rest_seconds", "notes": "notes",
+    "activity_type": "activity_type", "activity": "activity_type",
+    "distance_km": "distance_km", "distance": "distance_km",
+    "duration_min": "duration_min", "avg_heart_rate": "avg_heart_rate",
+    "heart_rate": "avg_heart_rate", "elevation_m": "elevation_m",
+}
+
+
+class RowError(ValueError):
+    """A row that can't be imported; the job records it and moves on."""
+
+
+# ── Parsing ───────────────────────────────────────────────────────────────────
+def _normalize(raw):
+    out = {}
+    for k, v in raw.items():
+        field = FIELD_ALIASES.get((k or "").strip().lower())
+        if field and v not in (None, ""):
+            out[field] = v.strip() if isinstance(v, str) else v
+    return out
+
+def _lines(f, job):
+    for i, raw in enumerate(f):
+        job.bytes_read += len(raw)
+        line = raw.decode("utf-8")
+        yield line.lstrip("\ufeff") if i == 0 else line
+
+def read_rows(f, fmt, job):
+    """Yield (line number, normalized row dict) from a binary file object."""
+    if fmt == "csv":
+        reader = csv.DictReader(_lines(f, job))
+        for row in reader:
+            yield reader.line_num, _normalize(row)
+    else:
+        for n, line in enumerate(_lines(f, job), 1):
+            if line.strip():
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    yield n, None
+                    continue
+                yield n, _normalize(row) if isinstance(row, dict) else None
+
+def _num(row, key, cast=float):
+    v = row.get(key)
+    if v is None:
+        return None
+    try:
+        n = float(v)
+        if not math.isfinite(n):          # "inf", "nan", "1e400"
+            raise ValueError(v)
+        return cast(n)
+    except (TypeError, ValueError, OverflowError):
+        raise RowError(f"{key} is not a number: {v!r}")
+
+
+# ── Import ────────────────────────────────────────────────────────────────────
+class Importer:
+    def __init__(self, uid, path, fmt, report=None):
+        self.uid, self.path, self.fmt = uid, path, fmt
+        self.report = report or (lambda **progress: None)
+        self.total_bytes = os.path.getsize(path)
+        self.bytes_read = self.rows_read = self.skipped = 0
+        self.sessions = self.sets = self.cardio = self.exercises_created = 0
+        self.errors = []
+        self.started = self.finished = None
+
+    def progress(self):
+        elapsed = ((self.finished or time.time()) - self.started) if self.started else 0
+        return {
+            "format": self.fmt,
+            "progress": round(self.bytes_read / self.total_bytes, 3) if self.total_bytes else 1.0,
+            "rows_read": self.rows_read, "skipped": self.skipped,
+            "sessions": self.sessions, "sets": self.sets, "cardio": self.cardio,
+            "exercises_created": self.exercises_created,
+            "rows_per_sec": round(self.rows_read / elapsed) if elapsed > 0 else None,
+            "errors": self.errors,
+        }
+
+    def error(self, line, msg):
+        self.skipped += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append({"line": line, "error": msg})
+
+    def run(self):
+        self.started = time.time()
+        conn = get_db()
+        try:
+            with open(self.path, "rb") as f:
+                self._import(conn, f)
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            # Chunks committed before a failure stay, so this runs either way.
+            # Derived tables are rebuilt once for the user, not per session.
+            try:
+                rebuild_summaries(conn, self.uid)
+                rebuild_rollups(conn, self.uid)
+                rebuild_template_snapshots(conn, self.uid)
+                bump_data_version(conn, self.uid)
+                conn.commit()
+            finally:
+                conn.close()
+                os.unlink(self.path)
+                self.finished = time.time()
+                self.report(**self.progress())
+        return self.progress()
+
+    def _import(self, conn, f):
+        index = dict(get_catalog(conn, self.uid).by_name)
+        sessions, numbering = {}, {}
+        sets, cardio = [], []
+
+        def flush():
+            if sets:
+                conn.executemany("""
+                    INSERT INTO workout_set
+                        (session_id,exercise_id,set_number,reps,weight_kg,rest_seconds,rpe,notes)
+                    VALUES(?,?,?,?,?,?,?,?)
+                """, sets)
+            if cardio:
+                conn.executemany("""
+                    INSERT INTO cardio_log
+                        (session_id,user_id,activity_type,distance_km,duration_min,
+                         avg_pace_min_km,avg_heart_rate,elevation_m,notes)
+                    VALUES(?,?,?,?,?,?,?,?,?)
+                """, cardio)
+            conn.commit()
+            self.sets += len(sets); self.cardio += len(cardio)
+            sets.clear(); cardio.clear()
+            self.report(**self.progress())
+
+        for line, row in read_rows(f, self.fmt, self):
+            self.rows_read += 1
+            try:
+                if row is None:
+                    raise RowError("not a JSON object")
+                day = str(row.get("date", ""))[:10]
+                try:
+                    date.fromisoformat(day)
+                except ValueError:
+                    raise RowError(f"bad or missing date: {row.get('date')!r}")
+                # Parse everything before writing, so a bad row leaves nothing behind
+                if row.get("exercise"):
+                    values = (_num(row, "set_number", int), _num(row, "reps", int),
+                              _num(row, "weight_kg"), _num(row, "rest_seconds", int),
+                              _num(row, "rpe"), row.get("notes", ""))
+                elif row.get("activity_type"):
+                    dist, dur = _num(row, "distance_km"), _num(row, "duration_min")
+                    pace = round(dur / dist, 2) if dist and dur and dist > 0 else None
+                    values = (row["activity_type"], dist, dur, pace,
+                              _num(row, "avg_heart_rate", int), _num(row, "elevation_m"),
+                              row.get("notes", ""))
+                else:
+                    raise RowError("row has neither an exercise nor an activity_type")
+            except RowError as e:
+                self.error(line, str(e))
+                continue
+
+            key = (day, row.get("session", ""))
+            sid = sessions.get(key)
+            if sid is None:
+                sid = sessions[key] = conn.execute(
+                    "INSERT INTO workout_session (user_id,session_date,started_at,ended_at,notes) "
+                    "VALUES(?,?,?,?,?)",
+                    (self.uid, day, day + " 00:00:00", day + " 00:00:00", row.get("session", ""))
+                ).lastrowid
+                self.sessions += 1
+
+            if row.get("exercise"):
+                name = row["exercise"]
+                ex_id = index.get(fold(name))
+                if ex_id is None:
+                    ex_id = index[fold(name)] = conn.execute(
+                        "INSERT INTO exercise (name,muscle_group,equipment,user_id,is_global) "
+                        "VALUES(?,?,'',?,0)",
+                        (name, row.get("muscle_group", ""), self.uid)
+                    ).lastrowid
+                    self.exercises_created += 1
+                    bump_catalog_version(conn, self.uid)
+                n, rest = values[0], values[1:]
+                last = numbering.get((sid, ex_id), 0)
+                if n is None:
+                    n = last + 1
+                numbering[(sid, ex_id)] = max(n, last)
+                sets.append((sid, ex_id, n, *rest))
+            else:
+                cardio.append((sid, self.uid, *values))
+            if len(sets) + len(cardio) >= IMPORT_CHUNK:
+                flush()
+        flush()
+
+
+# Not retried: chunks already committed would be imported twice
+@task("import", priority=5, max_attempts=1)
+def import_task(ctx):
+    return Importer(ctx.user_id, ctx.payload["path"], ctx.payload["format"], ctx.report).run()
@@ -0,0 +1,328 @@
+"""In-process background jobs backed by the `job` table.
+
+Routes enqueue() work and return at once; a dispatcher thread claims queued
+rows (highest priority first, oldest first within a priority) and runs them on
+a thread pool. Only the serving entry points start it (start_jobs()), so a CLI
+command that imports the app leaves the queue alone. The claim is a single UPDATE … RETURNING, so several processes
+sharing the database never run the same job twice. A user never has more than
+JOBS_PER_USER jobs running; their other jobs wait in the queue without holding
+a worker. A failing job is retried with exponential backoff until it has used
+max_attempts, then marked failed.
+
+Handlers are registered with @task(kind) and receive a JobContext. They open
+their own connections with get_db() and may call ctx.report(...) to publish
+progress, which GET /api/jobs/<id> returns. Threads rather than processes:
+the heavy jobs here are SQLite-bound, and sqlite3 releases the GIL while it
+works.
+"""
+import json, os, socket, sqlite3, threading, time
+from concurrent.futures import ThreadPoolExecutor
+import click
+from flask.cli import AppGroup
+from database import get_db
+
+TASKS = {}
+MAX_BACKOFF = 600        # seconds
+JOB_RETENTION_DAYS = 7
+
+
+class Task:
+    def __init__(self, fn, kind, priority, max_attempts, public):
+        self.fn, self.kind = fn, kind
+        self.priority, self.max_attempts, self.public = priority, max_attempts, public
+
+def task(kind, priority=0, max_attempts=3, public=False):
+    """Register a job handler. `public` tasks may be enqueued by users via
+    POST /api/jobs (always for their own data)."""
+    def deco(fn):
+        TASKS[kind] = Task(fn, kind, priority, max_attempts, public)
+        return fn
+    return deco
+
+
+class JobContext:
+    def __init__(self, row):
+        self.id, self.kind, self.user_id = row["id"], row["kind"], row["user_id"]
+        self.attempt = row["attempts"]
+        self.payload = json.loads(row["payload"] or "{}")
+
+    def report(self, **progress):
+        conn = get_db()
+        try:
+            conn.execute("UPDATE job SET progress=? WHERE id=?", (json.dumps(progress), self.id))
+            conn.commit()
+        finally:
+            conn.close()
+
+
+# ── Queue ─────────────────────────────────────────────────────────────────────
+def enqueue(kind, payload=None, user_id=None, priority=None, max_attempts=None, conn=None):
+    """Queue a job and return its id. Commits on its own connection unless one
+    is passed in, in which case the caller's commit publishes the job."""
+    t = TASKS[kind]
+    own = conn is None
+    conn = conn or get_db()
+    try:
+        job_id = conn.execute(
+            "INSERT INTO job (kind, user_id, payload, priority, max_attempts) VALUES (?,?,?,?,?)",
+            (kind, user_id, json.dumps(payload or {}),
+             t.priority if priority is None else priority,
+             t.max_attempts if max_attempts is None else max_attempts)
+        ).lastrowid
+        if own:
+            conn.commit()
+    finally:
+        if own:
+            conn.close()
+    runner = _runner
+    if runner:
+        runner.wake()
+    return job_id
+
+def pending_jobs(conn, user_id, kinds):
+    """How many of the user's jobs of these kinds are queued or running."""
+    return conn.execute(f"""
+        SELECT COUNT(*) FROM job
+        WHERE user_id=? AND status IN ('queued','running') AND kind IN ({",".join("?" * len(kinds))})
+    """, (user_id, *kinds)).fetchone()[0]
+
+def job_status(conn, job_id, user_id):
+    row = conn.execute("SELECT * FROM job WHERE id=? AND user_id=?", (job_id, user_id)).fetchone()
+    return public_job(row) if row else None
+
+def public_job(row):
+    out = {k: row[k] for k in ("id", "kind", "status", "priority", "attempts", "max_attempts",
+                               "error", "created_at", "started_at", "finished_at")}
+    out["progress"] = json.loads(row["progress"]) if row["progress"] else None
+    out["result"]   = json.loads(row["result"])   if row["result"]   else None
+    return out
+
+
+# ── Runner ────────────────────────────────────────────────────────────────────
+CLAIM = """
+    UPDATE job SET status='running', attempts=attempts+1, worker=?, started_at=datetime('now')
+    WHERE id = (
+        SELECT j.id FROM job j
+        WHERE j.status='queued' AND j.run_after <= datetime('now')
+          AND (j.user_id IS NULL OR (SELECT COUNT(*) FROM job r
+                                     WHERE r.user_id=j.user_id AND r.status='running') < ?)
+        ORDER BY j.priority DESC, j.id
+        LIMIT 1
+    )
+    RETURNING *
+"""
+
+# Queue the next db_maintenance unless one is already waiting or running, so
+# several processes sharing the database keep a single one in flight.
+SCHEDULE = """
+    INSERT INTO job (kind, payload, priority, max_attempts, run_after)
+    SELECT ?, '{}', ?, ?, datetime('now', ?)
+    WHERE NOT EXISTS (SELECT 1 FROM job WHERE kind=? AND status IN ('queued','running'))
+"""
+
+class JobRunner:
+    def __init__(self, workers=2, per_user=1, poll_interval=2.0, maintenance_interval=0):
+        self.workers, self.per_user, self.poll_interval = workers, per_user, poll_interval
+        self.maintenance_interval = maintenance_interval
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._slots = threading.Semaphore(workers)
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._pool = ThreadPoolExecutor(workers, thread_name_prefix="ironlog-job")
+        self._thread = threading.Thread(target=self._dispatch, name="ironlog-jobs", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set(); self._wake.set()
+        self._thread.join()
+        self._pool.shutdown(wait=True)
+
+    def wake(self):
+        self._wake.set()
+
+    def _dispatch(self):
+        housekept, scheduled = False, None
+        while not self._stop.is_set():
+            if not self._slots.acquire(timeout=self.poll_interval):
+                continue
+            try:
+                if not housekept:
+                    self._housekeep()
+                    housekept = True
+                if self.maintenance_interval and (scheduled is None or
+                                                  time.monotonic() - scheduled >= self.maintenance_interval):
+                    self._schedule("db_maintenance", self.maintenance_interval)
+                    scheduled = time.monotonic()
+                row = self._claim()
+            except sqlite3.Error:
+                row = None   # tables not created yet, or the db is busy — retry later
+            if row is None:
+                self._slots.release()
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+                continue
+            self._pool.submit(self._run, row)
+
+    def _claim(self):
+        conn = get_db()
+        try:
+            row = conn.execute(CLAIM, (self.worker_id, self.per_user)).fetchone()
+            conn.commit()
+            return row
+        finally:
+            conn.close()
+
+    def _schedule(self, kind, delay):
+        t = TASKS[kind]
+        conn = get_db()
+        try:
+            conn.execute(SCHEDULE, (kind, t.priority, t.max_attempts, f"+{delay} seconds", kind))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _housekeep(self):
+        """Requeue jobs left 'running' by a dead process on this host and drop
+        old finished jobs."""
+        host = socket.gethostname()
+        conn = get_db()
+        try:
+            for r in conn.execute("SELECT id, worker FROM job WHERE status='running'").fetchall():
+                w_host, _, pid = (r["worker"] or "").rpartition(":")
+                if w_host == host and pid.isdigit() and not _alive(int(pid)):
+                    conn.execute("UPDATE job SET status='queued' WHERE id=?", (r["id"],))
+            conn.execute(
+                "DELETE FROM job WHERE status IN ('done','failed') AND finished_at < datetime('now', ?)",
+                (f"-{JOB_RETENTION_DAYS} days",)
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _run(self, row):
+        try:
+            ctx = JobContext(row)
+            t = TASKS.get(row["kind"])
+            try:
+                if t is None:
+                    raise LookupError(f"No handler for job kind {row['kind']!r}")
+                result = t.fn(ctx)
+            except Exception as e:
+                retry = t is not None and row["attempts"] < row["max_attempts"]
+                self._finish(row["id"], "queued" if retry else "failed", error=f"{type(e).__name__}: {e}",
+                             delay=min(2 ** row["attempts"], MAX_BACKOFF) if retry else 0)
+            else:
+                self._finish(row["id"], "done", result=result)
+        finally:
+            self._slots.release()
+            self._wake.set()
+
+    def _finish(self, job_id, status, result=None, error=None, delay=0):
+        conn = get_db()
+        try:
+            conn.execute("""
+                UPDATE job SET status=?, result=?, error=?,
+                       run_after=datetime('now', ?),
+                       finished_at=CASE WHEN ?='queued' THEN NULL ELSE datetime('now') END
+                WHERE id=?
+            """, (status, json.dumps(result) if result is not None else None, error,
+                  f"+{delay} seconds", status, job_id))
+            conn.commit()
+        finally:
+            conn.close()
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+_runner = None
+
+def init_jobs(app):
+    app.config.setdefault("JOBS_WORKERS", 2)        # 0 disables the runner in this process
+    app.config.setdefault("JOBS_PER_USER", 1)
+    app.config.setdefault("JOBS_POLL_INTERVAL", 2.0)
+    app.config.setdefault("JOBS_MAX_PENDING", 3)    # public jobs a user may have queued or running
+    app.config.setdefault("IMPORTS_MAX_PENDING", 2) # imports, each holding a spooled upload on disk
+    app.extensions["jobs"] = _runner
+
+def start_jobs(app):
+    """Start this process's runner. Only the serving entry points (wsgi.py,
+    asgi.py, `python app.py`) call it, so CLI commands and tests that import
+    the app never run jobs behind their back. The runner also keeps a
+    db_maintenance job queued every DB_MAINTENANCE_INTERVAL seconds."""
+    global _runner
+    if app.config["JOBS_WORKERS"] and _runner is None:
+        _runner = JobRunner(app.config["JOBS_WORKERS"], app.config["JOBS_PER_USER"],
+                            app.config["JOBS_POLL_INTERVAL"],
+                            app.config["DB_MAINTENANCE_INTERVAL"])
+        _runner.start()
+    app.extensions["jobs"] = _runner
+    return _runner
+
+
+# ── Built-in tasks ────────────────────────────────────────────────────────────
+@task("rebuild_aggregates", priority=-1, public=True)
+def rebuild_aggregates_task(ctx):
+    from aggregates import rebuild_rollups, rebuild_summaries, rebuild_template_snapshots
+    conn = get_db()
+    try:
+        n = rebuild_summaries(conn, ctx.user_id)
+        rebuild_rollups(conn, ctx.user_id)
+        rebuild_template_snapshots(conn, ctx.user_id)
+        if ctx.user_id is not None:
+            from cache import bump_data_version
+            bump_data_version(conn, ctx.user_id)
+        conn.commit()
+    finally:
+        conn.close()
+    return {"sessions": n}
+
+@task("db_maintenance", priority=-5)
+def maintenance_task(ctx):
+    from database import run_maintenance
+    return run_maintenance()
+
+@task("db_vacuum", priority=-10, max_attempts=1)
+def vacuum_task(ctx):
+    conn = get_db()
+    try:
+        conn.execute("VACUUM")
+        conn.execute("ANALYZE")
+    finally:
+        conn.close()
+    return {"ok": True}
+
+
+# ── CLI ───────────────────────────────────────────────────────────────────────
+jobs_cli = AppGroup("jobs", help="Queue and inspect background jobs.")
+
+@jobs_cli.command("enqueue")
+@click.argument("kind")
+@click.option("--user-id", type=int, default=None, help="Run the job for this user only.")
+@click.option("--priority", type=int, default=None)
+def enqueue_command(kind, user_id, priority):
+    """Queue a job; a running app server picks it up."""
+    if kind not in TASKS:
+        raise click.BadParameter(f"choose from {', '.join(sorted(TASKS))}", param_hint="KIND")
+    click.echo(f"Queued job {enqueue(kind, user_id=user_id, priority=priority)}.")
+
+@jobs_cli.command("list")
+@click.option("--status", default=None, help="Only jobs with this status.")
+def list_command(status):
+    """Show the most recent jobs."""
+    conn = get_db()
+    rows = conn.execute(
+        "SELECT * FROM job WHERE ? IS NULL OR status=? ORDER BY id DESC LIMIT 50", (status, status)
+    ).fetchall()
+    conn.close()
+    for r in rows:
+        click.echo(f"{r['id']:>6} {r['kind']:<20} {r['status']:<8} user={r['user_id']} "
+                   f"attempts={r['attempts']}/{r['max_attempts']} {r['error'] or ''}")
@@ -0,0 +1,311 @@
+"""Request and SQL instrumentation, exported in Prometheus text format at /metrics.
+
+Recorded per process:
+- ironlog_request_duration_seconds: a latency histogram per endpoint and
+  method, fed by Flask's request hooks and by AsyncDispatcher for async twins.
+- ironlog_responses_total: responses per endpoint and status.
+- ironlog_sql_statement_seconds and ironlog_sql_rows_total: per statement.
+  Statements are normalized, so IN (?,?,…) lists of any length share a
+  series.
+- Connection pool counters (opened, closed, waits, timeouts) and gauges,
+  read from the pool when /metrics is scraped.
+
+SQL timing wraps the cursors that database.get_db() connections hand out. A
+statement's time runs from execute() until its rows have been read, so a slow
+fetch loop is charged to the statement that produced it. sqlite3's trace
+callback only reports statement text, and its progress handler only counts VM
+steps, so neither can give durations.
+
+Under gunicorn every worker keeps its own numbers. Scrape each worker, or
+run a single worker with more threads when the totals matter.
+
+Profiling: with PROFILE_TOKEN set, a request carrying `X-Profile: <token>`
+runs under cProfile. So does a random PROFILE_SAMPLE_RATE fraction of all
+requests. The stats are written to PROFILE_DIR, and the file name comes back
+in the X-Profile response header.
+"""
+import bisect, cProfile, hashlib, hmac, os, random, re, tempfile, threading, time
+from flask import g, request
+import database
+
+REQUEST_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+SQL_BUCKETS     = (.0001, .0005, .001, .0025, .005, .01, .025, .05, .1, .5, 1)
+
+
+# ── Registry ──────────────────────────────────────────────────────────────────
+class Counter:
+    def __init__(self, name, help, labels):
+        self.name, self.help, self.labels = name, help, labels
+        self.kind = "counter"
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, key, amount=1):
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, v in items:
+            yield self.name, dict(zip(self.labels, key)), v
+
+
+class Histogram:
+    def __init__(self, name, help, labels, buckets):
+        self.name, self.help, self.labels, self.buckets = name, help, labels, buckets
+        self.kind = "histogram"
+        self._values = {}           # key -> [per-bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, key, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            v = self._values.get(key)
+            if v is None:
+                v = self._values[key] = [0] * (len(self.buckets) + 2)
+            v[i] += 1
+            v[-1] += value
+
+    def samples(self):
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._values.items()]
+        for key, v in items:
+            labels = dict(zip(self.labels, key))
+            total = 0
+            for bound, n in zip((*self.buckets, "+Inf"), v):
+                total += n
+                yield f"{self.name}_bucket", {**labels, "le": str(bound)}, total
+            yield f"{self.name}_count", labels, total
+            yield f"{self.name}_sum", labels, v[-1]
+
+
+class Gauge:
+    """Read at scrape time from `fn`, which returns {label tuple: value}."""
+    def __init__(self, name, help, labels, fn, kind="gauge"):
+        self.name, self.help, self.labels, self.fn, self.kind = name, help, labels, fn, kind
+
+    def samples(self):
+        for key, v in self.fn().items():
+            yield self.name, dict(zip(self.labels, key)), v
+
+
+METRICS = []
+
+def register(metric):
+    METRICS.append(metric)
+    return metric
+
+def _escape(v):
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def render():
+    """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+    out = []
+    for m in METRICS:
+        out.append(f"# HELP {m.name} {m.help}")
+        out.append(f"# TYPE {m.name} {m.kind}")
+        for name, labels, value in m.samples():
+            lbl = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+            out.append(f"{name}{{{lbl}}} {value}" if lbl else f"{name} {value}")
+    return "\n".join(out) + "\n"
+
+
+# ── Requests ──────────────────────────────────────────────────────────────────
+request_seconds = register(Histogram(
+    "ironlog_request_duration_seconds", "Time to produce a response.", ("endpoint", "method"), REQUEST_BUCKETS))
+responses = register(Counter(
+    "ironlog_responses_total", "Responses by endpoint and status.", ("endpoint", "status")))
+
+def observe_request(endpoint, method, status, seconds):
+    endpoint = endpoint or "unmatched"
+    request_seconds.observe((endpoint, method), seconds)
+    responses.inc((endpoint, str(status)))
+
+
+# ── SQL ───────────────────────────────────────────────────────────────────────
+sql_seconds = register(Histogram(
+    "ironlog_sql_statement_seconds", "Statement time from execute() until its rows were read.",
+    ("statement",), SQL_BUCKETS))
+sql_rows = register(Counter(
+    "ironlog_sql_rows_total", "Rows returned (SELECT) or changed (DML) per statement.", ("statement",)))
+
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_statement_keys = {}
+
+def statement_key(sql):
+    """Short, stable label for a statement: a hash plus its normalized start."""
+    key = _statement_keys.get(sql)
+    if key is None:
+        text = _IN_LIST.sub("(?…)", " ".join(sql.split()))
+        key = f"{hashlib.sha1(text.encode()).hexdigest()[:8]} {text[:80]}"
+        if len(_statement_keys) < 10000:      # f-string SQL with inlined values must not grow this forever
+            _statement_keys[sql] = key
+    return key
+
+
+class TimedCursor:
+    """sqlite3 cursor proxy that reports each statement's time and rows once
+    they are known: when the rows run out, on fetchall(), on the next
+    execute() and at the latest when the cursor is dropped."""
+    __slots__ = ("_cur", "_key", "_elapsed", "_rows")
+
+    def __init__(self, cur):
+        object.__setattr__(self, "_cur", cur)
+        object.__setattr__(self, "_key", None)
+
+    def __getattr__(self, name):
+        return getattr(self._cur, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._cur, name, value)       # row_factory, arraysize
+
+    def _start(self, fn, sql, args):
+        self._finish()
+        start = time.perf_counter()
+        fn(sql, *args)
+        object.__setattr__(self, "_key", statement_key(sql))
+        object.__setattr__(self, "_elapsed", time.perf_counter() - start)
+        object.__setattr__(self, "_rows", 0)
+        return self
+
+    def execute(self, sql, *args):
+        return self._start(self._cur.execute, sql, args)
+
+    def executemany(self, sql, *args):
+        return self._start(self._cur.executemany, sql, args)
+
+    def _finish(self):
+        if self._key is not None:
+            rows = self._rows or max(self._cur.rowcount, 0)
+            sql_seconds.observe((self._key,), self._elapsed)
+            sql_rows.inc((self._key,), rows)
+            object.__setattr__(self, "_key", None)
+
+    def _timed(self, fn, *args):
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            if self._key is not None:
+                object.__setattr__(self, "_elapsed", self._elapsed + time.perf_counter() - start)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            row = self._timed(next, self._cur)
+        except StopIteration:
+            self._finish()
+            raise
+        if self._key is not None:
+            object.__setattr__(self, "_rows", self._rows + 1)
+        return row
+
+    def fetchone(self):
+        row = self._timed(self._cur.fetchone)
+        if row is None:
+            self._finish()
+        elif self._key is not None:
+            object.__setattr__(self, "_rows", self._rows + 1)
+        return row
+
+    def fetchmany(self, *args):
+        rows = self._timed(self._cur.fetchmany, *args)
+        if not rows:
+            self._finish()
+        elif self._key is not None:
+            object.__setattr__(self, "_rows", self._rows + len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(self._cur.fetchall)
+        if self._key is not None:
+            object.__setattr__(self, "_rows", self._rows + len(rows))
+        self._finish()
+        return rows
+
+    def close(self):
+        self._finish()
+        self._cur.close()
+
+    def __del__(self):
+        try:
+            self._finish()
+        except Exception:
+            pass
+
+
+# ── Connection pool ───────────────────────────────────────────────────────────
+def _pool_counters():
+    s = database.pool_stats()
+    return {(k,): s[k] for k in ("opened", "closed", "hits", "misses", "waits", "timeouts", "health_failures")}
+
+def _pool_gauges():
+    s = database.pool_stats()
+    return {("size",): s["size"], ("open",): s["open"], ("idle",): s["idle"],
+            ("in_use",): s["open"] - s["idle"]}
+
+register(Gauge("ironlog_db_pool_events_total", "Connection pool events since start "
+               "(opened/closed are connection opens and closes).", ("event",), _pool_counters, "counter"))
+register(Gauge("ironlog_db_pool_connections", "Connection pool occupancy.", ("state",), _pool_gauges))
+register(Gauge("ironlog_db_pool_wait_seconds_total", "Time requests spent waiting for a connection.",
+               (), lambda: {(): database.pool_stats()["wait_time"]}, "counter"))
+
+
+# ── Profiling ─────────────────────────────────────────────────────────────────
+def token_matches(offered, token):
+    """Constant-time comparison of a client-sent secret. Compared as UTF-8
+    bytes: compare_digest() raises TypeError on str with non-ASCII characters."""
+    return offered is not None and hmac.compare_digest(offered.encode(), token.encode())
+
+def _profile_wanted(app):
+    token = app.config["PROFILE_TOKEN"]
+    if not token:
+        return False
+    if token_matches(request.headers.get("X-Profile"), token):
+        return True
+    rate = app.config["PROFILE_SAMPLE_RATE"]
+    return bool(rate) and random.random() < rate
+
+def _dump_profile(app, prof, endpoint):
+    os.makedirs(app.config["PROFILE_DIR"], exist_ok=True)
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{endpoint or 'unmatched'}.prof"
+    prof.dump_stats(os.path.join(app.config["PROFILE_DIR"], name))
+    return name
+
+
+def init_metrics(app):
+    env = os.environ.get
+    app.config.setdefault("METRICS_ENABLED", True)
+    app.config.setdefault("METRICS_SQL", True)      # per-statement timing; a few µs per statement
+    # if set, /metrics wants "Authorization: Bearer <token>"; unset, it answers loopback clients only
+    app.config.setdefault("METRICS_TOKEN", env("IRONLOG_METRICS_TOKEN"))
+    # enables X-Profile and sampling; unset disables profiling entirely
+    app.config.setdefault("PROFILE_TOKEN", env("IRONLOG_PROFILE_TOKEN"))
+    app.config.setdefault("PROFILE_SAMPLE_RATE", float(env("IRONLOG_PROFILE_SAMPLE_RATE", 0)))
+    app.config.setdefault("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "ironlog-profiles"))
+    if not app.config["METRICS_ENABLED"]:
+        return
+    if app.config["METRICS_SQL"]:
+        database.set_cursor_factory(TimedCursor)
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_started = time.perf_counter()
+        if _profile_wanted(app):
+            g.profiler = cProfile.Profile()
+            g.profiler.enable()
+
+    @app.after_request
+    def _record(response):
+        prof = g.pop("profiler", None)
+        if prof is not None:
+            prof.disable()
+            response.headers["X-Profile"] = _dump_profile(app, prof, request.endpoint)
+        started = g.pop("metrics_started", None)
+        if started is not None:
+            observe_request(request.endpoint, request.method, response.status_code,
+                            time.perf_counter() - started)
+        return response
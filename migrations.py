@@ -0,0 +1,600 @@
+"""Versioned schema migrations, tracked in SQLite's PRAGMA user_version.
+
+Each @migration(n) step runs once, in order, and bumps user_version to n in
+the same transaction as its changes, so a crash leaves the database either
+before or after the step, never half-way. Once the schema is current,
+database.migrate() reads user_version and does nothing else.
+
+Never edit a migration that has shipped. Add a new one instead, e.g. a column,
+an index (create_index), a table whose shape changes (rebuild_table), or a
+rollup rebuild when aggregates.ROLLUPS changes. Steps registered with
+online=True manage their own short transactions, so writers from running
+workers can get in between them. Such steps must be safe to re-run after an
+interruption.
+
+Migrations run on their own connection in autocommit mode, not a pooled
+one, so every transaction boundary is explicit. `flask db status|upgrade`
+shows and applies them with per-step timings.
+"""
+import fcntl, sqlite3, time
+from contextlib import contextmanager
+import click
+from flask.cli import AppGroup
+from database import apply_pragmas, get_pool
+
+MIGRATIONS = []
+ROWS_PER_BATCH = 5000       # rebuild_table copy batch; each batch is one short write transaction
+
+
+class Migration:
+    def __init__(self, version, fn, online):
+        self.version, self.fn, self.online = version, fn, online
+        self.name = fn.__name__
+        self.doc = (fn.__doc__ or "").strip().split("\n")[0]
+
+def migration(version, online=False):
+    def deco(fn):
+        assert version == len(MIGRATIONS) + 1, f"migration {fn.__name__} should be {len(MIGRATIONS) + 1}"
+        MIGRATIONS.append(Migration(version, fn, online))
+        return fn
+    return deco
+
+def latest_version():
+    return len(MIGRATIONS)
+
+
+# ── Helpers ───────────────────────────────────────────────────────────────────
+@contextmanager
+def transaction(conn):
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+def run_script(conn, sql):
+    """executescript() without its implicit COMMIT, so the statements stay in
+    the caller's transaction."""
+    stmt = ""
+    for line in sql.splitlines(keepends=True):
+        stmt += line
+        if sqlite3.complete_statement(stmt):
+            conn.execute(stmt)
+            stmt = ""
+
+def columns(conn, table):
+    return {r["name"] for r in conn.execute(f"PRAGMA table_info({table})")}
+
+def create_index(conn, name, target, unique=False):
+    """Build one index in its own transaction. SQLite blocks writers while an
+    index is built, so indexes are built one at a time and writers get in
+    between them rather than waiting for the whole set."""
+    with transaction(conn):
+        conn.execute(f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {name} ON {target}")
+
+def rebuild_table(conn, table, create_sql, cols, batch=ROWS_PER_BATCH):
+    """Recreate `table` from `create_sql` (a CREATE TABLE statement with a
+    {table} placeholder) while the app keeps writing to it.
+
+    The table must be keyed by an INTEGER PRIMARY KEY listed in `cols`. Rows
+    are copied in rowid batches, one short transaction each. Until the swap,
+    triggers mirror every insert, update and delete on the old table into the
+    new one; the batch copy uses INSERT OR IGNORE, so a row already mirrored
+    keeps its newer version. The swap (drop, rename, recreate indexes) is one
+    transaction. It is followed by a foreign-key check, because the swap runs
+    with foreign keys off, as SQLite's documented ALTER TABLE procedure
+    requires. Safe to re-run after an interruption."""
+    new, col_list = f"_new_{table}", ", ".join(cols)
+    values = ", ".join(f"NEW.{c}" for c in cols)
+    triggers = {
+        f"_mirror_{table}_ins": f"AFTER INSERT ON {table} BEGIN "
+                                f"INSERT OR REPLACE INTO {new} ({col_list}) VALUES ({values}); END",
+        f"_mirror_{table}_upd": f"AFTER UPDATE ON {table} BEGIN "
+                                f"DELETE FROM {new} WHERE rowid = OLD.rowid; "
+                                f"INSERT OR REPLACE INTO {new} ({col_list}) VALUES ({values}); END",
+        f"_mirror_{table}_del": f"AFTER DELETE ON {table} BEGIN "
+                                f"DELETE FROM {new} WHERE rowid = OLD.rowid; END",
+    }
+
+    def drop_shadow():
+        for name in triggers:
+            conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+        conn.execute(f"DROP TABLE IF EXISTS {new}")
+
+    with transaction(conn):
+        drop_shadow()                   # leftovers of an interrupted rebuild
+        conn.execute(create_sql.format(table=new))
+        for name, body in triggers.items():
+            conn.execute(f"CREATE TRIGGER {name} {body}")
+    try:
+        last = 0
+        while True:
+            with transaction(conn):
+                upto = conn.execute(
+                    f"SELECT MAX(rowid) FROM (SELECT rowid FROM {table} WHERE rowid > ? ORDER BY rowid LIMIT ?)",
+                    (last, batch)
+                ).fetchone()[0]
+                if upto is None:
+                    break
+                conn.execute(f"INSERT OR IGNORE INTO {new} ({col_list}) "
+                             f"SELECT {col_list} FROM {table} WHERE rowid > ? AND rowid <= ?", (last, upto))
+            last = upto
+    except BaseException:
+        with transaction(conn):
+            drop_shadow()
+        raise
+
+    conn.execute("PRAGMA foreign_keys = OFF")   # a no-op inside a transaction, so before BEGIN
+    try:
+        with transaction(conn):
+            indexes = [r["sql"] for r in conn.execute(
+                "SELECT sql FROM sqlite_master WHERE type='index' AND tbl_name=? AND sql IS NOT NULL", (table,)
+            )]
+            for name in triggers:
+                conn.execute(f"DROP TRIGGER {name}")
+            conn.execute(f"DROP TABLE {table}")
+            conn.execute(f"ALTER TABLE {new} RENAME TO {table}")
+            for sql in indexes:
+                conn.execute(sql)
+            broken = conn.execute("PRAGMA foreign_key_check").fetchall()
+            if broken:
+                raise sqlite3.IntegrityError(f"rebuilding {table} broke {len(broken)} foreign key(s)")
+    finally:
+        conn.execute("PRAGMA foreign_keys = ON")
+
+
+# ── Migrations ────────────────────────────────────────────────────────────────
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS user (
+        id            INTEGER PRIMARY KEY AUTOINCREMENT,
+        username      TEXT    NOT NULL UNIQUE,
+        email         TEXT    NOT NULL UNIQUE,
+        password_hash TEXT    NOT NULL,
+        created_at    DATETIME NOT NULL DEFAULT (datetime('now'))
+    );
+
+    CREATE TABLE IF NOT EXISTS body_weight (
+        id          INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id     INTEGER NOT NULL REFERENCES user(id) ON DELETE CASCADE,
+        logged_at   DATE    NOT NULL DEFAULT (date('now')),
+        weight_kg   REAL    NOT NULL,
+        notes       TEXT
+    );
+
+    -- Unique constraint on (name, user_id, is_global) prevents duplicates.
+    -- Global exercises have user_id=NULL and is_global=1.
+    -- User exercises have user_id=<id> and is_global=0.
+    CREATE TABLE IF NOT EXISTS exercise (
+        id           INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id      INTEGER REFERENCES user(id) ON DELETE CASCADE,
+        name         TEXT    NOT NULL,
+        muscle_group TEXT,
+        equipment    TEXT,
+        is_global    INTEGER NOT NULL DEFAULT 0,
+        UNIQUE(name, is_global, user_id)
+    );
+
+    CREATE TABLE IF NOT EXISTS workout_session (
+        id              INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id         INTEGER NOT NULL REFERENCES user(id) ON DELETE CASCADE,
+        session_date    DATE    NOT NULL DEFAULT (date('now')),
+        started_at      DATETIME NOT NULL DEFAULT (datetime('now')),
+        ended_at        DATETIME,
+        calories_burned REAL,
+        template_id     INTEGER REFERENCES session_template(id) ON DELETE SET NULL,
+        notes           TEXT,
+        client_id       TEXT,
+        version         INTEGER NOT NULL DEFAULT 0
+    );
+
+    CREATE TABLE IF NOT EXISTS workout_set (
+        id           INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id   INTEGER NOT NULL REFERENCES workout_session(id) ON DELETE CASCADE,
+        exercise_id  INTEGER NOT NULL REFERENCES exercise(id),
+        set_number   INTEGER NOT NULL,
+        reps         INTEGER,
+        weight_kg    REAL,
+        rest_seconds INTEGER,
+        rpe          REAL,
+        notes        TEXT,
+        logged_at    DATETIME NOT NULL DEFAULT (datetime('now')),
+        client_id    TEXT
+    );
+
+    CREATE TABLE IF NOT EXISTS cardio_log (
+        id              INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id      INTEGER NOT NULL REFERENCES workout_session(id) ON DELETE CASCADE,
+        user_id         INTEGER NOT NULL REFERENCES user(id) ON DELETE CASCADE,
+        activity_type   TEXT    NOT NULL,
+        distance_km     REAL,
+        duration_min    REAL,
+        avg_pace_min_km REAL,
+        avg_heart_rate  INTEGER,
+        elevation_m     REAL,
+        notes           TEXT,
+        logged_at       DATETIME NOT NULL DEFAULT (datetime('now')),
+        client_id       TEXT
+    );
+
+    -- Session templates
+    CREATE TABLE IF NOT EXISTS session_template (
+        id         INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id    INTEGER NOT NULL REFERENCES user(id) ON DELETE CASCADE,
+        name       TEXT    NOT NULL,
+        notes      TEXT,
+        created_at DATETIME NOT NULL DEFAULT (datetime('now'))
+    );
+
+    -- Exercises inside a template (ordered)
+    CREATE TABLE IF NOT EXISTS template_exercise (
+        id              INTEGER PRIMARY KEY AUTOINCREMENT,
+        template_id     INTEGER NOT NULL REFERENCES session_template(id) ON DELETE CASCADE,
+        exercise_id     INTEGER NOT NULL REFERENCES exercise(id),
+        sort_order      INTEGER NOT NULL DEFAULT 0,
+        target_sets     INTEGER,
+        target_reps     INTEGER,
+        target_weight_kg REAL
+    );
+
+    -- Cardio inside a template
+    CREATE TABLE IF NOT EXISTS template_cardio (
+        id                   INTEGER PRIMARY KEY AUTOINCREMENT,
+        template_id          INTEGER NOT NULL REFERENCES session_template(id) ON DELETE CASCADE,
+        activity_type        TEXT    NOT NULL,
+        target_distance_km   REAL,
+        target_duration_min  REAL
+    );
+
+    -- Denormalized per-session totals, maintained by aggregates.refresh_session()
+    CREATE TABLE IF NOT EXISTS session_summary (
+        session_id   INTEGER PRIMARY KEY REFERENCES workout_session(id) ON DELETE CASCADE,
+        user_id      INTEGER NOT NULL REFERENCES user(id) ON DELETE CASCADE,
+        total_sets   INTEGER NOT NULL DEFAULT 0,
+        total_cardio INTEGER NOT NULL DEFAULT 0,
+        total_volume REAL,
+        total_distance REAL,
+        total_duration REAL
+    );
+
+    CREATE TABLE IF NOT EXISTS session_muscle_volume (
+        session_id   INTEGER NOT NULL REFERENCES workout_session(id) ON DELETE CASCADE,
+        muscle_group TEXT    NOT NULL,
+        total_sets   INTEGER NOT NULL DEFAULT 0,
+        volume       REAL,
+        PRIMARY KEY (session_id, muscle_group)
+    );
+
+    -- Analytics rollups, maintained by aggregates.refresh_day()
+    CREATE TABLE IF NOT EXISTS rollup_daily (
+        user_id      INTEGER NOT NULL REFERENCES user(id) ON DELETE CASCADE,
+        day          DATE    NOT NULL,
+        sessions     INTEGER NOT NULL DEFAULT 0,
+        total_sets   INTEGER,
+        volume       REAL,
+        calories     REAL,
+        cardio_count INTEGER,
+        distance_km  REAL,
+        duration_min REAL,
+        PRIMARY KEY (user_id, day)
+    );
+
+    CREATE TABLE IF NOT EXISTS rollup_weekly (
+        user_id      INTEGER NOT NULL REFERENCES user(id) ON DELETE CASCADE,
+        week         TEXT    NOT NULL,          -- strftime('%Y-W%W', day)
+        sessions     INTEGER NOT NULL DEFAULT 0,
+        total_sets   INTEGER,
+        volume       REAL,
+        calories     REAL,
+        cardio_count INTEGER,
+        distance_km  REAL,
+        duration_min REAL,
+        PRIMARY KEY (user_id, week)
+    );
+
+    CREATE TABLE IF NOT EXISTS rollup_exercise_daily (
+        user_id      INTEGER NOT NULL REFERENCES user(id) ON DELETE CASCADE,
+        exercise_id  INTEGER NOT NULL REFERENCES exercise(id),
+        day          DATE    NOT NULL,
+        total_sets   INTEGER NOT NULL DEFAULT 0,
+        volume       REAL,
+        max_weight   REAL,
+        max_reps     INTEGER,
+        PRIMARY KEY (user_id, exercise_id, day)
+    );
+
+    CREATE TABLE IF NOT EXISTS rollup_cardio_daily (
+        user_id        INTEGER NOT NULL REFERENCES user(id) ON DELETE CASCADE,
+        activity_type  TEXT    NOT NULL,
+        day            DATE    NOT NULL,
+        entries        INTEGER NOT NULL DEFAULT 0,
+        distance_km    REAL,
+        duration_min   REAL,
+        avg_heart_rate INTEGER,
+        PRIMARY KEY (user_id, activity_type, day)
+    );
+
+    CREATE TABLE IF NOT EXISTS rollup_load_daily (
+        user_id       INTEGER NOT NULL REFERENCES user(id) ON DELETE CASCADE,
+        day           DATE    NOT NULL,
+        strength_load REAL    NOT NULL DEFAULT 0,
+        cardio_load   REAL    NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, day)
+    );
+
+    -- Training-load recurrence state after each day with load (training_load.py)
+    CREATE TABLE IF NOT EXISTS training_load (
+        user_id INTEGER NOT NULL REFERENCES user(id) ON DELETE CASCADE,
+        day     DATE    NOT NULL,
+        load    REAL    NOT NULL,
+        acute   REAL    NOT NULL,
+        chronic REAL    NOT NULL,
+        fitness REAL    NOT NULL,
+        fatigue REAL    NOT NULL,
+        PRIMARY KEY (user_id, day)
+    );
+
+    -- Bumped by every write a user makes; keys the response cache (cache.py)
+    CREATE TABLE IF NOT EXISTS user_data_version (
+        user_id INTEGER PRIMARY KEY REFERENCES user(id) ON DELETE CASCADE,
+        version INTEGER NOT NULL DEFAULT 0
+    );
+
+    -- Change feed backing /api/sync (changelog.py); id is the client cursor
+    CREATE TABLE IF NOT EXISTS change_log (
+        id         INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id    INTEGER NOT NULL REFERENCES user(id) ON DELETE CASCADE,
+        session_id INTEGER,
+        session_version INTEGER,              -- workout_session.version after this change
+        entity     TEXT    NOT NULL,          -- 'session' | 'set' | 'cardio'
+        entity_id  INTEGER NOT NULL,
+        action     TEXT    NOT NULL,          -- 'upsert' | 'delete'
+        changed_at DATETIME NOT NULL DEFAULT (datetime('now'))
+    );
+
+    -- Client operations already applied by /api/sync, so retries are no-ops
+    CREATE TABLE IF NOT EXISTS sync_op (
+        user_id    INTEGER NOT NULL REFERENCES user(id) ON DELETE CASCADE,
+        op_id      TEXT    NOT NULL,
+        result     TEXT    NOT NULL,
+        applied_at DATETIME NOT NULL DEFAULT (datetime('now')),
+        PRIMARY KEY (user_id, op_id)
+    );
+
+    -- Background work queue, drained by jobs.JobRunner
+    CREATE TABLE IF NOT EXISTS job (
+        id           INTEGER PRIMARY KEY AUTOINCREMENT,
+        kind         TEXT     NOT NULL,
+        user_id      INTEGER  REFERENCES user(id) ON DELETE CASCADE,
+        payload      TEXT,
+        status       TEXT     NOT NULL DEFAULT 'queued',
+        priority     INTEGER  NOT NULL DEFAULT 0,
+        attempts     INTEGER  NOT NULL DEFAULT 0,
+        max_attempts INTEGER  NOT NULL DEFAULT 3,
+        run_after    DATETIME NOT NULL DEFAULT (datetime('now')),
+        worker       TEXT,
+        progress     TEXT,
+        result       TEXT,
+        error        TEXT,
+        created_at   DATETIME NOT NULL DEFAULT (datetime('now')),
+        started_at   DATETIME,
+        finished_at  DATETIME
+    );
+"""
+
+# Columns added after the first release; databases from before user_version
+# tracking may lack them. Checked against table_info instead of probing with ALTER.
+LATE_COLUMNS = [
+    ("workout_session", "calories_burned", "REAL"),
+    ("workout_session", "ended_at",        "DATETIME"),
+    ("workout_session", "template_id",     "INTEGER"),
+    ("session_summary", "total_distance",  "REAL"),
+    ("session_summary", "total_duration",  "REAL"),
+    ("workout_session", "client_id",       "TEXT"),
+    ("workout_set",     "client_id",       "TEXT"),
+    ("cardio_log",      "client_id",       "TEXT"),
+    ("workout_session", "version",         "INTEGER NOT NULL DEFAULT 0"),
+    ("change_log",      "session_version", "INTEGER"),
+]
+
+@migration(1)
+def base_schema(conn):
+    """Create the tables; bring pre-versioning databases up to the same columns."""
+    run_script(conn, SCHEMA)
+    for table, col, typ in LATE_COLUMNS:
+        if col not in columns(conn, table):
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {col} {typ}")
+
+
+GLOBAL_EXERCISES = [
+    ('Bench Press',       'Chest',      'Barbell'),
+    ('Squat',             'Legs',       'Barbell'),
+    ('Deadlift',          'Back',       'Barbell'),
+    ('Overhead Press',    'Shoulders',  'Barbell'),
+    ('Barbell Row',       'Back',       'Barbell'),
+    ('Pull Up',           'Back',       'Bodyweight'),
+    ('Dumbbell Curl',     'Biceps',     'Dumbbell'),
+    ('Tricep Pushdown',   'Triceps',    'Cable'),
+    ('Leg Press',         'Legs',       'Machine'),
+    ('Lat Pulldown',      'Back',       'Cable'),
+    ('Incline Press',     'Chest',      'Dumbbell'),
+    ('Romanian Deadlift', 'Hamstrings', 'Barbell'),
+    ('Face Pull',         'Shoulders',  'Cable'),
+    ('Dumbbell Row',      'Back',       'Dumbbell'),
+    ('Cable Fly',         'Chest',      'Cable'),
+    ('Hip Thrust',        'Glutes',     'Barbell'),
+    ('Dips',              'Triceps',    'Bodyweight'),
+    ('Leg Curl',          'Hamstrings', 'Machine'),
+]
+
+@migration(2)
+def seed_global_exercises(conn):
+    """Merge duplicate global exercises, enforce unique names, seed the built-ins."""
+    # Older boots could insert the same global twice; point references at the
+    # first copy before dropping the rest (rollups are rebuilt by migration 4)
+    dupes = conn.execute("""
+        SELECT e.id, k.keep FROM exercise e
+        JOIN (SELECT LOWER(name) AS lname, MIN(id) AS keep FROM exercise
+              WHERE is_global = 1 GROUP BY LOWER(name)) k ON k.lname = LOWER(e.name)
+        WHERE e.is_global = 1 AND e.id <> k.keep
+    """).fetchall()
+    for r in dupes:
+        conn.execute("UPDATE workout_set SET exercise_id=? WHERE exercise_id=?", (r["keep"], r["id"]))
+        conn.execute("UPDATE template_exercise SET exercise_id=? WHERE exercise_id=?", (r["keep"], r["id"]))
+        conn.execute("DELETE FROM rollup_exercise_daily WHERE exercise_id=?", (r["id"],))
+        conn.execute("DELETE FROM exercise WHERE id=?", (r["id"],))
+    # UNIQUE(name, is_global, user_id) never applied to globals (user_id is NULL)
+    conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS idx_exercise_global_name ON {INDEXES['idx_exercise_global_name']}")
+    conn.executemany(
+        "INSERT OR IGNORE INTO exercise (name, muscle_group, equipment, is_global, user_id) VALUES (?,?,?,1,NULL)",
+        GLOBAL_EXERCISES
+    )
+
+
+# Every hot lookup in routes/ filters by owner or parent id; these keep them
+# off full-table scans. Later index changes are new migrations.
+INDEXES = {
+    "idx_exercise_user":        "exercise(user_id)",
+    "idx_exercise_global":      "exercise(is_global, name)",
+    "idx_exercise_global_name": "exercise(LOWER(name)) WHERE is_global = 1",
+    "idx_session_user_date":    "workout_session(user_id, session_date)",
+    "idx_session_template":     "workout_session(template_id, user_id, session_date, started_at)",
+    "idx_set_session":          "workout_set(session_id, exercise_id, set_number)",
+    "idx_set_exercise":         "workout_set(exercise_id)",
+    "idx_cardio_session":       "cardio_log(session_id, logged_at)",
+    "idx_cardio_user":          "cardio_log(user_id, activity_type)",
+    "idx_summary_user":         "session_summary(user_id)",
+    "idx_rollup_ex_user_day":   "rollup_exercise_daily(user_id, day)",
+    "idx_change_user":          "change_log(user_id, id)",
+    "idx_change_session":       "change_log(session_id, session_version)",
+    "idx_session_client":       "workout_session(client_id) WHERE client_id IS NOT NULL",
+    "idx_set_client":           "workout_set(client_id) WHERE client_id IS NOT NULL",
+    "idx_cardio_client":        "cardio_log(client_id) WHERE client_id IS NOT NULL",
+    "idx_bw_user_date":         "body_weight(user_id, logged_at)",
+    "idx_template_user":        "session_template(user_id, created_at)",
+    "idx_template_ex_template": "template_exercise(template_id, sort_order)",
+    "idx_template_cardio_tpl":  "template_cardio(template_id)",
+    "idx_job_queue":            "job(status, priority DESC, id)",
+    "idx_job_user":             "job(user_id, status)",
+}
+
+@migration(3, online=True)
+def secondary_indexes(conn):
+    """Build the secondary indexes, one transaction each."""
+    for name, target in INDEXES.items():
+        create_index(conn, name, target, unique=name == "idx_exercise_global_name")
+    with transaction(conn):
+        # Indexes from the old versioned index set that are no longer used
+        for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='index' AND name LIKE 'idx\\_%' ESCAPE '\\'"
+        ).fetchall():
+            if row["name"] not in INDEXES:
+                conn.execute(f"DROP INDEX {row['name']}")
+    conn.execute("ANALYZE")
+
+
+@migration(4)
+def build_aggregates(conn):
+    """Build session summaries, analytics rollups and training load from the raw tables."""
+    from aggregates import backfill_summaries, rebuild_summaries, rebuild_rollups
+    # schema_meta is the bookkeeping this module replaces; where it says the
+    # current rollup set is built, only sessions without a summary need work
+    legacy = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='schema_meta'").fetchone()
+    built = legacy and conn.execute("SELECT value FROM schema_meta WHERE key='rollups_built'").fetchone()
+    if built and built["value"] == "2":
+        backfill_summaries(conn)
+    else:
+        rebuild_summaries(conn)
+        rebuild_rollups(conn)
+    conn.execute("DROP TABLE IF EXISTS schema_meta")
+
+
+@migration(5)
+def exercise_catalog_version(conn):
+    """Per-user exercise catalog version for the catalog cache (catalog.py)."""
+    conn.execute("ALTER TABLE user_data_version ADD COLUMN catalog_version INTEGER NOT NULL DEFAULT 0")
+
+
+@migration(6)
+def template_snapshots(conn):
+    """Per-template counts, last use and last-session actuals (aggregates.refresh_template)."""
+    from aggregates import rebuild_template_snapshots
+    conn.execute("""
+        CREATE TABLE template_snapshot (
+            template_id     INTEGER PRIMARY KEY REFERENCES session_template(id) ON DELETE CASCADE,
+            user_id         INTEGER NOT NULL REFERENCES user(id) ON DELETE CASCADE,
+            exercise_count  INTEGER NOT NULL DEFAULT 0,
+            cardio_count    INTEGER NOT NULL DEFAULT 0,
+            last_used       DATE,
+            last_session_id INTEGER,
+            detail          TEXT    NOT NULL      -- GET /api/templates/<id> payload as JSON
+        )
+    """)
+    rebuild_template_snapshots(conn)
+
+
+# ── Runner ────────────────────────────────────────────────────────────────────
+def connect(path=None):
+    pool = get_pool()
+    conn = sqlite3.connect(path or pool.path, isolation_level=None)   # autocommit; we BEGIN explicitly
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA foreign_keys = ON")
+    apply_pragmas(conn, pool.pragmas)
+    return conn
+
+def current_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def upgrade(path=None, target=None, report=None):
+    """Apply pending migrations up to `target` (default: all) under an
+    exclusive lock on <db>.lock, so concurrently booting workers or a CLI run
+    never migrate twice. Returns [(version, name, seconds)] for the steps run."""
+    path = path or get_pool().path
+    target = latest_version() if target is None else target
+    done = []
+    with open(path + ".lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)        # released when the file is closed
+        conn = connect(path)
+        try:
+            current = current_version(conn)
+            if current > latest_version():
+                raise RuntimeError(f"database is at schema version {current}, "
+                                   f"newer than this code ({latest_version()})")
+            for m in MIGRATIONS[current:target]:
+                start = time.perf_counter()
+                if m.online:
+                    m.fn(conn)
+                    conn.execute(f"PRAGMA user_version = {m.version}")
+                else:
+                    with transaction(conn):
+                        m.fn(conn)
+                        conn.execute(f"PRAGMA user_version = {m.version}")
+                done.append((m.version, m.name, time.perf_counter() - start))
+                if report:
+                    report(*done[-1])
+        finally:
+            conn.close()
+    return done
+
+
+# ── CLI ───────────────────────────────────────────────────────────────────────
+db_cli = AppGroup("db", help="Inspect and apply schema migrations.")
+
+@db_cli.command("status")
+def status_command():
+    """Show the schema version and pending migrations."""
+    conn = connect()
+    current = current_version(conn)
+    conn.close()
+    click.echo(f"Schema version {current} of {latest_version()}.")
+    for m in MIGRATIONS[current:]:
+        click.echo(f"  pending {m.version:>3} {m.name}: {m.doc}")
+
+@db_cli.command("upgrade")
+@click.option("--to", "target", type=int, default=None, help="Stop after this version.")
+def upgrade_command(target):
+    """Apply pending migrations, timing each one."""
+    done = upgrade(target=target,
+                   report=lambda v, name, secs: click.echo(f"{v:>4} {name:<24} {secs * 1000:10.1f} ms"))
+    click.echo(f"Applied {len(done)} migration(s)." if done else "Schema is current.")
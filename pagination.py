@@ -0,0 +1,75 @@
+"""Keyset (cursor) pagination for newest-first lists.
+
+A cursor is "<sort key>_<id>" of a row; `before=<cursor>` pages towards older
+rows, `after=<cursor>` towards newer ones. Because the WHERE clause seeks on
+(key, id) through the owner's index, every page costs the same no matter how
+deep into the history it is — unlike LIMIT/OFFSET.
+"""
+from flask import request
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE     = 100
+
+
+def make_cursor(key, row_id):
+    return f"{key}_{row_id}"
+
+def parse_cursor(raw):
+    key, sep, row_id = (raw or "").rpartition("_")
+    if not sep or not key or not row_id.isdigit():
+        raise ValueError(f"Invalid cursor {raw!r}")
+    return key, int(row_id)
+
+def page_args(default=DEFAULT_PAGE_SIZE, cap=MAX_PAGE_SIZE):
+    """Read limit/before/after/from/to off the query string. Raises ValueError."""
+    a = request.args
+    try:
+        limit = int(a.get("limit", default))
+    except ValueError:
+        raise ValueError("limit must be an integer")
+    if a.get("before") and a.get("after"):
+        raise ValueError("Use either before or after, not both")
+    return {
+        "limit":  max(1, min(limit, cap)),
+        "before": parse_cursor(a["before"]) if a.get("before") else None,
+        "after":  parse_cursor(a["after"])  if a.get("after")  else None,
+        "from":   a.get("from") or None,
+        "to":     a.get("to")   or None,
+    }
+
+def keyset_page(conn, sql, params, key, id_col, args, out_key=None):
+    """Run `sql` (which must end in a WHERE clause) one page at a time.
+
+    key / id_col are the SQL expressions of the sort key and row id; out_key is
+    the name of the sort key in the result rows (defaults to key's column).
+    Returns {"items": [...], "next": cursor|None, "prev": cursor|None} with
+    items always newest first.
+    """
+    out_key = out_key or key.rsplit(".", 1)[-1]
+    out_id  = id_col.rsplit(".", 1)[-1]
+    conds, p = [], list(params)
+    if args["from"]:
+        conds.append(f"{key} >= ?"); p.append(args["from"])
+    if args["to"]:
+        conds.append(f"{key} <= ?"); p.append(args["to"])
+    if args["before"]:
+        conds.append(f"({key}, {id_col}) < (?, ?)"); p.extend(args["before"])
+    if args["after"]:
+        conds.append(f"({key}, {id_col}) > (?, ?)"); p.extend(args["after"])
+    order = "ASC" if args["after"] else "DESC"
+    sql += "".join(f" AND {c}" for c in conds)
+    sql += f" ORDER BY {key} {order}, {id_col} {order} LIMIT ?"
+    rows = [dict(r) for r in conn.execute(sql, p + [args["limit"] + 1]).fetchall()]
+
+    more = len(rows) > args["limit"]
+    rows = rows[:args["limit"]]
+    if args["after"]:
+        rows.reverse()
+    cursor = lambda r: make_cursor(r[out_key], r[out_id])
+    older = more if not args["after"] else True
+    newer = more if args["after"] else args["before"] is not None
+    return {
+        "items": rows,
+        "next":  cursor(rows[-1]) if rows and older else None,
+        "prev":  cursor(rows[0])  if rows and newer else None,
+    }
@@ -1,131 +1,94 @@
 from flask import Blueprint, jsonify, session, request
 from database import get_db
-from functools import wraps
+from cache import cached, cache_key, data_version
+from aio import async_view, run_db
+from analytics_compute import compute_overview
+from strength import FORMULAS, strength_report
+from training_load import load_series
+from auth import login_required
+from encoding import FORMATS, response_format, shape
 
 analytics_bp = Blueprint("analytics", __name__)
 
-def login_required(f):
-    @wraps(f)
-    def d(*a, **kw):
-        if "user_id" not in session:
-            return jsonify({"error":"Unauthorized"}), 401
-        return f(*a, **kw)
-    return d
-
 @analytics_bp.route("/api/analytics/overview")
 @login_required
+@cached("overview")
 def overview():
-    uid = session["user_id"]
+    """Every Forge section. ?format=columnar sends each list of rows as
+    {"columns": [...], "rows": [[...], ...]}."""
+    fmt = response_format(request.args)
+    if fmt is None:
+        return _bad_format()
     conn = get_db()
+    sections, timings = compute_overview(conn, session["user_id"])
+    conn.close()
+    resp = jsonify(shape(sections, fmt))
+    resp.headers["Server-Timing"] = _server_timing(timings)
+    return resp
 
-    totals = conn.execute("""
-        SELECT COUNT(DISTINCT s.id) as total_sessions,
-               COUNT(ws.id)         as total_sets,
-               SUM(ws.reps * COALESCE(ws.weight_kg,0)) as total_volume,
-               SUM(s.calories_burned) as total_calories
-        FROM workout_session s
-        LEFT JOIN workout_set ws ON ws.session_id = s.id
-        WHERE s.user_id=?
-    """, (uid,)).fetchone()
-
-    cardio_totals = conn.execute("""
-        SELECT SUM(distance_km) as total_distance,
-               SUM(duration_min) as total_duration,
-               COUNT(*) as total_cardio
-        FROM cardio_log WHERE user_id=?
-    """, (uid,)).fetchone()
-
-    # Weekly volume (last 12 weeks)
-    weekly_volume = conn.execute("""
-        SELECT strftime('%Y-W%W', s.session_date) as week,
-               SUM(ws.reps * COALESCE(ws.weight_kg,0)) as volume
-        FROM workout_session s
-        LEFT JOIN workout_set ws ON ws.session_id = s.id
-        WHERE s.user_id=? AND s.session_date >= date('now','-84 days')
-        GROUP BY week ORDER BY week
-    """, (uid,)).fetchall()
-
-    # Per-exercise weight progression (max weight per session, per exercise)
-    exercise_progress = conn.execute("""
-        SELECT e.id, e.name, e.muscle_group,
-               s.session_date,
-               MAX(ws.weight_kg) as max_weight,
-               MAX(ws.reps)      as max_reps
-        FROM workout_set ws
-        JOIN exercise e ON e.id = ws.exercise_id
-        JOIN workout_session s ON s.id = ws.session_id
-        WHERE s.user_id=? AND ws.weight_kg IS NOT NULL
-        GROUP BY e.id, s.session_date
-        ORDER BY e.name, s.session_date
-    """, (uid,)).fetchall()
-
-    # Group into dict by exercise name
-    ex_dict = {}
-    for r in exercise_progress:
-        name = r["name"]
-        if name not in ex_dict:
-            ex_dict[name] = {"muscle": r["muscle_group"], "data": []}
-        ex_dict[name]["data"].append({
-            "date": r["session_date"],
-            "max_weight": r["max_weight"],
-            "max_reps": r["max_reps"]
-        })
+def _server_timing(timings):
+    return ", ".join(f"{name};dur={ms:.1f}" for name, ms in timings.items())
 
-    # Cardio history: distance + pace per activity per session
-    cardio_history = conn.execute("""
-        SELECT cl.activity_type, s.session_date,
-               cl.distance_km, cl.duration_min, cl.avg_pace_min_km, cl.avg_heart_rate
-        FROM cardio_log cl
-        JOIN workout_session s ON s.id = cl.session_id
-        WHERE cl.user_id=?
-        ORDER BY cl.activity_type, s.session_date
-    """, (uid,)).fetchall()
+def _bad_format():
+    return jsonify({"error": f"format must be one of {', '.join(FORMATS)}"}), 400
 
-    # Group cardio by activity type
-    cardio_dict = {}
-    for r in cardio_history:
-        act = r["activity_type"]
-        if act not in cardio_dict:
-            cardio_dict[act] = []
-        cardio_dict[act].append({
-            "date": r["session_date"],
-            "distance_km": r["distance_km"],
-            "duration_min": r["duration_min"],
-            "avg_pace_min_km": r["avg_pace_min_km"],
-            "avg_heart_rate": r["avg_heart_rate"]
-        })
+@async_view("analytics.overview")
+async def overview_async(req):
+    """Same response and cache entries as overview(), computed off the loop."""
+    backend = req.app.extensions["response_cache"]
+    fmt = response_format(req.args)
+    if fmt is None:
+        return req.respond({"error": f"format must be one of {', '.join(FORMATS)}"}, 400)
 
-    # Body weight trend (last 90 days)
-    bw_trend = conn.execute("""
-        SELECT logged_at as date, weight_kg
-        FROM body_weight WHERE user_id=? AND logged_at >= date('now','-90 days')
-        ORDER BY logged_at
-    """, (uid,)).fetchall()
+    def build(conn, uid):
+        key, etag = cache_key("overview", uid, data_version(conn, uid), {}, req.query_string)
+        headers = {"ETag": f'"{etag}"', "Cache-Control": "private, no-cache"}
+        if etag in req.if_none_match:
+            return 304, b"", headers
+        body = backend.get(key)
+        if body is None:
+            sections, timings = compute_overview(conn, uid)
+            _, body, _ = req.respond(shape(sections, fmt))
+            backend.set(key, body, req.app.config["CACHE_TTL"])
+            headers["Server-Timing"] = _server_timing(timings)
+        return 200, body, {"Content-Type": "application/json", **headers}
 
-    # Heatmap (last 6 months)
-    heatmap = conn.execute("""
-        SELECT session_date as date, COUNT(*) as count
-        FROM workout_session WHERE user_id=? AND session_date >= date('now','-180 days')
-        GROUP BY session_date
-    """, (uid,)).fetchall()
+    return await run_db(build, req.uid)
 
-    # Calories burned per session (last 30 days)
-    calories_timeline = conn.execute("""
-        SELECT session_date as date, COALESCE(calories_burned,0) as calories
-        FROM workout_session
-        WHERE user_id=? AND session_date >= date('now','-30 days')
-              AND calories_burned IS NOT NULL
-        ORDER BY session_date
-    """, (uid,)).fetchall()
+@analytics_bp.route("/api/analytics/strength")
+@login_required
+@cached("strength")
+def strength():
+    """Estimated 1RM history, PRs and rep-max table per exercise.
+    ?formula=epley|brzycki (default epley), ?exercise_id= narrows to one lift,
+    ?format=columnar as for the overview."""
+    fmt = response_format(request.args)
+    if fmt is None:
+        return _bad_format()
+    formula = request.args.get("formula", "epley")
+    if formula not in FORMULAS:
+        return jsonify({"error": f"formula must be one of {', '.join(FORMULAS)}"}), 400
+    exercise_id = request.args.get("exercise_id", type=int)
+    conn = get_db()
+    report = strength_report(conn, session["user_id"], formula, exercise_id)
+    conn.close()
+    return jsonify(shape(report, fmt))
 
+@analytics_bp.route("/api/analytics/load")
+@login_required
+def training_load():
+    """Daily training load with acute/chronic EWMA, ACWR and Banister
+    fitness/fatigue/form for the last ?days= days (default 90, max 730).
+    Not cached: rest days decay the state, so the answer moves with the date
+    even when the data doesn't — and it only reads rows inside the window.
+    ?format=columnar as for the overview."""
+    fmt = response_format(request.args)
+    if fmt is None:
+        return _bad_format()
+    days = request.args.get("days", 90, type=int)
+    if not 1 <= days <= 730:
+        return jsonify({"error": "days must be between 1 and 730"}), 400
+    conn = get_db()
+    series = load_series(conn, session["user_id"], days)
     conn.close()
-    return jsonify({
-        "totals": dict(totals),
-        "cardio_totals": dict(cardio_totals),
-        "weekly_volume": [dict(r) for r in weekly_volume],
-        "exercise_progress": ex_dict,
-        "cardio_by_activity": cardio_dict,
-        "bw_trend": [dict(r) for r in bw_trend],
-        "heatmap": [dict(r) for r in heatmap],
-        "calories_timeline": [dict(r) for r in calories_timeline],
-    })
+    return jsonify(shape({"current": series[-1], "series": series}, fmt))
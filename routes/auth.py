@@ -1,9 +1,16 @@
 from flask import Blueprint, render_template, request, redirect, url_for, session, jsonify
-from werkzeug.security import generate_password_hash, check_password_hash
-from database import get_db
+from auth import HashingBusy, check_password, hash_password, retry_after, throttle
+from database import get_db, release_db
+import sqlite3
 
 auth_bp = Blueprint("auth", __name__)
 
+def _refuse(template, error, status, headers):
+    """Throttled or hashing-busy answer, in the same shape as the form's errors."""
+    if request.is_json:
+        return jsonify({"ok": False, "error": error}), status, headers
+    return render_template(template, error=error), status, headers
+
 
 @auth_bp.route("/")
 def index():
@@ -21,12 +28,20 @@ def login():
         data = request.get_json(silent=True) or request.form
         username = data.get("username", "").strip()
         password = data.get("password", "")
+        wait = throttle(username)
+        if wait:
+            return _refuse("login.html", "Too many attempts. Try again shortly.", 429, retry_after(wait))
         conn = get_db()
         user = conn.execute(
             "SELECT * FROM user WHERE username = ?", (username,)
         ).fetchone()
         conn.close()
-        if user and check_password_hash(user["password_hash"], password):
+        release_db()                    # don't hold a pooled connection while hashing
+        try:
+            ok = user is not None and check_password(user["password_hash"], password)
+        except HashingBusy:
+            return _refuse("login.html", "The server is busy. Try again shortly.", 503, retry_after(1))
+        if ok:
             session["user_id"] = user["id"]
             session["username"] = user["username"]
             if request.is_json:
@@ -49,6 +64,9 @@ def signup():
         username = data.get("username", "").strip()
         email = data.get("email", "").strip()
         password = data.get("password", "")
+        wait = throttle()
+        if wait:
+            return _refuse("signup.html", "Too many attempts. Try again shortly.", 429, retry_after(wait))
         if not username or not email or not password:
             error = "All fields are required."
         elif len(password) < 6:
@@ -62,20 +80,32 @@ def signup():
                 error = "Username or email already taken."
                 conn.close()
             else:
-                conn.execute(
-                    "INSERT INTO user (username, email, password_hash) VALUES (?,?,?)",
-                    (username, email, generate_password_hash(password)),
-                )
-                conn.commit()
-                user = conn.execute(
-                    "SELECT * FROM user WHERE username=?", (username,)
-                ).fetchone()
-                conn.close()
-                session["user_id"] = user["id"]
-                session["username"] = user["username"]
-                if request.is_json:
-                    return jsonify({"ok": True, "redirect": url_for("workout.app_page")})
-                return redirect(url_for("workout.app_page"))
+                release_db()
+                try:
+                    pw_hash = hash_password(password)
+                except HashingBusy:
+                    return _refuse("signup.html", "The server is busy. Try again shortly.", 503, retry_after(1))
+                conn = get_db()
+                try:
+                    conn.execute(
+                        "INSERT INTO user (username, email, password_hash) VALUES (?,?,?)",
+                        (username, email, pw_hash),
+                    )
+                    conn.commit()
+                except sqlite3.IntegrityError:   # taken by a concurrent signup while we hashed
+                    conn.rollback()
+                    conn.close()
+                    error = "Username or email already taken."
+                else:
+                    user = conn.execute(
+                        "SELECT * FROM user WHERE username=?", (username,)
+                    ).fetchone()
+                    conn.close()
+                    session["user_id"] = user["id"]
+                    session["username"] = user["username"]
+                    if request.is_json:
+                        return jsonify({"ok": True, "redirect": url_for("workout.app_page")})
+                    return redirect(url_for("workout.app_page"))
         if request.is_json:
             return jsonify({"ok": False, "error": error}), 400
     return render_template("signup.html", error=error)
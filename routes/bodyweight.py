@@ -1,30 +1,27 @@
 from flask import Blueprint, request, jsonify, session
 from database import get_db
+from cache import bump_data_version
+from pagination import page_args, keyset_page
 from datetime import date
-from functools import wraps
+from auth import login_required
 
 bodyweight_bp = Blueprint("bodyweight", __name__)
 
 
-def login_required(f):
-    @wraps(f)
-    def decorated(*args, **kwargs):
-        if "user_id" not in session:
-            return jsonify({"error": "Unauthorized"}), 401
-        return f(*args, **kwargs)
-    return decorated
-
-
 @bodyweight_bp.route("/api/bodyweight", methods=["GET"])
 @login_required
 def get_bodyweight():
+    try:
+        args = page_args(default=30)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     conn = get_db()
-    rows = conn.execute(
-        "SELECT * FROM body_weight WHERE user_id=? ORDER BY logged_at DESC LIMIT 30",
-        (session["user_id"],)
-    ).fetchall()
+    page = keyset_page(conn,
+        "SELECT * FROM body_weight WHERE user_id=?",
+        (session["user_id"],), "logged_at", "id", args
+    )
     conn.close()
-    return jsonify([dict(r) for r in rows])
+    return jsonify(page)
 
 
 @bodyweight_bp.route("/api/bodyweight", methods=["POST"])
@@ -39,6 +36,7 @@ def log_bodyweight():
         "INSERT INTO body_weight (user_id, weight_kg, notes, logged_at) VALUES (?,?,?,?)",
         (session["user_id"], weight, data.get("notes", ""), data.get("date", str(date.today())))
     )
+    bump_data_version(conn, session["user_id"])
     conn.commit()
     conn.close()
     return jsonify({"ok": True})
@@ -0,0 +1,152 @@
+from flask import Blueprint, Response, jsonify, request, session, stream_with_context
+from database import get_db
+from auth import login_required
+import csv, io, json
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:   # columnar formats are optional
+    pa = pq = None
+
+export_bp = Blueprint("export", __name__)
+
+# ── Datasets ──────────────────────────────────────────────────────────────────
+# One owned table per dataset, exported whole in primary-key order. Rows are
+# pulled with fetchmany() and written out chunk by chunk, so memory use stays
+# flat however long the user's history is.
+EXPORT_CHUNK = 1000
+PARQUET_ROW_GROUP = 10000
+
+DATASETS = {
+    "sessions":   ("workout_session",  "SELECT t.* FROM workout_session t WHERE t.user_id=?"),
+    "sets":       ("workout_set",      """SELECT t.* FROM workout_set t
+                                          JOIN workout_session s ON s.id = t.session_id
+                                          WHERE s.user_id=?"""),
+    "cardio":     ("cardio_log",       "SELECT t.* FROM cardio_log t WHERE t.user_id=?"),
+    "bodyweight": ("body_weight",      "SELECT t.* FROM body_weight t WHERE t.user_id=?"),
+    "exercises":  ("exercise",         "SELECT t.* FROM exercise t WHERE t.is_global=1 OR t.user_id=?"),
+    "templates":  ("session_template", "SELECT t.* FROM session_template t WHERE t.user_id=?"),
+    "template_exercises": ("template_exercise", """SELECT t.* FROM template_exercise t
+                                          JOIN session_template st ON st.id = t.template_id
+                                          WHERE st.user_id=?"""),
+    "template_cardio": ("template_cardio", """SELECT t.* FROM template_cardio t
+                                          JOIN session_template st ON st.id = t.template_id
+                                          WHERE st.user_id=?"""),
+}
+
+FORMATS = {
+    "csv":     ("text/csv", "csv"),
+    "ndjson":  ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow":   ("application/vnd.apache.arrow.stream", "arrows"),
+}
+COLUMNAR = {"parquet", "arrow"}
+
+def _chunks(cur, size=EXPORT_CHUNK):
+    while True:
+        rows = cur.fetchmany(size)
+        if not rows:
+            return
+        yield rows
+
+# ── Writers ───────────────────────────────────────────────────────────────────
+def _csv(cur):
+    buf = io.StringIO()
+    w = csv.writer(buf)
+    w.writerow([c[0] for c in cur.description])
+    for rows in _chunks(cur):
+        w.writerows(rows)
+        yield buf.getvalue()
+        buf.seek(0); buf.truncate()
+    yield buf.getvalue()
+
+def _ndjson(cur):
+    cols = [c[0] for c in cur.description]
+    for rows in _chunks(cur):
+        yield "".join(json.dumps(dict(zip(cols, r))) + "\n" for r in rows)
+
+class _Drain:
+    """Write-only file object whose contents are handed out as they arrive."""
+    closed = False
+    def __init__(self):
+        self.parts, self.pos = [], 0
+    def write(self, b):
+        self.parts.append(bytes(b)); self.pos += len(b)
+        return len(b)
+    def tell(self):
+        return self.pos
+    def flush(self):
+        pass
+    def close(self):
+        self.closed = True
+    def take(self):
+        out, self.parts = b"".join(self.parts), []
+        return out
+
+ARROW_TYPES = {"INTEGER": "int64", "REAL": "float64"}
+
+def _arrow_schema(conn, table, cur):
+    declared = {r["name"]: r["type"].upper() for r in conn.execute(f"PRAGMA table_info({table})")}
+    return pa.schema([(c[0], getattr(pa, ARROW_TYPES.get(declared.get(c[0]), "string"))())
+                      for c in cur.description])
+
+def _columnar(conn, table, cur, fmt):
+    schema = _arrow_schema(conn, table, cur)
+    sink = _Drain()
+    writer = (pq.ParquetWriter(sink, schema) if fmt == "parquet"
+              else pa.ipc.new_stream(sink, schema))
+    size = PARQUET_ROW_GROUP if fmt == "parquet" else EXPORT_CHUNK
+    for rows in _chunks(cur, size):
+        # Declared types are advisory in SQLite; stringify anything off-type
+        cols = []
+        for i, field in enumerate(schema):
+            col = [r[i] for r in rows]
+            if pa.types.is_string(field.type):
+                col = [None if v is None else str(v) for v in col]
+            cols.append(col)
+        writer.write_batch(pa.record_batch(cols, schema=schema))
+        yield sink.take()
+    writer.close()
+    yield sink.take()
+
+# ── Routes ────────────────────────────────────────────────────────────────────
+@export_bp.route("/api/export")
+@login_required
+def export_index():
+    formats = [f for f in FORMATS if pa is not None or f not in COLUMNAR]
+    return jsonify({"datasets": list(DATASETS), "formats": formats})
+
+@export_bp.route("/api/export/<dataset>")
+@login_required
+def export_dataset(dataset):
+    """Stream one dataset as ?format=csv (default) | ndjson | parquet | arrow."""
+    if dataset not in DATASETS:
+        return jsonify({"error": f"Unknown dataset '{dataset}'"}), 404
+    fmt = request.args.get("format", "csv")
+    if fmt not in FORMATS:
+        return jsonify({"error": f"format must be one of {', '.join(FORMATS)}"}), 400
+    if fmt in COLUMNAR and pa is None:
+        return jsonify({"error": f"{fmt} export needs pyarrow installed on the server"}), 501
+    table, sql = DATASETS[dataset]
+    uid = session["user_id"]
+
+    def generate():
+        conn = get_db()
+        cur = conn.cursor()
+        cur.row_factory = None
+        cur.execute(sql + " ORDER BY t.id", (uid,))
+        if fmt == "csv":
+            yield from _csv(cur)
+        elif fmt == "ndjson":
+            yield from _ndjson(cur)
+        else:
+            yield from _columnar(conn, table, cur, fmt)
+        cur.close()
+        conn.close()
+
+    mimetype, ext = FORMATS[fmt]
+    return Response(stream_with_context(generate()), mimetype=mimetype, headers={
+        "Content-Disposition": f'attachment; filename="ironlog-{dataset}.{ext}"',
+        "Cache-Control": "no-store",
+    })
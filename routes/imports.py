@@ -0,0 +1,70 @@
+from flask import Blueprint, current_app, request, jsonify, session
+from werkzeug.exceptions import RequestEntityTooLarge
+from database import get_db
+from jobs import enqueue, pending_jobs
+import importer  # registers the "import" job
+from auth import login_required
+import os, shutil, tempfile
+
+imports_bp = Blueprint("imports", __name__)
+
+MAX_IMPORT_BYTES = 200 * 1024 * 1024    # the app's MAX_CONTENT_LENGTH: no route takes a bigger body
+IMPORT_FORMATS = ("csv", "ndjson")
+
+# ── Bulk import ───────────────────────────────────────────────────────────────
+@imports_bp.route("/api/import", methods=["POST"])
+@login_required
+def create_import():
+    """Upload a CSV/NDJSON log, either as multipart field `file` or as the raw
+    body. The file is spooled to disk and imported by a background job; poll
+    GET /api/jobs/<id> for progress.
+
+    The size limit is the app's MAX_CONTENT_LENGTH, which Werkzeug enforces
+    while the body is read, so a chunked upload without a Content-Length is
+    cut off at the limit as well. A user may have IMPORTS_MAX_PENDING imports
+    queued or running; past that the upload is refused with 429, checked
+    before the body is read and again, together with the enqueue, after it."""
+    uid, limit = session["user_id"], current_app.config["IMPORTS_MAX_PENDING"]
+    conn = get_db()
+    busy = pending_jobs(conn, uid, ["import"]) >= limit
+    conn.close()
+    if busy:
+        return _too_many(limit)
+
+    upload = request.files.get("file")
+    name = upload.filename if upload else ""
+    fmt = request.args.get("format") or os.path.splitext(name)[1].lstrip(".").lower() or "csv"
+    if fmt == "jsonl":
+        fmt = "ndjson"
+    if fmt not in IMPORT_FORMATS:
+        return jsonify({"error": f"format must be one of {', '.join(IMPORT_FORMATS)}"}), 400
+
+    fd, path = tempfile.mkstemp(prefix="ironlog-import-", suffix="." + fmt)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            shutil.copyfileobj(upload.stream if upload else request.stream, out, 1 << 16)
+    except RequestEntityTooLarge:
+        os.unlink(path)
+        raise
+    if not os.path.getsize(path):
+        os.unlink(path)
+        return jsonify({"error": "Empty upload"}), 400
+
+    conn = get_db()
+    conn.execute("BEGIN IMMEDIATE")     # another upload may have finished spooling meanwhile
+    if pending_jobs(conn, uid, ["import"]) >= limit:
+        conn.rollback(); conn.close()
+        os.unlink(path)
+        return _too_many(limit)
+    job_id = enqueue("import", {"path": path, "format": fmt}, user_id=uid, conn=conn)
+    conn.commit()
+    conn.close()
+    return jsonify({"id": job_id, "status": "queued"}), 202, {"Location": f"/api/jobs/{job_id}"}
+
+def _too_many(limit):
+    return jsonify({"error": f"At most {limit} imports may be pending at once"}), 429
+
+@imports_bp.errorhandler(RequestEntityTooLarge)
+def _too_large(e):
+    limit = current_app.config["MAX_CONTENT_LENGTH"]
+    return jsonify({"error": f"Imports are limited to {limit / 2**20:g} MB"}), 413
@@ -0,0 +1,48 @@
+from flask import Blueprint, current_app, request, jsonify, session
+from database import get_db
+from jobs import TASKS, enqueue, job_status, pending_jobs, public_job
+from auth import login_required
+
+jobs_bp = Blueprint("jobs", __name__)
+
+# ── Background jobs ───────────────────────────────────────────────────────────
+@jobs_bp.route("/api/jobs")
+@login_required
+def list_jobs():
+    conn = get_db()
+    rows = conn.execute(
+        "SELECT * FROM job WHERE user_id=? ORDER BY id DESC LIMIT 20", (session["user_id"],)
+    ).fetchall()
+    conn.close()
+    return jsonify([public_job(r) for r in rows])
+
+@jobs_bp.route("/api/jobs", methods=["POST"])
+@login_required
+def create_job():
+    """Queue a public job for the caller. A user may have JOBS_MAX_PENDING of
+    them queued or running at once; past that the request is refused."""
+    kind = (request.json or {}).get("kind")
+    t = TASKS.get(kind)
+    if not t or not t.public:
+        return jsonify({"error": f"Unknown job kind '{kind}'"}), 400
+    limit = current_app.config["JOBS_MAX_PENDING"]
+    public = [k for k, task in TASKS.items() if task.public]
+    conn = get_db()
+    conn.execute("BEGIN IMMEDIATE")     # count and insert together, or parallel posts both pass
+    if pending_jobs(conn, session["user_id"], public) >= limit:
+        conn.rollback(); conn.close()
+        return jsonify({"error": f"At most {limit} jobs may be pending at once"}), 429
+    job_id = enqueue(kind, user_id=session["user_id"], conn=conn)
+    conn.commit()
+    conn.close()
+    return jsonify({"id": job_id, "status": "queued"}), 202, {"Location": f"/api/jobs/{job_id}"}
+
+@jobs_bp.route("/api/jobs/<int:job_id>")
+@login_required
+def get_job(job_id):
+    conn = get_db()
+    job = job_status(conn, job_id, session["user_id"])
+    conn.close()
+    if not job:
+        return jsonify({"error":"Not found"}), 404
+    return jsonify(job)
@@ -0,0 +1,22 @@
+from flask import Blueprint, current_app, request, jsonify
+from metrics import render, token_matches
+
+metrics_bp = Blueprint("metrics", __name__)
+
+LOOPBACK = ("127.0.0.1", "::1")
+
+# ── Prometheus scrape endpoint ────────────────────────────────────────────────
+# Not session-protected: scrapers have no login. With METRICS_TOKEN set it
+# wants "Authorization: Bearer <token>"; without one it only answers clients
+# on this host, so a deploy that forgets the token doesn't publish its metrics.
+@metrics_bp.route("/metrics")
+def scrape():
+    if not current_app.config.get("METRICS_ENABLED", True):
+        return jsonify({"error": "Not found"}), 404
+    token = current_app.config.get("METRICS_TOKEN")
+    if token:
+        if not token_matches(request.headers.get("Authorization"), f"Bearer {token}"):
+            return jsonify({"error": "Unauthorized"}), 401
+    elif request.remote_addr not in LOOPBACK:
+        return jsonify({"error": "Set METRICS_TOKEN to scrape from another host"}), 403
+    return current_app.response_class(render(), mimetype="text/plain; version=0.0.4")
@@ -0,0 +1,240 @@
+from flask import Blueprint, current_app, request, jsonify, session
+from database import get_db
+from aggregates import refresh_session
+from cache import bump_data_version
+from changelog import record_change, current_cursor, changes_since
+from datetime import date
+from training_load import is_iso_date
+from auth import login_required
+import json, sqlite3
+
+sync_bp = Blueprint("sync", __name__)
+
+# ── Offline sync ──────────────────────────────────────────────────────────────
+# The client queues writes locally, each with a UUID op_id, and flushes them
+# here in batches. Ops are applied in order inside one transaction; each runs
+# in its own savepoint so a bad op fails alone: a rejected or malformed op is
+# rolled back and recorded as that op's error result. Applied op_ids are
+# remembered in sync_op, so a retried flush (lost response, flaky signal)
+# changes nothing and returns the original results. A transient database error
+# ("database is locked") is not the op's fault: the whole batch is rolled back,
+# nothing is remembered, and a 503 tells the client to send it again. Entities
+# created offline carry a client_id that later ops may reference before the
+# server id is known.
+MAX_OPS = 200
+OPS = {}
+# What malformed op data raises: wrong types, missing keys, values SQLite can't bind
+INVALID_DATA = (TypeError, ValueError, KeyError, AttributeError,
+                sqlite3.InterfaceError, sqlite3.ProgrammingError)
+
+class SyncError(Exception):
+    pass
+
+def op(name):
+    def deco(f):
+        OPS[name] = f
+        return f
+    return deco
+
+def _session_id(conn, uid, data):
+    if data.get("session_id") is not None:
+        row = conn.execute("SELECT id FROM workout_session WHERE id=? AND user_id=?",
+                           (data["session_id"], uid)).fetchone()
+    else:
+        row = conn.execute("SELECT id FROM workout_session WHERE client_id=? AND user_id=?",
+                           (data.get("session_client_id"), uid)).fetchone()
+    if not row:
+        raise SyncError("Session not found")
+    return row["id"]
+
+def _owned(conn, uid, table, data):
+    """(id, session_id) of a set/cardio row addressed by id or client_id, or None."""
+    col, val = ("id", data["id"]) if data.get("id") is not None else ("client_id", data.get("client_id"))
+    return conn.execute(f"""
+        SELECT x.id, x.session_id FROM {table} x
+        JOIN workout_session s ON s.id = x.session_id
+        WHERE x.{col}=? AND s.user_id=?
+    """, (val, uid)).fetchone()
+
+def _existing(conn, uid, table, client_id):
+    if not client_id:
+        return None
+    return _owned(conn, uid, table, {"client_id": client_id})
+
+
+@op("create_session")
+def _create_session(conn, uid, data, touched):
+    row = conn.execute("SELECT id FROM workout_session WHERE client_id=? AND user_id=?",
+                       (data.get("client_id"), uid)).fetchone() if data.get("client_id") else None
+    if row:
+        return {"id": row["id"]}
+    day = data.get("date", str(date.today()))
+    if not is_iso_date(day):
+        raise SyncError("date must be YYYY-MM-DD")
+    sid = conn.execute(
+        "INSERT INTO workout_session (user_id,session_date,notes,client_id) VALUES(?,?,?,?)",
+        (uid, day, data.get("notes",""), data.get("client_id"))
+    ).lastrowid
+    record_change(conn, uid, sid, "session", sid)
+    touched.add(sid)
+    return {"id": sid}
+
+@op("end_session")
+def _end_session(conn, uid, data, touched):
+    sid = _session_id(conn, uid, data)
+    conn.execute("UPDATE workout_session SET ended_at=datetime('now'), calories_burned=? WHERE id=?",
+                 (data.get("calories_burned"), sid))
+    record_change(conn, uid, sid, "session", sid)
+    touched.add(sid)
+    return {"id": sid}
+
+@op("log_set")
+def _log_set(conn, uid, data, touched):
+    found = _existing(conn, uid, "workout_set", data.get("client_id"))
+    if found:
+        return {"id": found["id"]}
+    sid = _session_id(conn, uid, data)
+    if data.get("set_number") is None:
+        raise SyncError("set_number required")
+    if not conn.execute("SELECT id FROM exercise WHERE id=? AND (is_global=1 OR user_id=?)",
+                        (data.get("exercise_id"), uid)).fetchone():
+        raise SyncError("Unknown exercise")
+    set_id = conn.execute("""
+        INSERT INTO workout_set
+            (session_id,exercise_id,set_number,reps,weight_kg,rest_seconds,rpe,notes,client_id)
+        VALUES(?,?,?,?,?,?,?,?,?)
+    """, (sid, data["exercise_id"], data["set_number"],
+          data.get("reps"), data.get("weight_kg"), data.get("rest_seconds"),
+          data.get("rpe"), data.get("notes",""), data.get("client_id"))).lastrowid
+    record_change(conn, uid, sid, "set", set_id)
+    touched.add(sid)
+    return {"id": set_id}
+
+@op("update_set")
+def _update_set(conn, uid, data, touched):
+    row = _owned(conn, uid, "workout_set", data)
+    if not row:
+        raise SyncError("Set not found")
+    cols = [c for c in ("reps", "weight_kg", "rest_seconds", "rpe", "notes") if c in data]
+    if cols:
+        conn.execute(f"UPDATE workout_set SET {', '.join(f'{c}=?' for c in cols)} WHERE id=?",
+                     [data[c] for c in cols] + [row["id"]])
+        record_change(conn, uid, row["session_id"], "set", row["id"])
+        touched.add(row["session_id"])
+    return {"id": row["id"]}
+
+@op("delete_set")
+def _delete_set(conn, uid, data, touched):
+    row = _owned(conn, uid, "workout_set", data)
+    if row:   # already gone counts as success
+        conn.execute("DELETE FROM workout_set WHERE id=?", (row["id"],))
+        record_change(conn, uid, row["session_id"], "set", row["id"], "delete")
+        touched.add(row["session_id"])
+    return {"id": row["id"] if row else None}
+
+@op("log_cardio")
+def _log_cardio(conn, uid, data, touched):
+    found = _existing(conn, uid, "cardio_log", data.get("client_id"))
+    if found:
+        return {"id": found["id"]}
+    sid  = _session_id(conn, uid, data)
+    dist = data.get("distance_km")
+    dur  = data.get("duration_min")
+    pace = round(dur/dist, 2) if dist and dur and dist > 0 else None
+    cid = conn.execute("""
+        INSERT INTO cardio_log
+            (session_id,user_id,activity_type,distance_km,duration_min,
+             avg_pace_min_km,avg_heart_rate,elevation_m,notes,client_id)
+        VALUES(?,?,?,?,?,?,?,?,?,?)
+    """, (sid, uid, data.get("activity_type","running"), dist, dur, pace,
+          data.get("avg_heart_rate"), data.get("elevation_m"),
+          data.get("notes",""), data.get("client_id"))).lastrowid
+    record_change(conn, uid, sid, "cardio", cid)
+    touched.add(sid)
+    return {"id": cid, "avg_pace_min_km": pace}
+
+@op("delete_cardio")
+def _delete_cardio(conn, uid, data, touched):
+    row = _owned(conn, uid, "cardio_log", data)
+    if row:
+        conn.execute("DELETE FROM cardio_log WHERE id=?", (row["id"],))
+        record_change(conn, uid, row["session_id"], "cardio", row["id"], "delete")
+        touched.add(row["session_id"])
+    return {"id": row["id"] if row else None}
+
+
+@sync_bp.route("/api/sync", methods=["POST"])
+@login_required
+def sync():
+    data = request.json or {}
+    ops = data.get("ops") or []
+    if not isinstance(ops, list) or len(ops) > MAX_OPS:
+        return jsonify({"error": f"ops must be a list of at most {MAX_OPS} operations"}), 400
+    try:
+        since = int(data.get("since") or 0)
+    except (TypeError, ValueError):
+        return jsonify({"error": "since must be an integer cursor"}), 400
+    uid = session["user_id"]
+
+    conn = get_db()
+    results, touched = [], set()
+    if ops:
+        conn.execute("BEGIN IMMEDIATE")
+        for o in ops:
+            op_id = o.get("op_id") if isinstance(o, dict) else None
+            if not op_id:
+                results.append({"op_id": None, "error": "op_id required"})
+                continue
+            done = conn.execute("SELECT result FROM sync_op WHERE user_id=? AND op_id=?",
+                                (uid, op_id)).fetchone()
+            if done:
+                results.append(json.loads(done["result"]))
+                continue
+            handler = OPS.get(o.get("type"))
+            conn.execute("SAVEPOINT sync_op")
+            try:
+                if handler is None:
+                    raise SyncError(f"Unknown op type {o.get('type')!r}")
+                result = {"op_id": op_id, "ok": True, **handler(conn, uid, o.get("data") or {}, touched)}
+                conn.execute("RELEASE sync_op")
+            except (SyncError, sqlite3.IntegrityError) as e:
+                conn.execute("ROLLBACK TO sync_op"); conn.execute("RELEASE sync_op")
+                result = {"op_id": op_id, "ok": False, "error": str(e)}
+            except INVALID_DATA:    # malformed data must not fail the ops around it
+                current_app.logger.exception("sync op %s (%r) failed", op_id, o.get("type"))
+                conn.execute("ROLLBACK TO sync_op"); conn.execute("RELEASE sync_op")
+                result = {"op_id": op_id, "ok": False, "error": "Invalid operation"}
+            except sqlite3.OperationalError:
+                current_app.logger.warning("sync op %s (%r) hit a transient error", op_id, o.get("type"),
+                                           exc_info=True)
+                conn.rollback(); conn.close()
+                return jsonify({"error": "Database busy, retry the batch"}), 503, {"Retry-After": "1"}
+            conn.execute("INSERT INTO sync_op (user_id, op_id, result) VALUES (?,?,?)",
+                         (uid, op_id, json.dumps(result)))
+            results.append(result)
+        for sid in touched:
+            refresh_session(conn, sid)
+        if touched:
+            bump_data_version(conn, uid)
+        conn.commit()
+
+    feed = changes_since(conn, uid, since)
+    conn.close()
+    return jsonify({"results": results, **feed})
+
+
+@sync_bp.route("/api/sync")
+@login_required
+def pull():
+    """Pull-only: changes after ?since=<cursor>. Without since, just the cursor."""
+    uid = session["user_id"]
+    conn = get_db()
+    if request.args.get("since") is None:
+        feed = {"changes": [], "cursor": current_cursor(conn, uid), "more": False}
+    else:
+        try:
+            feed = changes_since(conn, uid, int(request.args["since"]))
+        except ValueError:
+            conn.close(); return jsonify({"error": "since must be an integer cursor"}), 400
+    conn.close()
+    return jsonify(feed)
@@ -1,37 +1,37 @@
-from flask import Blueprint, request, jsonify, session
+from flask import Blueprint, current_app, request, jsonify, session
 from database import get_db
-from functools import wraps
+from aggregates import refresh_session, refresh_template
+from cache import bump_data_version
+from changelog import record_change
+from auth import login_required
 
 templates_bp = Blueprint("templates", __name__)
 
-def login_required(f):
-    @wraps(f)
-    def d(*a, **kw):
-        if "user_id" not in session:
-            return jsonify({"error": "Unauthorized"}), 401
-        return f(*a, **kw)
-    return d
-
-
 # ── List all templates ────────────────────────────────────────────────────────
+# Counts and last_used come from template_snapshot (aggregates.refresh_template).
+# A template without a snapshot (written by code that skipped the refresh) gets
+# one built here rather than vanishing from the list.
+TEMPLATE_LIST = """
+    SELECT t.*, s.exercise_count, s.cardio_count, s.last_used, s.template_id AS snapshot
+    FROM session_template t
+    LEFT JOIN template_snapshot s ON s.template_id = t.id
+    WHERE t.user_id = ?
+    ORDER BY t.created_at DESC
+"""
+
 @templates_bp.route("/api/templates")
 @login_required
 def get_templates():
     conn = get_db()
-    rows = conn.execute("""
-        SELECT t.*,
-               COUNT(DISTINCT te.id) as exercise_count,
-               COUNT(DISTINCT tc.id) as cardio_count,
-               MAX(ws.session_date)  as last_used
-        FROM session_template t
-        LEFT JOIN template_exercise te ON te.template_id = t.id
-        LEFT JOIN template_cardio   tc ON tc.template_id = t.id
-        LEFT JOIN workout_session   ws ON ws.template_id = t.id AND ws.user_id = t.user_id
-        WHERE t.user_id = ?
-        GROUP BY t.id ORDER BY t.created_at DESC
-    """, (session["user_id"],)).fetchall()
+    rows = conn.execute(TEMPLATE_LIST, (session["user_id"],)).fetchall()
+    missing = [r["id"] for r in rows if r["snapshot"] is None]
+    if missing:
+        for tid in missing:
+            refresh_template(conn, tid)
+        conn.commit()
+        rows = conn.execute(TEMPLATE_LIST, (session["user_id"],)).fetchall()
     conn.close()
-    return jsonify([dict(r) for r in rows])
+    return jsonify([{k: r[k] for k in r.keys() if k != "snapshot"} for r in rows])
 
 
 # ── Get single template — exercises enriched with last-session actuals ─────────
@@ -39,77 +39,14 @@ def get_templates():
 @login_required
 def get_template(tid):
     conn = get_db()
-    t = conn.execute(
-        "SELECT * FROM session_template WHERE id=? AND user_id=?",
+    row = conn.execute(
+        "SELECT detail FROM template_snapshot WHERE template_id=? AND user_id=?",
         (tid, session["user_id"])
     ).fetchone()
-    if not t:
-        conn.close()
-        return jsonify({"error": "Not found"}), 404
-
-    # Base template exercises (static targets)
-    exercises = conn.execute("""
-        SELECT te.*, e.name as exercise_name, e.muscle_group, e.equipment
-        FROM template_exercise te
-        JOIN exercise e ON e.id = te.exercise_id
-        WHERE te.template_id = ?
-        ORDER BY te.sort_order
-    """, (tid,)).fetchall()
-
-    # Find the most recent session that used this template
-    last_session = conn.execute("""
-        SELECT id FROM workout_session
-        WHERE template_id = ? AND user_id = ?
-        ORDER BY session_date DESC, started_at DESC
-        LIMIT 1
-    """, (tid, session["user_id"])).fetchone()
-
-    # Build a map: exercise_id → list of sets from last session, ordered by set_number
-    last_sets = {}
-    if last_session:
-        rows = conn.execute("""
-            SELECT exercise_id, set_number, reps, weight_kg, rpe, rest_seconds
-            FROM workout_set
-            WHERE session_id = ?
-            ORDER BY exercise_id, set_number
-        """, (last_session["id"],)).fetchall()
-        for r in rows:
-            eid = r["exercise_id"]
-            if eid not in last_sets:
-                last_sets[eid] = []
-            last_sets[eid].append(dict(r))
-
-    # Enrich each template exercise with last-session actuals
-    result_exercises = []
-    for ex in exercises:
-        ex_dict = dict(ex)
-        eid = ex_dict["exercise_id"]
-        if eid in last_sets:
-            ex_dict["last_sets"] = last_sets[eid]
-        else:
-            ex_dict["last_sets"] = []
-        result_exercises.append(ex_dict)
-
-    # Cardio targets + last session actuals
-    cardio_tpl = conn.execute(
-        "SELECT * FROM template_cardio WHERE template_id=?", (tid,)
-    ).fetchall()
-
-    last_cardio = []
-    if last_session:
-        last_cardio = conn.execute(
-            "SELECT * FROM cardio_log WHERE session_id=? ORDER BY logged_at",
-            (last_session["id"],)
-        ).fetchall()
-
     conn.close()
-
-    result = dict(t)
-    result["exercises"]   = result_exercises
-    result["cardio"]      = [dict(c) for c in cardio_tpl]
-    result["last_cardio"] = [dict(c) for c in last_cardio]
-    result["has_history"] = last_session is not None
-    return jsonify(result)
+    if not row:
+        return jsonify({"error": "Not found"}), 404
+    return current_app.response_class(row["detail"], mimetype="application/json")
 
 
 # ── Start a session from a template (records the link) ────────────────────────
@@ -131,8 +68,11 @@ def start_from_template(tid):
         "INSERT INTO workout_session (user_id, session_date, template_id, notes) VALUES (?,?,?,?)",
         (session["user_id"], str(dt.today()), tid, "")
     )
-    conn.commit()
     sid = cur.lastrowid
+    refresh_session(conn, sid)
+    record_change(conn, session["user_id"], sid, "session", sid)
+    bump_data_version(conn, session["user_id"])
+    conn.commit()
     conn.close()
     return jsonify({"ok": True, "session_id": sid})
 
@@ -168,6 +108,8 @@ def create_template():
             VALUES (?,?,?,?)
         """, (tid, c["activity_type"], c.get("target_distance_km"), c.get("target_duration_min")))
 
+    refresh_template(conn, tid)
+    bump_data_version(conn, session["user_id"])
     conn.commit()
     conn.close()
     return jsonify({"ok": True, "id": tid})
@@ -201,6 +143,7 @@ def template_from_session(sid):
     conn.execute(
         "UPDATE workout_session SET template_id=? WHERE id=?", (tid, sid)
     )
+    record_change(conn, session["user_id"], sid, "session", sid)
 
     # Copy unique exercises, keeping per-set detail as targets
     sets = conn.execute("""
@@ -231,6 +174,10 @@ def template_from_session(sid):
             VALUES (?,?,?,?)
         """, (tid, c["activity_type"], c["distance_km"], c["duration_min"]))
 
+    refresh_template(conn, tid)
+    if s["template_id"] is not None:
+        refresh_template(conn, s["template_id"])   # it just lost this session
+    bump_data_version(conn, session["user_id"])
     conn.commit()
     conn.close()
     return jsonify({"ok": True, "id": tid})
@@ -241,10 +188,17 @@ def template_from_session(sid):
 @login_required
 def delete_template(tid):
     conn = get_db()
+    # ON DELETE SET NULL unlinks its sessions; the change feed has to hear about it
+    linked = conn.execute(
+        "SELECT id FROM workout_session WHERE template_id=? AND user_id=?", (tid, session["user_id"])
+    ).fetchall()
     conn.execute(
         "DELETE FROM session_template WHERE id=? AND user_id=?",
         (tid, session["user_id"])
     )
+    for r in linked:
+        record_change(conn, session["user_id"], r["id"], "session", r["id"])
+    bump_data_version(conn, session["user_id"])
     conn.commit()
     conn.close()
     return jsonify({"ok": True})
@@ -1,21 +1,20 @@
-from flask import Blueprint, render_template, request, jsonify, session, redirect, url_for
+from flask import Blueprint, current_app, render_template, request, jsonify, session, redirect, url_for
 from database import get_db
+from catalog import bump_catalog_version, catalog_etag, catalog_version, fold, get_catalog
+from aggregates import refresh_session
+from cache import cached, bump_data_version
+from pagination import page_args, keyset_page
+from changelog import record_change, record_changes, load_rows, changes_since
+from aio import async_view, run_db
 from datetime import date
-from functools import wraps
+from training_load import is_iso_date
+from auth import current_user, login_required
 
 workout_bp = Blueprint("workout", __name__)
 
-def login_required(f):
-    @wraps(f)
-    def d(*a, **kw):
-        if "user_id" not in session:
-            return jsonify({"error": "Unauthorized"}), 401
-        return f(*a, **kw)
-    return d
-
 @workout_bp.route("/app")
 def app_page():
-    if "user_id" not in session:
+    if current_user() is None:
         return redirect(url_for("auth.login"))
     return render_template("app.html", username=session["username"])
 
@@ -23,13 +22,19 @@ def app_page():
 @workout_bp.route("/api/exercises")
 @login_required
 def get_exercises():
+    uid = session["user_id"]
     conn = get_db()
-    rows = conn.execute(
-        "SELECT * FROM exercise WHERE is_global=1 OR user_id=? ORDER BY name",
-        (session["user_id"],)
-    ).fetchall()
+    version = catalog_version(conn, uid)
+    etag = catalog_etag(conn, uid, version)
+    if request.if_none_match.contains_weak(etag):
+        resp = current_app.response_class(status=304)
+    else:
+        resp = current_app.response_class(get_catalog(conn, uid, version).json_body(),
+                                          mimetype="application/json")
     conn.close()
-    return jsonify([dict(r) for r in rows])
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "private, no-cache"
+    return resp
 
 @workout_bp.route("/api/exercises", methods=["POST"])
 @login_required
@@ -38,59 +43,69 @@ def add_exercise():
     name = data.get("name","").strip()
     if not name: return jsonify({"error":"Name required"}), 400
     conn = get_db()
-    if conn.execute(
-        "SELECT id FROM exercise WHERE LOWER(name)=LOWER(?) AND (is_global=1 OR user_id=?)",
-        (name, session["user_id"])
-    ).fetchone():
+    if fold(name) in get_catalog(conn, session["user_id"]).by_name:
         conn.close()
         return jsonify({"error": f'"{name}" already exists in your list'}), 409
     cur = conn.execute(
         "INSERT INTO exercise (name,muscle_group,equipment,user_id,is_global) VALUES(?,?,?,?,0)",
         (name, data.get("muscle_group",""), data.get("equipment",""), session["user_id"])
     )
+    bump_catalog_version(conn, session["user_id"])
+    bump_data_version(conn, session["user_id"])
     conn.commit(); ex_id = cur.lastrowid; conn.close()
     return jsonify({"ok":True,"id":ex_id})
 
 # ── Sessions ──────────────────────────────────────────────────────────────────
 @workout_bp.route("/api/sessions")
 @login_required
+@cached("sessions")
 def get_sessions():
+    try:
+        args = page_args()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     conn = get_db()
-    rows = conn.execute("""
+    page = keyset_page(conn, """
         SELECT s.*,
-               COUNT(DISTINCT ws.id)  as total_sets,
-               COUNT(DISTINCT cl.id)  as total_cardio,
-               SUM(ws.reps * COALESCE(ws.weight_kg,0)) as total_volume
+               COALESCE(ss.total_sets,0)   as total_sets,
+               COALESCE(ss.total_cardio,0) as total_cardio,
+               ss.total_volume
         FROM workout_session s
-        LEFT JOIN workout_set ws ON ws.session_id = s.id
-        LEFT JOIN cardio_log cl  ON cl.session_id = s.id
+        LEFT JOIN session_summary ss ON ss.session_id = s.id
         WHERE s.user_id=?
-        GROUP BY s.id ORDER BY s.session_date DESC LIMIT 40
-    """, (session["user_id"],)).fetchall()
+    """, (session["user_id"],), "s.session_date", "s.id", args)
     conn.close()
-    return jsonify([dict(r) for r in rows])
+    return jsonify(page)
 
 @workout_bp.route("/api/sessions", methods=["POST"])
 @login_required
 def create_session():
-    data = request.json
+    data = request.json or {}
+    day = data.get("date", str(date.today()))
+    if not is_iso_date(day):
+        return jsonify({"error": "date must be YYYY-MM-DD"}), 400
     conn = get_db()
     cur = conn.execute(
         "INSERT INTO workout_session (user_id,session_date,notes) VALUES(?,?,?)",
-        (session["user_id"], data.get("date", str(date.today())), data.get("notes",""))
+        (session["user_id"], day, data.get("notes",""))
     )
-    conn.commit(); sid = cur.lastrowid; conn.close()
-    return jsonify({"id": sid})
+    sid = cur.lastrowid
+    refresh_session(conn, sid)
+    version = record_change(conn, session["user_id"], sid, "session", sid)
+    bump_data_version(conn, session["user_id"])
+    conn.commit()
+    row = load_rows(conn, "session", [sid])[sid]
+    conn.close()
+    return jsonify({"id": sid, "version": version, "session": row})
 
-@workout_bp.route("/api/sessions/<int:sid>")
-@login_required
-def get_session(sid):
-    conn = get_db()
+# The bodies of the hot routes are plain (conn, uid, ...) functions returning
+# (payload, status) so the async views used by asgi.py can share them.
+def _session_detail(conn, uid, sid):
     s = conn.execute(
         "SELECT * FROM workout_session WHERE id=? AND user_id=?",
-        (sid, session["user_id"])
+        (sid, uid)
     ).fetchone()
-    if not s: conn.close(); return jsonify({"error":"Not found"}), 404
+    if not s: return {"error":"Not found"}, 404
     sets = conn.execute("""
         SELECT ws.*, e.name as exercise_name, e.muscle_group
         FROM workout_set ws JOIN exercise e ON e.id=ws.exercise_id
@@ -99,55 +114,120 @@ def get_session(sid):
     cardio = conn.execute(
         "SELECT * FROM cardio_log WHERE session_id=? ORDER BY logged_at", (sid,)
     ).fetchall()
-    conn.close()
+    muscles = conn.execute(
+        "SELECT muscle_group, total_sets, volume FROM session_muscle_volume WHERE session_id=? ORDER BY volume DESC",
+        (sid,)
+    ).fetchall()
     r = dict(s)
     r["sets"]   = [dict(x) for x in sets]
     r["cardio"] = [dict(x) for x in cardio]
-    return jsonify(r)
+    r["muscle_volume"] = [dict(x) for x in muscles]
+    return r, 200
+
+@workout_bp.route("/api/sessions/<int:sid>")
+@login_required
+def get_session(sid):
+    conn = get_db()
+    body, status = _session_detail(conn, session["user_id"], sid)
+    conn.close()
+    return jsonify(body), status
+
+@async_view("workout.get_session")
+async def get_session_async(req, sid):
+    body, status = await run_db(_session_detail, req.uid, sid)
+    return req.respond(body, status)
+
+@workout_bp.route("/api/sessions/<int:sid>/changes")
+@login_required
+def get_session_changes(sid):
+    """Rows of this session changed after ?since=<version>, each in its current
+    state (or marked deleted). `version` in the reply is the next `since`."""
+    try:
+        since = int(request.args.get("since", 0))
+    except ValueError:
+        return jsonify({"error": "since must be an integer version"}), 400
+    conn = get_db()
+    s = conn.execute(
+        "SELECT version FROM workout_session WHERE id=? AND user_id=?",
+        (sid, session["user_id"])
+    ).fetchone()
+    if not s: conn.close(); return jsonify({"error":"Not found"}), 404
+    feed = changes_since(conn, session["user_id"], since, session_id=sid)
+    conn.close()
+    return jsonify({"version": feed["cursor"] if feed["more"] else s["version"],
+                    "changes": feed["changes"], "more": feed["more"]})
 
 @workout_bp.route("/api/sessions/<int:sid>/end", methods=["POST"])
 @login_required
 def end_session(sid):
     data = request.json or {}
     conn = get_db()
-    conn.execute(
+    cur = conn.execute(
         "UPDATE workout_session SET ended_at=datetime('now'), calories_burned=? WHERE id=? AND user_id=?",
         (data.get("calories_burned"), sid, session["user_id"])
     )
-    conn.commit(); conn.close()
-    return jsonify({"ok": True})
+    if not cur.rowcount:
+        conn.close(); return jsonify({"error":"Not found"}), 404
+    refresh_session(conn, sid)
+    version = record_change(conn, session["user_id"], sid, "session", sid)
+    bump_data_version(conn, session["user_id"])
+    conn.commit()
+    row = load_rows(conn, "session", [sid])[sid]
+    conn.close()
+    return jsonify({"ok": True, "version": version, "session": row})
 
 # ── Sets ──────────────────────────────────────────────────────────────────────
-@workout_bp.route("/api/sets", methods=["POST"])
-@login_required
-def log_set():
-    data = request.json
-    conn = get_db()
+def _log_set(conn, uid, data):
     if not conn.execute(
         "SELECT id FROM workout_session WHERE id=? AND user_id=?",
-        (data["session_id"], session["user_id"])
+        (data["session_id"], uid)
     ).fetchone():
-        conn.close(); return jsonify({"error":"Forbidden"}), 403
-    conn.execute("""
+        return {"error":"Forbidden"}, 403
+    cur = conn.execute("""
         INSERT INTO workout_set
             (session_id,exercise_id,set_number,reps,weight_kg,rest_seconds,rpe,notes)
         VALUES(?,?,?,?,?,?,?,?)
     """, (data["session_id"], data["exercise_id"], data["set_number"],
           data.get("reps"), data.get("weight_kg"), data.get("rest_seconds"),
           data.get("rpe"), data.get("notes","")))
-    conn.commit(); conn.close()
-    return jsonify({"ok": True})
+    refresh_session(conn, data["session_id"])
+    version = record_change(conn, uid, data["session_id"], "set", cur.lastrowid)
+    bump_data_version(conn, uid)
+    conn.commit()
+    row = load_rows(conn, "set", [cur.lastrowid])[cur.lastrowid]
+    return {"ok": True, "version": version, "set": row}, 200
+
+@workout_bp.route("/api/sets", methods=["POST"])
+@login_required
+def log_set():
+    conn = get_db()
+    body, status = _log_set(conn, session["user_id"], request.json)
+    conn.close()
+    return jsonify(body), status
+
+@async_view("workout.log_set")
+async def log_set_async(req):
+    body, status = await run_db(_log_set, req.uid, req.json)
+    return req.respond(body, status)
 
 @workout_bp.route("/api/sets/<int:set_id>", methods=["DELETE"])
 @login_required
 def delete_set(set_id):
     conn = get_db()
-    conn.execute("""
-        DELETE FROM workout_set WHERE id=? AND session_id IN
-        (SELECT id FROM workout_session WHERE user_id=?)
-    """, (set_id, session["user_id"]))
-    conn.commit(); conn.close()
-    return jsonify({"ok": True})
+    row = conn.execute("""
+        SELECT ws.session_id FROM workout_set ws
+        JOIN workout_session s ON s.id = ws.session_id
+        WHERE ws.id=? AND s.user_id=?
+    """, (set_id, session["user_id"])).fetchone()
+    version = None
+    if row:
+        conn.execute("DELETE FROM workout_set WHERE id=?", (set_id,))
+        refresh_session(conn, row["session_id"])
+        version = record_change(conn, session["user_id"], row["session_id"], "set", set_id, "delete")
+        bump_data_version(conn, session["user_id"])
+        conn.commit()
+    conn.close()
+    return jsonify({"ok": True, "id": set_id, "version": version})
 
 # ── Cardio (inside session) ───────────────────────────────────────────────────
 @workout_bp.route("/api/cardio", methods=["POST"])
@@ -167,7 +247,7 @@ def log_cardio():
     dur  = data.get("duration_min")
     pace = round(dur/dist, 2) if dist and dur and dist > 0 else None
 
-    conn.execute("""
+    cur = conn.execute("""
         INSERT INTO cardio_log
             (session_id,user_id,activity_type,distance_km,duration_min,
              avg_pace_min_km,avg_heart_rate,elevation_m,notes)
@@ -176,16 +256,30 @@ def log_cardio():
           dist, dur, pace,
           data.get("avg_heart_rate"), data.get("elevation_m"),
           data.get("notes","")))
-    conn.commit(); conn.close()
-    return jsonify({"ok": True, "avg_pace_min_km": pace})
+    refresh_session(conn, sid)
+    version = record_change(conn, session["user_id"], sid, "cardio", cur.lastrowid)
+    bump_data_version(conn, session["user_id"])
+    conn.commit()
+    row = load_rows(conn, "cardio", [cur.lastrowid])[cur.lastrowid]
+    conn.close()
+    return jsonify({"ok": True, "avg_pace_min_km": pace, "version": version, "cardio": row})
 
 @workout_bp.route("/api/cardio/<int:cid>", methods=["DELETE"])
 @login_required
 def delete_cardio(cid):
     conn = get_db()
-    conn.execute("DELETE FROM cardio_log WHERE id=? AND user_id=?", (cid, session["user_id"]))
-    conn.commit(); conn.close()
-    return jsonify({"ok": True})
+    row = conn.execute(
+        "SELECT session_id FROM cardio_log WHERE id=? AND user_id=?", (cid, session["user_id"])
+    ).fetchone()
+    version = None
+    if row:
+        conn.execute("DELETE FROM cardio_log WHERE id=?", (cid,))
+        refresh_session(conn, row["session_id"])
+        version = record_change(conn, session["user_id"], row["session_id"], "cardio", cid, "delete")
+        bump_data_version(conn, session["user_id"])
+        conn.commit()
+    conn.close()
+    return jsonify({"ok": True, "id": cid, "version": version})
 
 
 @workout_bp.route("/api/sets/<int:set_id>", methods=["PATCH"])
@@ -195,7 +289,7 @@ def update_set(set_id):
     conn = get_db()
     # Verify ownership
     row = conn.execute("""
-        SELECT ws.id FROM workout_set ws
+        SELECT ws.id, ws.session_id FROM workout_set ws
         JOIN workout_session s ON s.id = ws.session_id
         WHERE ws.id=? AND s.user_id=?
     """, (set_id, session["user_id"])).fetchone()
@@ -207,9 +301,188 @@ def update_set(set_id):
         if col in data:
             fields.append(f"{col}=?")
             vals.append(data[col])
+    version = None
     if fields:
         vals.append(set_id)
         conn.execute(f"UPDATE workout_set SET {', '.join(fields)} WHERE id=?", vals)
+        refresh_session(conn, row["session_id"])
+        version = record_change(conn, session["user_id"], row["session_id"], "set", set_id)
+        bump_data_version(conn, session["user_id"])
+        conn.commit()
+    updated = load_rows(conn, "set", [set_id])[set_id]
+    conn.close()
+    return jsonify({"ok": True, "version": version, "set": updated})
+
+
+# ── Sets (batch) ──────────────────────────────────────────────────────────────
+# One ownership check, one transaction, one commit for any number of sets —
+# starting a template used to cost a full round trip and fsync per set.
+MAX_BATCH = 500
+SET_FIELDS = ("reps", "weight_kg", "rest_seconds", "rpe", "notes")
+
+def _is_id(x):
+    return isinstance(x, int) and not isinstance(x, bool)
+
+def _bad_items(items, id_key):
+    """A 400 response for the first item whose `id_key` is not an integer id or
+    whose set fields are not plain values, else None. The single-set routes
+    get the id check from their <int:...> URL converter."""
+    for i, item in enumerate(items):
+        if not isinstance(item, dict):
+            continue
+        x = item.get(id_key)
+        if x is not None and not _is_id(x):
+            return jsonify({"error": f"{id_key} must be an integer (item {i})"}), 400
+        for col in ("set_number",) + SET_FIELDS:
+            if isinstance(item.get(col), (list, dict)):
+                return jsonify({"error": f"{col} must be a number or string (item {i})"}), 400
+    return None
+
+def _owned_set_sessions(conn, ids):
+    """Map set id → session id for the sets in `ids` owned by the current user."""
+    if not ids:
+        return {}
+    marks = ",".join("?" * len(ids))
+    rows = conn.execute(f"""
+        SELECT ws.id, ws.session_id FROM workout_set ws
+        JOIN workout_session s ON s.id = ws.session_id
+        WHERE ws.id IN ({marks}) AND s.user_id=?
+    """, (*ids, session["user_id"])).fetchall()
+    return {r["id"]: r["session_id"] for r in rows}
+
+@workout_bp.route("/api/sets/batch", methods=["POST"])
+@login_required
+def log_sets_batch():
+    data = request.json or {}
+    sid, sets = data.get("session_id"), data.get("sets")
+    if not isinstance(sets, list) or not sets:
+        return jsonify({"error": "sets must be a non-empty list"}), 400
+    if len(sets) > MAX_BATCH:
+        return jsonify({"error": f"At most {MAX_BATCH} sets per batch"}), 400
+    if not _is_id(sid):
+        return jsonify({"error": "session_id must be an integer"}), 400
+    bad = _bad_items(sets, "exercise_id")
+    if bad:
+        return bad
+    conn = get_db()
+    if not conn.execute(
+        "SELECT id FROM workout_session WHERE id=? AND user_id=?",
+        (sid, session["user_id"])
+    ).fetchone():
+        conn.close(); return jsonify({"error":"Forbidden"}), 403
+
+    ex_ids = {s.get("exercise_id") for s in sets if isinstance(s, dict)}
+    ex_ids.discard(None)
+    marks = ",".join("?" * len(ex_ids)) or "NULL"
+    known = {r["id"] for r in conn.execute(
+        f"SELECT id FROM exercise WHERE id IN ({marks}) AND (is_global=1 OR user_id=?)",
+        (*ex_ids, session["user_id"])
+    ).fetchall()}
+
+    results, rows = [], []
+    for i, s in enumerate(sets):
+        if not isinstance(s, dict) or s.get("set_number") is None:
+            results.append({"index": i, "error": "set_number required"})
+        elif s.get("exercise_id") not in known:
+            results.append({"index": i, "error": "Unknown exercise"})
+        else:
+            results.append({"index": i})
+            rows.append((sid, s["exercise_id"], s["set_number"],
+                         s.get("reps"), s.get("weight_kg"), s.get("rest_seconds"),
+                         s.get("rpe"), s.get("notes","")))
+    if rows:
+        conn.executemany("""
+            INSERT INTO workout_set
+                (session_id,exercise_id,set_number,reps,weight_kg,rest_seconds,rpe,notes)
+            VALUES(?,?,?,?,?,?,?,?)
+        """, rows)
+        # We hold the write lock and ids only grow, so our rows are the newest n
+        ids = [r["id"] for r in conn.execute(
+            "SELECT id FROM workout_set WHERE session_id=? ORDER BY id DESC LIMIT ?",
+            (sid, len(rows))
+        ).fetchall()][::-1]
+        ok = iter(ids)
+        for r in results:
+            if "error" not in r:
+                r["id"] = next(ok)
+        refresh_session(conn, sid)
+        version = record_changes(conn, session["user_id"], "set", [(sid, x) for x in ids])[sid]
+        bump_data_version(conn, session["user_id"])
+        conn.commit()
+        inserted = load_rows(conn, "set", ids)
+        for r in results:
+            if "id" in r:
+                r["set"] = inserted[r["id"]]
+    else:
+        version = None
+    conn.close()
+    return jsonify({"ok": True, "version": version, "results": results})
+
+@workout_bp.route("/api/sets/batch", methods=["PATCH"])
+@login_required
+def update_sets_batch():
+    sets = (request.json or {}).get("sets")
+    if not isinstance(sets, list) or not sets:
+        return jsonify({"error": "sets must be a non-empty list"}), 400
+    if len(sets) > MAX_BATCH:
+        return jsonify({"error": f"At most {MAX_BATCH} sets per batch"}), 400
+    bad = _bad_items(sets, "id")
+    if bad:
+        return bad
+    conn = get_db()
+    owned = _owned_set_sessions(conn, [s.get("id") for s in sets if isinstance(s, dict)])
+
+    results, by_cols = [], {}
+    for i, s in enumerate(sets):
+        if not isinstance(s, dict) or s.get("id") not in owned:
+            results.append({"index": i, "error": "Forbidden"})
+            continue
+        cols = tuple(c for c in SET_FIELDS if c in s)
+        results.append({"index": i, "id": s["id"]})
+        if cols:
+            by_cols.setdefault(cols, []).append([s[c] for c in cols] + [s["id"]])
+    for cols, vals in by_cols.items():
+        conn.executemany(
+            f"UPDATE workout_set SET {', '.join(f'{c}=?' for c in cols)} WHERE id=?", vals
+        )
+    if by_cols:
+        updated = {v[-1] for vals in by_cols.values() for v in vals}
+        for sid in {owned[x] for x in updated}:
+            refresh_session(conn, sid)
+        versions = record_changes(conn, session["user_id"], "set", [(owned[x], x) for x in updated])
+        bump_data_version(conn, session["user_id"])
+        conn.commit()
+    else:
+        versions = {}
+    rows = load_rows(conn, "set", [r["id"] for r in results if "id" in r])
+    for r in results:
+        if "id" in r:
+            r["set"] = rows.get(r["id"])
+    conn.close()
+    return jsonify({"ok": True, "versions": versions, "results": results})
+
+@workout_bp.route("/api/sets/batch", methods=["DELETE"])
+@login_required
+def delete_sets_batch():
+    ids = (request.json or {}).get("ids")
+    if not isinstance(ids, list) or not ids:
+        return jsonify({"error": "ids must be a non-empty list"}), 400
+    if len(ids) > MAX_BATCH:
+        return jsonify({"error": f"At most {MAX_BATCH} ids per batch"}), 400
+    if not all(_is_id(x) for x in ids):
+        return jsonify({"error": "ids must be integers"}), 400
+    conn = get_db()
+    owned = _owned_set_sessions(conn, ids)
+    results = [{"index": i, "id": x} if x in owned else {"index": i, "error": "Not found"}
+               for i, x in enumerate(ids)]
+    if owned:
+        conn.executemany("DELETE FROM workout_set WHERE id=?", [(x,) for x in owned])
+        for sid in set(owned.values()):
+            refresh_session(conn, sid)
+        versions = record_changes(conn, session["user_id"], "set", [(s, x) for x, s in owned.items()], "delete")
+        bump_data_version(conn, session["user_id"])
         conn.commit()
+    else:
+        versions = {}
     conn.close()
-    return jsonify({"ok": True})
+    return jsonify({"ok": True, "versions": versions, "results": results})
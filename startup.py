@@ -0,0 +1,59 @@
+"""Cold-start timing for the production entry points (wsgi.py, asgi.py).
+
+Import this module before anything else: its import is the zero point. The
+entry point marks its boot phases (app import, migration, ready), then the
+timer records the first request each blueprint serves — how long that request
+took and how long after boot it finished. That is where lazy imports, the
+first pool connections and a cold SQLite page cache show up. Measurements go
+to the "ironlog.startup" logger, and /healthz returns the whole report.
+"""
+import logging, threading, time
+from flask import g, request
+
+STARTED = time.perf_counter()
+log = logging.getLogger("ironlog.startup")
+
+def _ms(since):
+    return round((time.perf_counter() - since) * 1000, 1)
+
+
+class ColdStart:
+    def __init__(self, started=STARTED):
+        self.started = started
+        self.phases = {}
+        self.first_requests = {}
+        self._lock = threading.Lock()
+
+    def mark(self, phase):
+        self.phases[phase] = _ms(self.started)
+        log.info("cold start: %s after %.1f ms", phase, self.phases[phase])
+
+    def observe(self, blueprint, endpoint, began):
+        """Record a request that started at perf_counter() `began`, if it is
+        the first one served by its blueprint."""
+        with self._lock:
+            if blueprint in self.first_requests:
+                return
+            entry = self.first_requests[blueprint] = {
+                "endpoint": endpoint, "latency_ms": _ms(began), "after_boot_ms": _ms(self.started),
+            }
+        log.info("cold start: first %s request (%s) took %.1f ms, %.1f ms after boot",
+                 blueprint, endpoint, entry["latency_ms"], entry["after_boot_ms"])
+
+    def report(self):
+        return {"phases": dict(self.phases), "first_requests": dict(self.first_requests)}
+
+    def init_app(self, app):
+        app.extensions["cold_start"] = self
+        app.before_request(self._before)
+        app.after_request(self._after)
+
+    def _before(self):
+        if (request.blueprint or "app") not in self.first_requests:
+            g.cold_start_began = time.perf_counter()
+
+    def _after(self, response):
+        began = g.pop("cold_start_began", None)
+        if began is not None:
+            self.observe(request.blueprint or "app", request.endpoint, began)
+        return response
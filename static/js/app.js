@@ -2,6 +2,10 @@
 
 let activeSessionId = null;
 let exercises = [];
+let liveSets = [], liveCardio = [];   // local copy of the active session
+let outbox = [];                       // queued writes not yet confirmed by /api/sync
+let syncCursor = 0;
+let liveVersion = 0;                   // session version the local copy reflects
 const CARDIO_ICONS = { running:'🏃', walking:'🚶', cycling:'🚴', rowing:'🚣', swimming:'🏊', other:'⚡' };
 
 // ── Init ──────────────────────────────────────────────────────────────────────
@@ -14,12 +18,20 @@ async function init() {
 
   const stored = localStorage.getItem(storageKey());
   if (stored) activeSessionId = parseInt(stored);
+  outbox     = JSON.parse(localStorage.getItem(storageKey('outbox')) || '[]');
+  syncCursor = parseInt(localStorage.getItem(storageKey('cursor'))) || 0;
+  restoreLive();
+
+  window.addEventListener('online', flushOutbox);
+  setInterval(() => { if (outbox.length) flushOutbox(); }, 15000);
 
   await loadExercises();
   updateActiveUI();
   if (activeSessionId) {
-    await loadCurrentSets();
-    await loadCurrentCardio();
+    renderLive();
+    // With writes still queued the server copy is behind ours — flush first
+    if (outbox.length) flushOutbox();
+    else await refreshLive();
   }
 
   ['cardio-distance','cardio-duration'].forEach(id =>
@@ -28,8 +40,8 @@ async function init() {
 }
 
 // ── Helpers ───────────────────────────────────────────────────────────────────
-function storageKey() {
-  return `activeSession_${document.querySelector('.user-badge')?.textContent.trim()}`;
+function storageKey(name = 'activeSession') {
+  return `${name}_${document.querySelector('.user-badge')?.textContent.trim()}`;
 }
 
 function formatDate(d) {
@@ -85,8 +97,32 @@ function openEndModal() {
 }
 
 // ── Exercises ─────────────────────────────────────────────────────────────────
+// The catalog is kept in localStorage with its ETag: the picker renders from
+// that copy at once and the server only answers 304 until the catalog changes.
 async function loadExercises() {
-  exercises = await fetch('/api/exercises').then(r => r.json());
+  const cached = JSON.parse(localStorage.getItem(storageKey('exercises')) || 'null');
+  if (cached && !exercises.length) {
+    exercises = cached.list;
+    renderExerciseSelect();
+  }
+  try {
+    const res = await fetch('/api/exercises', {
+      cache: 'no-store',
+      headers: cached ? { 'If-None-Match': cached.etag } : {}
+    });
+    if (res.status === 304) return;
+    if (!res.ok) return;
+    exercises = await res.json();
+    localStorage.setItem(storageKey('exercises'),
+      JSON.stringify({ etag: res.headers.get('ETag'), list: exercises }));
+  } catch (e) {
+    if (cached) return;   // offline: keep the stored copy
+    throw e;
+  }
+  renderExerciseSelect();
+}
+
+function renderExerciseSelect() {
   const sel  = document.getElementById('exercise-select');
   const prev = sel.value;
   sel.innerHTML = '<option value="">— Select exercise —</option>';
@@ -134,17 +170,17 @@ async function startSession() {
   const data = await res.json();
   activeSessionId = data.id;
   localStorage.setItem(storageKey(), activeSessionId);
+  liveSets = []; liveCardio = []; liveVersion = data.version || 0;
+  saveLive(); renderLive();
   updateActiveUI();
   toast('Session started! 💪');
 }
 
 async function endSession() {
   const cal = parseFloat(document.getElementById('end-calories').value) || null;
-  await fetch(`/api/sessions/${activeSessionId}/end`, {
-    method: 'POST', headers: { 'Content-Type': 'application/json' },
-    body: JSON.stringify({ calories_burned: cal })
-  });
+  queueOp('end_session', { session_id: activeSessionId, calories_burned: cal });
   activeSessionId = null;
+  liveSets = []; liveCardio = []; saveLive();
   localStorage.removeItem(storageKey());
   closeModalById('end-modal');
   updateActiveUI();
@@ -160,7 +196,8 @@ function updateActiveUI() {
   document.getElementById('start-card').style.display    = hasSid ? 'none' : '';
   document.getElementById('session-panels').style.display = hasSid ? '' : 'none';
   if (hasSid)
-    document.getElementById('session-label').textContent = `Session #${activeSessionId}`;
+    document.getElementById('session-label').textContent =
+      `Session #${activeSessionId}` + (outbox.length ? ` · ${outbox.length} unsynced` : '');
 }
 
 // ── Save current session as template (called from End Session modal) ───────────
@@ -173,6 +210,7 @@ async function saveAsTemplate() {
     return;
   }
   if (!activeSessionId) return;
+  await flushOutbox();   // the template is built from what the server has
 
   const res  = await fetch(`/api/templates/from-session/${activeSessionId}`, {
     method: 'POST', headers: { 'Content-Type': 'application/json' },
@@ -189,55 +227,187 @@ async function saveAsTemplate() {
   }
 }
 
+// ── Offline write queue ───────────────────────────────────────────────────────
+// Writes are applied to the local copy at once and queued with a client UUID;
+// flushOutbox() ships them to /api/sync in batches whenever the network allows.
+// The server applies each op_id once, so resending after a dropped response is
+// harmless. Its reply carries the changes since our cursor, which are patched
+// into the local copy instead of re-fetching the whole session.
+function rowKey(r) { return r.client_id || String(r.id); }
+function rowRef(r) { return r.id != null ? { id: r.id } : { client_id: r.client_id }; }
+
+function saveLive() {
+  localStorage.setItem(storageKey('live'), JSON.stringify({
+    sid: activeSessionId, version: liveVersion, sets: liveSets, cardio: liveCardio
+  }));
+}
+
+function restoreLive() {
+  const live = JSON.parse(localStorage.getItem(storageKey('live')) || 'null');
+  if (live && live.sid === activeSessionId) {
+    liveSets = live.sets; liveCardio = live.cardio; liveVersion = live.version || 0;
+  }
+}
+
+function queueOp(type, data) {
+  outbox.push({ op_id: crypto.randomUUID(), type, data });
+  localStorage.setItem(storageKey('outbox'), JSON.stringify(outbox));
+  updateActiveUI();
+  flushOutbox();
+}
+
+// Ops the server refused are moved out of the outbox into 'parked', kept for
+// inspection instead of being resent every 15s ahead of everything queued later.
+const RETRY_STATUSES = new Set([401, 403, 408, 429]);
+function parkOps(ops) {
+  if (!ops.length) return;
+  const ids = new Set(ops.map(o => o.op_id));
+  const parked = JSON.parse(localStorage.getItem(storageKey('parked')) || '[]');
+  localStorage.setItem(storageKey('parked'), JSON.stringify(parked.concat(ops)));
+  outbox = outbox.filter(o => !ids.has(o.op_id));
+  localStorage.setItem(storageKey('outbox'), JSON.stringify(outbox));
+}
+
+let flushing = null;
+async function flushOutbox() {
+  if (flushing) return flushing;
+  flushing = (async () => {
+    try {
+      while (outbox.length) {
+        const batch = outbox.slice(0, 100);
+        const res = await fetch('/api/sync', {
+          method: 'POST', headers: { 'Content-Type': 'application/json' },
+          body: JSON.stringify({ ops: batch, since: syncCursor })
+        });
+        if (!res.ok) {
+          // A rejected batch would be rejected again; park it so the ops behind it can go.
+          // Signed out, throttled and server errors are worth retrying as they are.
+          if (res.status < 400 || res.status >= 500 || RETRY_STATUSES.has(res.status)) break;
+          parkOps(batch);
+          toast(`${batch.length} unsynced change(s) rejected by the server`, 'error');
+          continue;
+        }
+        const feed = await res.json();
+        const done = new Set(feed.results.map(r => r.op_id));
+        const failed = new Set(feed.results.filter(r => !r.ok).map(r => r.op_id));
+        parkOps(batch.filter(o => failed.has(o.op_id)));
+        outbox = outbox.filter(o => !done.has(o.op_id));
+        localStorage.setItem(storageKey('outbox'), JSON.stringify(outbox));
+        feed.results.filter(r => !r.ok).forEach(r => toast(r.error || 'Sync failed', 'error'));
+        await applyChanges(feed);
+      }
+    } catch (e) {
+      // Offline — keep the queue; the 'online' event or the retry timer resumes
+    } finally {
+      flushing = null;
+      updateActiveUI();
+    }
+  })();
+  return flushing;
+}
+
+function patchLive(changes) {
+  // Rows with writes still queued locally are newer here than on the server
+  const pending = new Set(outbox.map(o => o.data.client_id || String(o.data.id)));
+  for (const ch of changes) {
+    if (ch.session_id !== activeSessionId) continue;
+    liveVersion = Math.max(liveVersion, ch.version || 0);
+    const list = ch.entity === 'set' ? liveSets : ch.entity === 'cardio' ? liveCardio : null;
+    if (!list) continue;
+    const i = list.findIndex(r => r.id === ch.id || (ch.row?.client_id && r.client_id === ch.row.client_id));
+    if (ch.action === 'delete') { if (i >= 0) list.splice(i, 1); }
+    else if (!pending.has(rowKey(ch.row))) { if (i >= 0) list[i] = ch.row; else list.push(ch.row); }
+  }
+}
+
+async function applyChanges(feed) {
+  patchLive(feed.changes);
+  syncCursor = feed.cursor;
+  localStorage.setItem(storageKey('cursor'), syncCursor);
+  saveLive();
+  renderLive();
+  if (feed.more) await applyChanges(await fetch(`/api/sync?since=${syncCursor}`).then(r => r.json()));
+}
+
+async function loadCurrentSession() {
+  if (!activeSessionId) return;
+  // Take the cursor first so nothing written after the snapshot is missed
+  syncCursor = (await fetch('/api/sync').then(r => r.json())).cursor;
+  localStorage.setItem(storageKey('cursor'), syncCursor);
+  const s = await fetch(`/api/sessions/${activeSessionId}`).then(r => r.json());
+  liveSets = s.sets || []; liveCardio = s.cardio || []; liveVersion = s.version || 0;
+  saveLive();
+  renderLive();
+}
+
+// Bring a restored local copy up to date with only the rows that changed since
+// it was saved; without one there is nothing to patch, so load the session.
+async function refreshLive() {
+  if (!liveVersion) return loadCurrentSession();
+  let more = true;
+  while (more) {
+    const res = await fetch(`/api/sessions/${activeSessionId}/changes?since=${liveVersion}`);
+    if (!res.ok) return loadCurrentSession();
+    const data = await res.json();
+    patchLive(data.changes);
+    liveVersion = data.version;
+    more = data.more;
+  }
+  saveLive();
+  renderLive();
+}
+
+function renderLive() {
+  liveSets.sort((a, b) => a.exercise_id - b.exercise_id || a.set_number - b.set_number);
+  renderLiveSets(liveSets);
+  renderCardio(liveCardio, 'current-cardio', true);
+}
+
 // ── LIVE SESSION: Log set ─────────────────────────────────────────────────────
-async function logSet() {
+function logSet() {
   if (!activeSessionId) { toast('Start a session first!', 'error'); return; }
   const exId = document.getElementById('exercise-select').value;
   if (!exId) { toast('Select an exercise!', 'error'); return; }
 
-  await fetch('/api/sets', {
-    method: 'POST', headers: { 'Content-Type': 'application/json' },
-    body: JSON.stringify({
-      session_id:   activeSessionId,
-      exercise_id:  parseInt(exId),
-      set_number:   parseInt(document.getElementById('set-number').value)  || 1,
-      reps:         parseInt(document.getElementById('set-reps').value)    || null,
-      weight_kg:    parseFloat(document.getElementById('set-weight').value) || null,
-      rest_seconds: parseInt(document.getElementById('set-rest').value)    || null,
-      rpe:          parseFloat(document.getElementById('set-rpe').value)   || null,
-      notes:        document.getElementById('set-notes').value.trim()
-    })
-  });
+  const ex  = exercises.find(e => e.id === parseInt(exId)) || {};
+  const set = {
+    client_id:    crypto.randomUUID(),
+    session_id:   activeSessionId,
+    exercise_id:  parseInt(exId),
+    set_number:   parseInt(document.getElementById('set-number').value)  || 1,
+    reps:         parseInt(document.getElementById('set-reps').value)    || null,
+    weight_kg:    parseFloat(document.getElementById('set-weight').value) || null,
+    rest_seconds: parseInt(document.getElementById('set-rest').value)    || null,
+    rpe:          parseFloat(document.getElementById('set-rpe').value)   || null,
+    notes:        document.getElementById('set-notes').value.trim()
+  };
+  liveSets.push({ ...set, id: null, exercise_name: ex.name, muscle_group: ex.muscle_group });
+  saveLive(); renderLive();
+  queueOp('log_set', set);
   // Auto-increment set number, clear notes
-  document.getElementById('set-number').value = (parseInt(document.getElementById('set-number').value) || 1) + 1;
+  document.getElementById('set-number').value = set.set_number + 1;
   document.getElementById('set-notes').value  = '';
-  await loadCurrentSets();
   toast('Set logged! 🔥');
 }
 
 // ── LIVE SESSION: Edit an existing set inline ──────────────────────────────────
-async function updateSet(id) {
-  const reps   = parseInt(document.getElementById(`edit-reps-${id}`).value)    || null;
-  const weight = parseFloat(document.getElementById(`edit-weight-${id}`).value) || null;
-  const rpe    = parseFloat(document.getElementById(`edit-rpe-${id}`).value)   || null;
-
-  await fetch(`/api/sets/${id}`, {
-    method: 'PATCH', headers: { 'Content-Type': 'application/json' },
-    body: JSON.stringify({ reps, weight_kg: weight, rpe })
-  });
-  await loadCurrentSets();
+function updateSet(key) {
+  const s = liveSets.find(x => rowKey(x) === key);
+  if (!s) return;
+  s.reps      = parseInt(document.getElementById(`edit-reps-${key}`).value)    || null;
+  s.weight_kg = parseFloat(document.getElementById(`edit-weight-${key}`).value) || null;
+  s.rpe       = parseFloat(document.getElementById(`edit-rpe-${key}`).value)   || null;
+  saveLive(); renderLive();
+  queueOp('update_set', { ...rowRef(s), reps: s.reps, weight_kg: s.weight_kg, rpe: s.rpe });
   toast('Set updated ✓');
 }
 
-async function deleteSet(id) {
-  await fetch(`/api/sets/${id}`, { method: 'DELETE' });
-  await loadCurrentSets();
-}
-
-async function loadCurrentSets() {
-  if (!activeSessionId) return;
-  const s = await fetch(`/api/sessions/${activeSessionId}`).then(r => r.json());
-  renderLiveSets(s.sets);
+function deleteSet(key) {
+  const s = liveSets.find(x => rowKey(x) === key);
+  if (!s) return;
+  liveSets = liveSets.filter(x => x !== s);
+  saveLive(); renderLive();
+  queueOp('delete_set', rowRef(s));
 }
 
 // Renders the live session sets as EDITABLE rows (reps/weight/rpe inline inputs)
@@ -266,14 +436,15 @@ function renderLiveSets(sets) {
         </tr></thead>
         <tbody>`;
     g.sets.forEach(s => {
+      const k = rowKey(s);
       html += `<tr>
         <td class="set-num">${s.set_number}</td>
-        <td><input type="number" id="edit-reps-${s.id}"   class="set-input" value="${s.reps ?? ''}"      placeholder="—" min="1"></td>
-        <td><input type="number" id="edit-weight-${s.id}" class="set-input" value="${s.weight_kg ?? ''}" placeholder="—" step="0.5"></td>
-        <td><input type="number" id="edit-rpe-${s.id}"    class="set-input" value="${s.rpe ?? ''}"       placeholder="—" min="1" max="10" step="0.5"></td>
+        <td><input type="number" id="edit-reps-${k}"   class="set-input" value="${s.reps ?? ''}"      placeholder="—" min="1"></td>
+        <td><input type="number" id="edit-weight-${k}" class="set-input" value="${s.weight_kg ?? ''}" placeholder="—" step="0.5"></td>
+        <td><input type="number" id="edit-rpe-${k}"    class="set-input" value="${s.rpe ?? ''}"       placeholder="—" min="1" max="10" step="0.5"></td>
         <td class="set-actions">
-          <button class="btn-save-set"  onclick="updateSet(${s.id})"  title="Save">✓</button>
-          <button class="btn-del-set"   onclick="deleteSet(${s.id})"  title="Delete">✕</button>
+          <button class="btn-save-set"  onclick="updateSet('${k}')"  title="Save">✓</button>
+          <button class="btn-del-set"   onclick="deleteSet('${k}')"  title="Delete">✕</button>
         </td>
       </tr>`;
     });
@@ -295,41 +466,39 @@ function updatePacePreview() {
   }
 }
 
-async function logCardio() {
+function logCardio() {
   if (!activeSessionId) { toast('Start a session first!', 'error'); return; }
   const dist = parseFloat(document.getElementById('cardio-distance').value) || null;
   const dur  = parseFloat(document.getElementById('cardio-duration').value) || null;
   if (!dist && !dur) { toast('Enter distance or duration!', 'error'); return; }
 
-  const res  = await fetch('/api/cardio', {
-    method: 'POST', headers: { 'Content-Type': 'application/json' },
-    body: JSON.stringify({
-      session_id:    activeSessionId,
-      activity_type: document.getElementById('cardio-type').value,
-      distance_km:   dist,
-      duration_min:  dur,
-      avg_heart_rate:parseInt(document.getElementById('cardio-hr').value)      || null,
-      elevation_m:   parseFloat(document.getElementById('cardio-elevation').value) || null,
-      notes:         document.getElementById('cardio-notes').value.trim()
-    })
-  });
-  const data = await res.json();
+  const entry = {
+    client_id:     crypto.randomUUID(),
+    session_id:    activeSessionId,
+    activity_type: document.getElementById('cardio-type').value,
+    distance_km:   dist,
+    duration_min:  dur,
+    avg_heart_rate:parseInt(document.getElementById('cardio-hr').value)      || null,
+    elevation_m:   parseFloat(document.getElementById('cardio-elevation').value) || null,
+    notes:         document.getElementById('cardio-notes').value.trim()
+  };
+  // Same rounding as the server so the optimistic row matches what comes back
+  const pace = dist && dur ? Math.round(dur / dist * 100) / 100 : null;
+  liveCardio.push({ ...entry, id: null, avg_pace_min_km: pace });
+  saveLive(); renderLive();
+  queueOp('log_cardio', entry);
   ['cardio-distance','cardio-duration','cardio-hr','cardio-elevation','cardio-notes']
     .forEach(id => document.getElementById(id).value = '');
   document.getElementById('pace-preview').style.display = 'none';
-  await loadCurrentCardio();
-  toast(`Cardio logged! ${data.avg_pace_min_km ? fmtPace(data.avg_pace_min_km) : ''}`);
+  toast(`Cardio logged! ${pace ? fmtPace(pace) : ''}`);
 }
 
-async function deleteCardio(id) {
-  await fetch(`/api/cardio/${id}`, { method: 'DELETE' });
-  await loadCurrentCardio();
-}
-
-async function loadCurrentCardio() {
-  if (!activeSessionId) return;
-  const s = await fetch(`/api/sessions/${activeSessionId}`).then(r => r.json());
-  renderCardio(s.cardio, 'current-cardio', true);
+function deleteCardio(key) {
+  const e = liveCardio.find(x => rowKey(x) === key);
+  if (!e) return;
+  liveCardio = liveCardio.filter(x => x !== e);
+  saveLive(); renderLive();
+  queueOp('delete_cardio', rowRef(e));
 }
 
 function renderCardio(entries, containerId, deletable = false) {
@@ -352,22 +521,63 @@ function renderCardio(entries, containerId, deletable = false) {
         <div class="cardio-stats" style="margin-top:4px">${stats}</div>
         ${e.notes ? `<div class="set-sub">${e.notes}</div>` : ''}
       </div>
-      ${deletable ? `<button class="btn-danger" onclick="deleteCardio(${e.id})">✕</button>` : ''}
+      ${deletable ? `<button class="btn-danger" onclick="deleteCardio('${rowKey(e)}')">✕</button>` : ''}
     </div>`;
   });
   html += '</div>';
   c.innerHTML = html;
 }
 
+// ── Paged lists (history, body weight) ─────────────────────────────────────────
+// Both endpoints return { items, next } pages, newest first. Only the first page
+// is fetched up front; a sentinel below the list pulls the next one as it
+// scrolls into view, so first paint costs the same however long the history is.
+const pagers = {};
+let pageObserver = null;
+
+async function loadPaged(name, url, containerId, renderItem, emptyHtml) {
+  const c = document.getElementById(containerId);
+  let sentinel = document.getElementById(`${containerId}-sentinel`);
+  if (!sentinel) {
+    sentinel = document.createElement('div');
+    sentinel.id = `${containerId}-sentinel`;
+    sentinel.dataset.pager = name;
+    c.after(sentinel);
+    pageObserver ??= new IntersectionObserver(entries => entries.forEach(e => {
+      if (e.isIntersecting) loadNextPage(pagers[e.target.dataset.pager]);
+    }), { rootMargin: '200px' });
+    pageObserver.observe(sentinel);
+  }
+  const pager = pagers[name] = { url, c, sentinel, renderItem, emptyHtml, next: null, started: false, loading: false };
+  c.innerHTML = '';
+  await loadNextPage(pager);
+}
+
+async function loadNextPage(p) {
+  if (!p || p.loading || (p.started && !p.next)) return;
+  p.loading = true;
+  const sep  = p.url.includes('?') ? '&' : '?';
+  const url  = p.next ? `${p.url}${sep}before=${encodeURIComponent(p.next)}` : p.url;
+  const page = await fetch(url).then(r => r.json());
+  if (pagers[p.sentinel.dataset.pager] !== p) return;   // list was reloaded meanwhile
+  if (!p.started && !page.items.length) p.c.innerHTML = p.emptyHtml;
+  p.c.insertAdjacentHTML('beforeend', page.items.map(p.renderItem).join(''));
+  p.started = true;
+  p.next    = page.next;
+  p.loading = false;
+  // The observer only fires on changes — keep going while the sentinel stays visible
+  if (p.next && p.sentinel.getBoundingClientRect().top < window.innerHeight + 200)
+    loadNextPage(p);
+}
+
 // ── History ───────────────────────────────────────────────────────────────────
 async function loadHistory() {
-  const sessions = await fetch('/api/sessions').then(r => r.json());
-  const c = document.getElementById('history-list');
-  if (!sessions.length) {
-    c.innerHTML = '<div class="empty-state"><div class="empty-icon">📋</div><div class="empty-text">No sessions yet.</div></div>';
-    return;
-  }
-  c.innerHTML = sessions.map(s => `
+  await loadPaged('history', '/api/sessions', 'history-list', renderSessionCard,
+    '<div class="empty-state"><div class="empty-icon">📋</div><div class="empty-text">No sessions yet.</div></div>');
+}
+
+function renderSessionCard(s) {
+  return `
     <div class="session-card" onclick="openSession(${s.id})">
       <div class="session-date">${formatDate(s.session_date)}</div>
       <div class="session-chips">
@@ -377,7 +587,7 @@ async function loadHistory() {
         ${s.calories_burned ? `<span class="chip chip-cal">🔥 ${Math.round(s.calories_burned)} kcal</span>` : ''}
       </div>
       ${s.notes ? `<div class="session-note">📝 ${s.notes}</div>` : ''}
-    </div>`).join('');
+    </div>`;
 }
 
 async function openSession(id) {
@@ -467,20 +677,19 @@ async function logBodyWeight() {
 }
 
 async function loadBodyWeight() {
-  const entries = await fetch('/api/bodyweight').then(r => r.json());
-  const c = document.getElementById('bw-list');
-  if (!entries.length) {
-    c.innerHTML = '<div class="empty-state"><div class="empty-icon">⚖️</div><div class="empty-text">No entries yet.</div></div>';
-    return;
-  }
-  c.innerHTML = entries.map(e => `
+  await loadPaged('bodyweight', '/api/bodyweight', 'bw-list', renderBodyWeightRow,
+    '<div class="empty-state"><div class="empty-icon">⚖️</div><div class="empty-text">No entries yet.</div></div>');
+}
+
+function renderBodyWeightRow(e) {
+  return `
     <div class="bw-row">
       <div>
         <div class="bw-weight">${e.weight_kg}<span class="bw-unit"> kg</span></div>
         ${e.notes ? `<div class="bw-note">${e.notes}</div>` : ''}
       </div>
       <div class="bw-date">${formatDate(e.logged_at)}</div>
-    </div>`).join('');
+    </div>`;
 }
 
 init();
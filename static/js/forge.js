@@ -16,13 +16,20 @@ Chart.defaults.font.family = "'Barlow', sans-serif";
 
 let charts = {};
 let forgeData = null;
+let forgeEtag = null;
 
 function destroyChart(id) {
   if (charts[id]) { charts[id].destroy(); delete charts[id]; }
 }
 
 async function loadForge() {
-  forgeData = await fetch('/api/analytics/overview').then(r=>r.json());
+  // The server answers 304 when nothing changed; the browser then hands back its
+  // cached body with the same ETag, so there is nothing to re-render either.
+  const res = await fetch('/api/analytics/overview?format=columnar');
+  const etag = res.headers.get('ETag');
+  if (forgeData && etag && etag === forgeEtag) return;
+  forgeData = fromColumnar(await res.json());
+  forgeEtag = etag;
   renderStatPills(forgeData);
   renderHeatmap(forgeData.heatmap);
   renderVolumeChart(forgeData.weekly_volume);
@@ -32,6 +39,18 @@ async function loadForge() {
   renderCardioCharts(forgeData.cardio_by_activity);
 }
 
+// The columnar format sends each list of rows as {columns, rows}: key names
+// once, then one array of values per row. Rebuild the objects the charts read.
+function fromColumnar(v) {
+  if (Array.isArray(v)) return v.map(fromColumnar);
+  if (!v || typeof v !== 'object') return v;
+  const keys = Object.keys(v);
+  if (keys.length === 2 && Array.isArray(v.columns) && Array.isArray(v.rows)) {
+    return v.rows.map(row => Object.fromEntries(v.columns.map((c, i) => [c, row[i]])));
+  }
+  return Object.fromEntries(keys.map(k => [k, fromColumnar(v[k])]));
+}
+
 // ── Stat Pills ────────────────────────────────────────────────────────────────
 function renderStatPills(d) {
   const t  = d.totals;
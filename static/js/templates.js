@@ -117,11 +117,13 @@ async function startFromTemplate(tid) {
   const startData = await startRes.json();
   activeSessionId = startData.session_id;
   localStorage.setItem(storageKey(), activeSessionId);
+  liveSets = []; liveCardio = []; liveVersion = 0;
   updateActiveUI();
 
   // Load template — exercises include last_sets (actual numbers from last time)
   const t = await fetch(`/api/templates/${tid}`).then(r => r.json());
 
+  const sets = [];
   for (const ex of t.exercises) {
     // Use last-session sets if available, otherwise fall back to template targets
     const setsToLog = ex.last_sets && ex.last_sets.length > 0
@@ -129,21 +131,30 @@ async function startFromTemplate(tid) {
       : buildFallbackSets(ex);                // ← template targets if no history
 
     for (const s of setsToLog) {
-      await fetch('/api/sets', {
-        method: 'POST', headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({
-          session_id:  activeSessionId,
-          exercise_id: ex.exercise_id,
-          set_number:  s.set_number,
-          reps:        s.reps      || null,
-          weight_kg:   s.weight_kg || null,
-          rpe:         s.rpe       || null,
-          notes:       ''
-        })
+      sets.push({
+        exercise_id: ex.exercise_id,
+        set_number:  s.set_number,
+        reps:        s.reps      || null,
+        weight_kg:   s.weight_kg || null,
+        rpe:         s.rpe       || null,
+        notes:       ''
       });
     }
   }
 
+  // All pre-filled sets go in one request / one transaction; the reply carries
+  // the inserted rows, so the live copy is patched without another fetch
+  if (sets.length) {
+    const res = await fetch('/api/sets/batch', {
+      method: 'POST', headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ session_id: activeSessionId, sets })
+    }).then(r => r.json());
+    liveSets.push(...res.results.filter(r => r.set).map(r => r.set));
+    liveVersion = Math.max(liveVersion, res.version || 0);
+  }
+  saveLive();
+  renderLive();
+
   // Pre-select first exercise in the dropdown
   if (t.exercises.length) {
     const firstEx = t.exercises[0];
@@ -152,8 +163,6 @@ async function startFromTemplate(tid) {
     document.getElementById('set-number').value = lastSetNum + 1;
   }
 
-  await loadCurrentSets();
-
   const src = t.has_history ? 'last session numbers' : 'template targets';
   toast(`"${t.name}" loaded with ${src} — edit & confirm each set 💪`);
 }
@@ -0,0 +1,138 @@
+"""Strength analytics: estimated 1RM, rep-max PRs and PR history per exercise.
+
+A user's qualifying sets are loaded once into a NumPy structured array and
+every figure is derived with sorts and run-boundary tricks instead of per-row
+SQL or Python loops. Only sets with a load and 1..MAX_EST_REPS reps count —
+past that the 1RM formulas stop meaning much. The view is wrapped in
+cache.cached(), so the report is recomputed only after the user writes.
+"""
+import numpy as np
+
+MAX_EST_REPS = 12
+PR_EPSILON = 1e-6
+
+SET_DTYPE = np.dtype([
+    ("exercise_id", "i8"), ("session_id", "i8"), ("day", "M8[D]"),
+    ("set_id", "i8"), ("weight", "f8"), ("reps", "i8"),
+])
+
+
+# ── Loading ───────────────────────────────────────────────────────────────────
+def load_sets(conn, uid, exercise_id=None):
+    """All of the user's qualifying sets as a SET_DTYPE array (one query)."""
+    sql = """
+        SELECT ws.exercise_id, ws.session_id, s.session_date, ws.id, ws.weight_kg, ws.reps
+        FROM workout_session s JOIN workout_set ws ON ws.session_id = s.id
+        WHERE s.user_id=? AND ws.weight_kg > 0 AND ws.reps BETWEEN 1 AND ?
+    """
+    params = [uid, MAX_EST_REPS]
+    if exercise_id is not None:
+        sql += " AND ws.exercise_id=?"
+        params.append(exercise_id)
+    cur = conn.cursor()
+    cur.row_factory = None   # plain tuples feed np.array directly
+    return np.array(cur.execute(sql, params).fetchall(), dtype=SET_DTYPE)
+
+
+# ── Formulas ──────────────────────────────────────────────────────────────────
+def epley(weight, reps):
+    return np.where(reps == 1, weight, weight * (1 + reps / 30.0))
+
+def brzycki(weight, reps):
+    return weight * 36.0 / (37.0 - reps)
+
+FORMULAS = {"epley": epley, "brzycki": brzycki}
+
+
+# ── Vector helpers ────────────────────────────────────────────────────────────
+def _run_starts(*keys):
+    """Boolean mask marking the first row of each run of equal keys (sorted input)."""
+    n = len(keys[0])
+    start = np.zeros(n, dtype=bool)
+    if n:
+        start[0] = True
+        for k in keys:
+            start[1:] |= k[1:] != k[:-1]
+    return start
+
+def _run_ends(*keys):
+    start = _run_starts(*keys)
+    return np.flatnonzero(np.r_[start[1:], len(start) > 0])
+
+def _group_cummax(values, start):
+    """Running maximum of `values` restarting at every `start` row."""
+    if not len(values):
+        return values
+    group = np.cumsum(start) - 1
+    offset = group * (values.max() + 1)   # values >= 0, so groups never overlap
+    return np.maximum.accumulate(values + offset) - offset
+
+
+# ── Report ────────────────────────────────────────────────────────────────────
+def best_sets(sets, est):
+    """Best set (highest e1RM) per exercise per session, ordered by exercise/date."""
+    order = np.lexsort((est, sets["session_id"], sets["exercise_id"]))
+    sets, est = sets[order], est[order]
+    last = _run_ends(sets["exercise_id"], sets["session_id"])
+    best, best_est = sets[last], est[last]
+    order = np.lexsort((best["session_id"], best["day"], best["exercise_id"]))
+    return best[order], best_est[order]
+
+def rolling_prs(best, best_est):
+    """Flag each session best that beat every earlier one for its exercise."""
+    start = _run_starts(best["exercise_id"])
+    running = _group_cummax(best_est, start)
+    prev = np.r_[-np.inf, running[:-1]]
+    prev[start] = -np.inf
+    return best_est > prev + PR_EPSILON
+
+def rep_maxes(sets):
+    """Heaviest weight per exercise per rep count; ties go to the earliest date."""
+    order = np.lexsort((-sets["day"].astype("i8"), sets["weight"], sets["reps"], sets["exercise_id"]))
+    sets = sets[order]
+    return sets[_run_ends(sets["exercise_id"], sets["reps"])]
+
+def strength_report(conn, uid, formula="epley", exercise_id=None):
+    sets = load_sets(conn, uid, exercise_id)
+    est = FORMULAS[formula](sets["weight"], sets["reps"].astype("f8"))
+    best, best_est = best_sets(sets, est)
+    is_pr = rolling_prs(best, best_est)
+    maxes = rep_maxes(sets)
+
+    ex_ids = np.unique(sets["exercise_id"]).tolist()
+    marks = ",".join("?" * len(ex_ids)) or "NULL"
+    meta = {r["id"]: r for r in conn.execute(
+        f"SELECT id, name, muscle_group FROM exercise WHERE id IN ({marks})", ex_ids
+    ).fetchall()}
+
+    # Python only walks the (small) per-session and per-rep-count results
+    sessions = {}
+    for ex, day, sid, w, reps, e, pr in zip(
+        best["exercise_id"].tolist(), best["day"].astype(str).tolist(),
+        best["session_id"].tolist(), best["weight"].tolist(), best["reps"].tolist(),
+        np.round(best_est, 1).tolist(), is_pr.tolist()
+    ):
+        sessions.setdefault(ex, []).append({
+            "date": day, "session_id": sid, "weight_kg": w, "reps": reps,
+            "e1rm": e, "pr": pr,
+        })
+    table = {}
+    for ex, reps, w, day in zip(
+        maxes["exercise_id"].tolist(), maxes["reps"].tolist(),
+        maxes["weight"].tolist(), maxes["day"].astype(str).tolist()
+    ):
+        table.setdefault(ex, []).append({"reps": reps, "weight_kg": w, "date": day})
+
+    exercises = {}
+    for ex in ex_ids:
+        history = sessions[ex]
+        prs = [h for h in history if h["pr"]]
+        exercises[meta[ex]["name"]] = {
+            "exercise_id": ex,
+            "muscle": meta[ex]["muscle_group"],
+            "best": prs[-1],
+            "pr_count": len(prs),
+            "rep_maxes": table[ex],
+            "sessions": history,
+        }
+    return {"formula": formula, "exercises": exercises}
@@ -0,0 +1,55 @@
+"""Shared fixtures. Every test runs the real app against its own migrated
+SQLite file; nothing is mocked."""
+import os
+os.environ.setdefault("IRONLOG_ENV", "test")
+
+import pytest
+import database
+
+
+def use_database(app, path):
+    """Point the app at `path` (migrated if needed) with empty in-process caches."""
+    import catalog
+    database.configure_pool(path=str(path), size=4, pragmas=database.storage_profile("test"))
+    database.init_db()
+    app.extensions["response_cache"].clear()
+    app.extensions["auth"].users.clear()
+    catalog._users.clear()
+    return app
+
+
+@pytest.fixture
+def app(tmp_path):
+    from app import app
+    app.config.update(TESTING=True, AUTH_THROTTLE=False)
+    yield use_database(app, tmp_path / "gym.db")
+    database.configure_pool(path=database.DB_PATH, size=app.config["DB_POOL_SIZE"])
+
+
+@pytest.fixture
+def client(app):
+    """A test client logged in as a freshly signed-up user."""
+    c = app.test_client()
+    r = c.post("/signup", json={"username": "lifter", "email": "lifter@example.com", "password": "secret1"})
+    assert r.status_code == 200, r.get_data(as_text=True)
+    return c
+
+
+@pytest.fixture
+def conn(app):
+    """A pooled connection to the test database, outside any request."""
+    c = database.get_db()
+    yield c
+    c.close()
+
+
+def log_session(client, day, sets=((1, 5, 100),), cardio=None):
+    """Create a session on `day` with (exercise_id, reps, weight) sets; returns its id."""
+    sid = client.post("/api/sessions", json={"date": day}).get_json()["id"]
+    body = [{"exercise_id": ex, "set_number": n, "reps": reps, "weight_kg": kg}
+            for n, (ex, reps, kg) in enumerate(sets, 1)]
+    r = client.post("/api/sets/batch", json={"session_id": sid, "sets": body})
+    assert r.status_code == 200, r.get_data(as_text=True)
+    if cardio:
+        client.post("/api/cardio", json={"session_id": sid, **cardio})
+    return sid
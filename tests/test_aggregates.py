@@ -0,0 +1,54 @@
+"""Full rebuilds and backfills agree with the incrementally maintained tables."""
+from aggregates import (backfill_summaries, rebuild_rollups, rebuild_summaries, rebuild_template_snapshots,
+                        verify_rollups, verify_summaries, verify_template_snapshots)
+from training_load import verify_load
+from tests.conftest import log_session
+
+DERIVED = ("session_summary", "session_muscle_volume", "rollup_daily", "rollup_weekly",
+           "rollup_exercise_daily", "rollup_cardio_daily", "rollup_load_daily", "training_load",
+           "template_snapshot")
+
+
+def snapshot(conn):
+    return {t: sorted(tuple(r) for r in conn.execute(f"SELECT * FROM {t}")) for t in DERIVED}
+
+def seed(client):
+    for i, day in enumerate(("2026-03-02", "2026-03-04", "2026-03-04", "2026-03-09")):
+        log_session(client, day, [(1, 5, 100 + i), (2, 8, 60), (2, 8, 62.5)],
+                    cardio={"distance_km": 5, "duration_min": 26, "avg_heart_rate": 150} if i % 2 else None)
+    sid = log_session(client, "2026-03-11")
+    client.post(f"/api/templates/from-session/{sid}", json={"name": "A"})
+
+
+def test_rebuild_reproduces_incremental_state(client, conn):
+    seed(client)
+    expected = snapshot(conn)
+    uid = conn.execute("SELECT id FROM user").fetchone()[0]
+    for t in DERIVED:
+        conn.execute(f"DELETE FROM {t}")
+    assert rebuild_summaries(conn, uid) == 5
+    rebuild_rollups(conn, uid)
+    rebuild_template_snapshots(conn, uid)
+    conn.commit()
+    assert snapshot(conn) == expected
+    assert not verify_summaries(conn) and not verify_rollups(conn)
+    assert not verify_load(conn) and not verify_template_snapshots(conn)
+
+def test_rebuild_summaries_leaves_rollups_alone(client, conn):
+    seed(client)
+    conn.execute("DELETE FROM rollup_daily")
+    conn.execute("DELETE FROM training_load")
+    rebuild_summaries(conn)
+    assert conn.execute("SELECT COUNT(*) FROM rollup_daily").fetchone()[0] == 0
+    assert conn.execute("SELECT COUNT(*) FROM training_load").fetchone()[0] == 0
+    assert not verify_summaries(conn)
+
+def test_backfill_fills_missing_summaries_and_their_days(client, conn):
+    seed(client)
+    expected = snapshot(conn)
+    conn.execute("DELETE FROM session_summary WHERE session_id IN (SELECT id FROM workout_session "
+                 "WHERE session_date='2026-03-04')")
+    conn.execute("DELETE FROM rollup_daily WHERE day='2026-03-04'")
+    assert backfill_summaries(conn) == 2
+    conn.commit()
+    assert snapshot(conn) == expected
@@ -0,0 +1,30 @@
+import database
+import routes.auth
+
+
+def signup(client, username, email):
+    return client.post("/signup", json={"username": username, "email": email, "password": "secret1"})
+
+def test_duplicate_signup_is_refused(app):
+    assert signup(app.test_client(), "ana", "ana@example.com").status_code == 200
+    r = signup(app.test_client(), "ana", "other@example.com")
+    assert r.status_code == 400
+    assert r.get_json()["error"] == "Username or email already taken."
+
+def test_signup_losing_a_race_gets_the_same_answer(app, monkeypatch):
+    """The other signup commits between our duplicate check and our INSERT."""
+    hash_password = routes.auth.hash_password
+
+    def racing(password):
+        conn = database.get_pool().acquire()
+        conn.execute("INSERT INTO user (username, email, password_hash) VALUES ('ana', 'ana@example.com', 'x')")
+        conn.commit()
+        database.get_pool().release(conn)
+        return hash_password(password)
+
+    monkeypatch.setattr(routes.auth, "hash_password", racing)
+    client = app.test_client()
+    r = signup(client, "ana", "ana2@example.com")
+    assert r.status_code == 400
+    assert r.get_json()["error"] == "Username or email already taken."
+    assert client.get("/api/sessions").status_code == 401
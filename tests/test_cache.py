@@ -0,0 +1,17 @@
+from datetime import datetime, timezone
+import cache
+from tests.conftest import log_session
+
+
+class Tomorrow(datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return datetime(2099, 1, 2, 0, 0, 1, tzinfo=tz or timezone.utc)
+
+def test_overview_etag_turns_over_at_midnight(client, monkeypatch):
+    log_session(client, "2025-06-01")
+    etag = client.get("/api/analytics/overview").headers["ETag"]
+    assert client.get("/api/analytics/overview", headers={"If-None-Match": etag}).status_code == 304
+    monkeypatch.setattr(cache, "datetime", Tomorrow)
+    r = client.get("/api/analytics/overview", headers={"If-None-Match": etag})
+    assert r.status_code == 200 and r.headers["ETag"] != etag
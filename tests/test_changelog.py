@@ -0,0 +1,25 @@
+from changelog import changes_since
+from tests.conftest import log_session
+
+
+def test_session_feed_pages_never_split_a_version(client, conn):
+    sid = log_session(client, "2025-06-01", sets=[(1, 5, 100 + i) for i in range(5)])   # one version
+    client.post("/api/sets/batch", json={"session_id": sid, "sets": [
+        {"exercise_id": 2, "set_number": 1, "reps": 8, "weight_kg": 40}]})
+    uid = conn.execute("SELECT user_id FROM workout_session WHERE id=?", (sid,)).fetchone()[0]
+
+    seen, since, pages = set(), 0, 0
+    while True:
+        feed = changes_since(conn, uid, since, limit=3, session_id=sid)
+        seen |= {(c["entity"], c["id"]) for c in feed["changes"]}
+        since, pages = feed["cursor"], pages + 1
+        if not feed["more"]:
+            break
+    assert sum(entity == "set" for entity, _ in seen) == 6
+    assert pages <= 4
+
+def test_session_changes_route_reaches_the_latest_version(client):
+    sid = log_session(client, "2025-06-01", sets=[(1, 5, 100), (1, 5, 105)])
+    feed = client.get(f"/api/sessions/{sid}/changes?since=0").get_json()
+    assert not feed["more"]
+    assert feed["version"] == client.get(f"/api/sessions/{sid}").get_json()["version"]
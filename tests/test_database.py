@@ -0,0 +1,22 @@
+import database
+
+
+def test_with_block_keeps_the_cursor_factory(conn):
+    seen, wrapped = [], database._cursor_factory
+
+    class Recorder:
+        def __init__(self, cur):
+            self._cur = cur
+        def __getattr__(self, name):
+            return getattr(self._cur, name)
+        def execute(self, sql, params=()):
+            seen.append(sql)
+            return self._cur.execute(sql, params)
+
+    database.set_cursor_factory(Recorder)
+    try:
+        with conn as c:
+            c.execute("SELECT 1").fetchone()
+    finally:
+        database.set_cursor_factory(wrapped)
+    assert seen == ["SELECT 1"]
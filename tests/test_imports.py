@@ -0,0 +1,60 @@
+import glob, io, os, tempfile
+from aggregates import verify_rollups, verify_summaries, verify_template_snapshots
+from importer import Importer
+from training_load import verify_load
+
+CSV = """date,exercise,set_number,reps,weight_kg,rpe
+2025-06-01,Squat,1,5,100,8
+2025-06-01,Squat,2,5,105,9
+2025-06-03,Bench Press,1,8,60,
+2025-06-03,Made Up Lift,1,10,20,
+"""
+
+def _spooled():
+    return set(glob.glob(os.path.join(tempfile.gettempdir(), "ironlog-import-*")))
+
+def test_chunked_upload_over_the_limit_is_413(client, app, monkeypatch):
+    monkeypatch.setitem(app.config, "MAX_CONTENT_LENGTH", 1000)
+    before = _spooled()
+    r = client.post("/api/import?format=csv", input_stream=io.BytesIO(CSV.encode() * 100),
+                    content_type="text/csv", environ_overrides={"wsgi.input_terminated": True})
+    assert r.status_code == 413
+    assert "limited" in r.get_json()["error"]
+    assert _spooled() == before
+
+def test_multipart_upload_over_the_limit_is_413(client, app, monkeypatch):
+    monkeypatch.setitem(app.config, "MAX_CONTENT_LENGTH", 1000)
+    r = client.post("/api/import", data={"file": (io.BytesIO(CSV.encode() * 100), "log.csv")})
+    assert r.status_code == 413
+
+def test_import_leaves_derived_tables_consistent(client, conn, tmp_path):
+    client.post("/api/sessions", json={"date": "2025-05-30"})
+    uid = conn.execute("SELECT id FROM user WHERE username='lifter'").fetchone()[0]
+    path = tmp_path / "log.csv"
+    path.write_text(CSV)
+    result = Importer(uid, str(path), "csv").run()
+    assert (result["sessions"], result["sets"], result["exercises_created"]) == (2, 4, 1)
+    assert not os.path.exists(path)
+    assert not verify_summaries(conn) and not verify_rollups(conn)
+    assert not verify_load(conn) and not verify_template_snapshots(conn)
+    days = [r[0] for r in conn.execute("SELECT day FROM rollup_daily WHERE user_id=? ORDER BY day", (uid,))]
+    assert days == ["2025-05-30", "2025-06-01", "2025-06-03"]
+
+def test_non_finite_numbers_are_row_errors(client, conn, tmp_path):
+    uid = conn.execute("SELECT id FROM user WHERE username='lifter'").fetchone()[0]
+    path = tmp_path / "log.csv"
+    path.write_text("date,exercise,set_number,reps,weight_kg,rpe\n"
+                    "2025-06-01,Squat,1,inf,100,\n2025-06-01,Squat,2,5,1e400,\n"
+                    "2025-06-01,Squat,3,5,100,nan\n2025-06-01,Squat,4,5,100,8\n")
+    result = Importer(uid, str(path), "csv").run()
+    assert (result["sets"], result["skipped"]) == (1, 3)
+
+def test_pending_imports_are_capped_per_user(client, app, conn, monkeypatch):
+    monkeypatch.setitem(app.config, "IMPORTS_MAX_PENDING", 1)
+    before = _spooled()
+    codes = [client.post("/api/import?format=csv", data=CSV, content_type="text/csv").status_code
+             for _ in range(2)]
+    assert codes == [202, 429]
+    spooled = _spooled() - before
+    assert len(spooled) == 1
+    os.remove(spooled.pop())
@@ -0,0 +1,33 @@
+import os, subprocess, sys
+import jobs
+from tests.conftest import log_session
+
+
+def test_importing_the_app_starts_no_runner():
+    out = subprocess.run([sys.executable, "-c", "import app, jobs, threading; "
+                          "print(jobs._runner, any(t.name.startswith('ironlog-') for t in threading.enumerate()))"],
+                         capture_output=True, text=True, check=True,
+                         env={"IRONLOG_ENV": "test"}, cwd=os.path.dirname(os.path.dirname(__file__)))
+    assert out.stdout.split() == ["None", "False"]
+
+def test_pending_public_jobs_are_capped_per_user(client, app, monkeypatch):
+    monkeypatch.setitem(app.config, "JOBS_MAX_PENDING", 2)
+    codes = [client.post("/api/jobs", json={"kind": "rebuild_aggregates"}).status_code for _ in range(3)]
+    assert codes == [202, 202, 429]
+
+def test_rebuild_task_restores_template_snapshots(client, conn):
+    sid = log_session(client, "2025-06-01")
+    tid = client.post(f"/api/templates/from-session/{sid}", json={"name": "A"}).get_json()["id"]
+    conn.execute("DELETE FROM template_snapshot")
+    conn.commit()
+    job_id = client.post("/api/jobs", json={"kind": "rebuild_aggregates"}).get_json()["id"]
+    row = conn.execute("SELECT * FROM job WHERE id=?", (job_id,)).fetchone()
+    jobs.rebuild_aggregates_task(jobs.JobContext(row))
+    assert conn.execute("SELECT template_id FROM template_snapshot").fetchall()[0][0] == tid
+
+def test_runner_keeps_one_maintenance_job_queued(conn):
+    runner = jobs.JobRunner(maintenance_interval=300)
+    runner._schedule("db_maintenance", 300)
+    runner._schedule("db_maintenance", 300)
+    rows = conn.execute("SELECT status, run_after > datetime('now') FROM job WHERE kind='db_maintenance'").fetchall()
+    assert [tuple(r) for r in rows] == [("queued", 1)]
@@ -0,0 +1,25 @@
+import pytest
+
+REMOTE = {"REMOTE_ADDR": "10.1.2.3"}
+
+
+@pytest.fixture
+def token(app, monkeypatch):
+    monkeypatch.setitem(app.config, "METRICS_TOKEN", "s3cret")
+    return "s3cret"
+
+def test_scrape_without_a_token_is_local_only(client, app, monkeypatch):
+    monkeypatch.setitem(app.config, "METRICS_TOKEN", None)
+    assert client.get("/metrics").status_code == 200
+    assert client.get("/metrics", environ_base=REMOTE).status_code == 403
+
+def test_scrape_with_a_token_needs_it_from_everywhere(client, token):
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    r = client.get("/metrics", headers={"Authorization": f"Bearer {token}"}, environ_base=REMOTE)
+    assert r.status_code == 200 and b"ironlog_" in r.data
+
+def test_non_ascii_credentials_are_refused_not_errors(client, app, token, monkeypatch):
+    assert client.get("/metrics", headers={"Authorization": "Bearer s3crét"}).status_code == 401
+    monkeypatch.setitem(app.config, "PROFILE_TOKEN", "prof")
+    assert client.get("/api/sessions", headers={"X-Profile": "prøf"}).status_code == 200
@@ -0,0 +1,153 @@
+"""Schema migrations from a database created by the pre-versioning code,
+whose init_db() ran CREATE TABLE IF NOT EXISTS, seeded the global exercises
+and probed for late columns with ALTER TABLE on every boot."""
+import fcntl, sqlite3, threading
+import pytest
+from aggregates import verify_rollups, verify_summaries, verify_template_snapshots
+from migrations import INDEXES, connect, current_version, latest_version, upgrade
+from training_load import verify_load
+
+# The schema init_db() created before migrations existed
+BASELINE_SCHEMA = """
+CREATE TABLE user (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT NOT NULL UNIQUE, email TEXT NOT NULL UNIQUE,
+    password_hash TEXT NOT NULL, created_at DATETIME NOT NULL DEFAULT (datetime('now')));
+CREATE TABLE body_weight (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL REFERENCES user(id) ON DELETE CASCADE,
+    logged_at DATE NOT NULL DEFAULT (date('now')), weight_kg REAL NOT NULL, notes TEXT);
+CREATE TABLE exercise (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER REFERENCES user(id) ON DELETE CASCADE,
+    name TEXT NOT NULL, muscle_group TEXT, equipment TEXT, is_global INTEGER NOT NULL DEFAULT 0,
+    UNIQUE(name, is_global, user_id));
+CREATE TABLE workout_session (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL REFERENCES user(id) ON DELETE CASCADE,
+    session_date DATE NOT NULL DEFAULT (date('now')), started_at DATETIME NOT NULL DEFAULT (datetime('now')),
+    ended_at DATETIME, calories_burned REAL,
+    template_id INTEGER REFERENCES session_template(id) ON DELETE SET NULL, notes TEXT);
+CREATE TABLE workout_set (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id INTEGER NOT NULL REFERENCES workout_session(id) ON DELETE CASCADE,
+    exercise_id INTEGER NOT NULL REFERENCES exercise(id), set_number INTEGER NOT NULL, reps INTEGER,
+    weight_kg REAL, rest_seconds INTEGER, rpe REAL, notes TEXT,
+    logged_at DATETIME NOT NULL DEFAULT (datetime('now')));
+CREATE TABLE cardio_log (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id INTEGER NOT NULL REFERENCES workout_session(id) ON DELETE CASCADE,
+    user_id INTEGER NOT NULL REFERENCES user(id) ON DELETE CASCADE, activity_type TEXT NOT NULL,
+    distance_km REAL, duration_min REAL, avg_pace_min_km REAL, avg_heart_rate INTEGER, elevation_m REAL,
+    notes TEXT, logged_at DATETIME NOT NULL DEFAULT (datetime('now')));
+CREATE TABLE session_template (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL REFERENCES user(id) ON DELETE CASCADE,
+    name TEXT NOT NULL, notes TEXT, created_at DATETIME NOT NULL DEFAULT (datetime('now')));
+CREATE TABLE template_exercise (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    template_id INTEGER NOT NULL REFERENCES session_template(id) ON DELETE CASCADE,
+    exercise_id INTEGER NOT NULL REFERENCES exercise(id), sort_order INTEGER NOT NULL DEFAULT 0,
+    target_sets INTEGER, target_reps INTEGER, target_weight_kg REAL);
+CREATE TABLE template_cardio (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    template_id INTEGER NOT NULL REFERENCES session_template(id) ON DELETE CASCADE,
+    activity_type TEXT NOT NULL, target_distance_km REAL, target_duration_min REAL);
+"""
+
+# History as the old app left it, including a global exercise seeded twice
+BASELINE_DATA = """
+INSERT INTO user (id, username, email, password_hash) VALUES (1, 'old', 'old@example.com', 'x');
+INSERT INTO exercise (id, name, muscle_group, equipment, is_global) VALUES
+    (1, 'Squat', 'Legs', 'Barbell', 1), (2, 'Bench Press', 'Chest', 'Barbell', 1),
+    (3, 'squat', 'Legs', 'Barbell', 1);
+INSERT INTO exercise (id, user_id, name, muscle_group) VALUES (4, 1, 'Sled Push', 'Legs');
+INSERT INTO session_template (id, user_id, name) VALUES (1, 1, 'Legs');
+INSERT INTO template_exercise (template_id, exercise_id, sort_order, target_sets) VALUES (1, 3, 0, 3);
+INSERT INTO workout_session (id, user_id, session_date, ended_at, template_id) VALUES
+    (1, 1, '2024-03-01', '2024-03-01 10:00', 1), (2, 1, '2024-03-04', NULL, NULL);
+INSERT INTO workout_set (session_id, exercise_id, set_number, reps, weight_kg, rpe) VALUES
+    (1, 1, 1, 5, 100, 8), (1, 3, 2, 5, 105, 9), (1, 4, 3, 10, 80, NULL), (2, 2, 1, 8, 60, 7);
+INSERT INTO cardio_log (session_id, user_id, activity_type, distance_km, duration_min) VALUES
+    (2, 1, 'running', 5, 25);
+INSERT INTO body_weight (user_id, logged_at, weight_kg) VALUES (1, '2024-03-01', 82.5);
+"""
+
+
+def baseline_db(path):
+    conn = sqlite3.connect(path)
+    conn.executescript(BASELINE_SCHEMA + BASELINE_DATA)
+    conn.close()
+    return str(path)
+
+def schema(path):
+    conn = sqlite3.connect(path)
+    try:
+        return sorted(conn.execute("SELECT type, name, sql FROM sqlite_master").fetchall())
+    finally:
+        conn.close()
+
+
+def test_baseline_database_upgrades_to_latest(app, tmp_path):
+    path = baseline_db(tmp_path / "old.db")
+    done = upgrade(path)
+    assert [v for v, _, _ in done] == list(range(1, latest_version() + 1))
+
+    conn = connect(path)
+    try:
+        assert current_version(conn) == latest_version()
+        indexes = {r["name"]: r["unique"] for r in conn.execute("PRAGMA index_list(exercise)")}
+        names = {r["name"] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='index'")}
+        assert set(INDEXES) <= names
+        assert indexes["idx_exercise_global_name"] == 1
+        with pytest.raises(sqlite3.IntegrityError):
+            conn.execute("INSERT INTO exercise (name, is_global) VALUES ('SQUAT', 1)")
+
+        # The duplicate global was merged into the first copy, references included
+        assert conn.execute("SELECT COUNT(*) FROM exercise WHERE LOWER(name)='squat'").fetchone()[0] == 1
+        assert {r[0] for r in conn.execute("SELECT exercise_id FROM workout_set WHERE session_id=1")} == {1, 4}
+        assert conn.execute("SELECT exercise_id FROM template_exercise").fetchone()[0] == 1
+        assert conn.execute("SELECT COUNT(*) FROM workout_set").fetchone()[0] == 4
+
+        # Every aggregate is built and matches the raw rows
+        assert conn.execute("SELECT COUNT(*) FROM session_summary").fetchone()[0] == 2
+        assert conn.execute("SELECT COUNT(*) FROM template_snapshot").fetchone()[0] == 1
+        for table in ("rollup_daily", "rollup_weekly", "rollup_exercise_daily", "rollup_cardio_daily",
+                      "rollup_load_daily", "training_load"):
+            assert conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0], table
+        assert not verify_summaries(conn) and not verify_rollups(conn)
+        assert not verify_load(conn) and not verify_template_snapshots(conn)
+    finally:
+        conn.close()
+
+def test_upgrade_twice_is_a_no_op(app, tmp_path):
+    path = baseline_db(tmp_path / "old.db")
+    upgrade(path)
+    before = schema(path)
+    assert upgrade(path) == []
+    assert schema(path) == before
+
+def test_upgrade_waits_for_the_lock(app, tmp_path):
+    path = str(tmp_path / "new.db")
+    with open(path + ".lock", "w") as held:
+        fcntl.flock(held, fcntl.LOCK_EX)
+        waiting = threading.Thread(target=upgrade, args=(path,))
+        waiting.start()
+        waiting.join(0.5)
+        assert waiting.is_alive()
+        assert not schema(path)     # nothing was migrated while the lock was held
+    waiting.join(30)
+    assert not waiting.is_alive()
+    conn = connect(path)
+    assert current_version(conn) == latest_version()
+    conn.close()
+
+def test_concurrent_upgrades_migrate_once(app, tmp_path):
+    path = str(tmp_path / "new.db")
+    results, start = [], threading.Barrier(4)
+
+    def boot():
+        start.wait()
+        results.append(upgrade(path))
+
+    threads = [threading.Thread(target=boot) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(len(r) for r in results) == [0, 0, 0, latest_version()]
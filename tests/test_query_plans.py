@@ -0,0 +1,142 @@
+"""The routes stay on the indexes built by migration 3.
+
+Each test requests a route on a seeded database and records the statements it
+runs through database.set_cursor_factory(), then checks their EXPLAIN QUERY
+PLAN. The data comes from datagen, which ends with ANALYZE, so the planner
+sees realistic statistics. Every route in the url map is covered through its
+bench.py case, writes included.
+"""
+import json, os
+import pytest
+import bench
+import database
+from datagen import PASSWORD, generate_file
+from routes.export import DATASETS
+from tests.conftest import use_database
+
+# Tables that grow with a user's history; a full SCAN of any of them is a regression
+HISTORY_TABLES = ("user", "workout_session", "workout_set", "cardio_log", "body_weight", "session_summary",
+                  "session_muscle_volume", "rollup_daily", "rollup_weekly", "rollup_exercise_daily",
+                  "rollup_cardio_daily", "rollup_load_daily", "training_load", "change_log", "sync_op",
+                  "job", "session_template", "template_exercise", "template_cardio", "template_snapshot")
+# Statements EXPLAIN QUERY PLAN has something to say about
+PLANNED = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE", "REPLACE")
+
+
+@pytest.fixture(scope="module")
+def seeded(tmp_path_factory):
+    from app import app
+    path = tmp_path_factory.mktemp("plans") / "gym.db"
+    generate_file(str(path), 30000, users=30, seed=1)
+    app.config.update(TESTING=True, AUTH_THROTTLE=False)
+    use_database(app, path)
+    client = app.test_client()
+    client.post("/login", json={"username": "bench1", "password": PASSWORD})
+    yield app, client
+    database.configure_pool(path=database.DB_PATH, size=app.config["DB_POOL_SIZE"])
+
+
+@pytest.fixture(scope="module")
+def b(seeded):
+    app, _ = seeded
+    b = bench.Bench(app)
+    yield b
+    conn = database.get_db()
+    for job in conn.execute("SELECT payload FROM job WHERE kind='import'"):
+        path = json.loads(job["payload"])["path"]
+        if os.path.exists(path):
+            os.remove(path)
+    conn.close()
+
+
+def plans(client, path, method="GET", expect=200, **kw):
+    """{sql: plan details joined by newlines} for every statement the request ran."""
+    statements, wrapped = [], database._cursor_factory
+
+    class Recorder:
+        def __init__(self, cur):
+            object.__setattr__(self, "_cur", cur if wrapped is None else wrapped(cur))
+        def __getattr__(self, name):
+            return getattr(self._cur, name)
+        def __setattr__(self, name, value):
+            setattr(self._cur, name, value)     # row_factory
+        def execute(self, sql, params=()):
+            statements.append((sql, params))
+            return self._cur.execute(sql, params)
+        def executemany(self, sql, seq):
+            seq = list(seq)
+            if seq:
+                statements.append((sql, seq[0]))
+            return self._cur.executemany(sql, seq)
+
+    database.set_cursor_factory(Recorder)
+    try:
+        r = client.open(path, method=method, **kw)
+        r.get_data()                        # streamed bodies run their queries while iterated
+    finally:
+        database.set_cursor_factory(wrapped)
+    assert r.status_code == expect, r.get_data(as_text=True)[:200]
+    conn = database.get_pool().acquire()
+    try:
+        return {sql: "\n".join(row["detail"] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params))
+                for sql, params in statements if sql.lstrip().upper().startswith(PLANNED)}
+    finally:
+        database.get_pool().release(conn)
+
+def full_scans(found):
+    return [(" ".join(sql.split()), plan) for sql, plan in found.items()
+            if any(line.startswith("SCAN") and line.split()[1] in HISTORY_TABLES + tuple(_aliases(sql))
+                   for line in plan.splitlines())]
+
+def _aliases(sql):
+    """Aliases given to history tables in `sql` (`FROM workout_set ws` -> ws)."""
+    words = sql.replace(",", " ").split()
+    return [words[i + 1] for i, w in enumerate(words[:-1])
+            if w in HISTORY_TABLES and words[i + 1].upper() not in ("WHERE", "JOIN", "ON", "LEFT", "ORDER", "GROUP")]
+
+def uses(found, index):
+    return any(index in plan for plan in found.values())
+
+
+def test_session_list_seeks_user_and_date(seeded):
+    _, client = seeded
+    found = plans(client, "/api/sessions?limit=20")
+    assert uses(found, "idx_session_user_date")
+    assert not full_scans(found)
+    older = client.get("/api/sessions?limit=20").get_json()["next"]
+    found = plans(client, f"/api/sessions?limit=20&before={older}")
+    assert uses(found, "idx_session_user_date")
+
+def test_session_detail_reads_sets_by_session(seeded):
+    app, client = seeded
+    conn = database.get_pool().acquire()
+    sid = conn.execute("""
+        SELECT s.id FROM workout_session s JOIN user u ON u.id = s.user_id
+        WHERE u.username='bench1' ORDER BY s.id DESC LIMIT 1
+    """).fetchone()[0]
+    database.get_pool().release(conn)
+    found = plans(client, f"/api/sessions/{sid}")
+    assert uses(found, "idx_set_session")
+    assert uses(found, "idx_cardio_session")
+    assert not full_scans(found)
+
+def test_analytics_read_by_user_and_day(seeded):
+    _, client = seeded
+    found = plans(client, "/api/analytics/overview")
+    assert uses(found, "idx_rollup_ex_user_day") or uses(found, "sqlite_autoindex_rollup_exercise_daily_1")
+    assert uses(found, "idx_bw_user_date")
+    assert not full_scans(found)
+
+def test_every_route_has_a_case(seeded):
+    app, _ = seeded
+    assert not bench.missing_cases(app)
+
+@pytest.mark.parametrize("key", sorted(bench.CASES))
+def test_route_avoids_full_scans(b, key):
+    c = bench.CASES[key]
+    path, kw = c.fn(b)
+    assert not full_scans(plans(b.anon if c.anonymous else b.client, path, c.method, c.expect, **kw))
+
+@pytest.mark.parametrize("dataset", sorted(DATASETS))
+def test_every_export_avoids_full_scans(b, dataset):
+    assert not full_scans(plans(b.client, f"/api/export/{dataset}?format=ndjson"))
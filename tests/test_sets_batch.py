@@ -0,0 +1,38 @@
+"""Batch set endpoints: badly typed ids are refused with 400, never a 500."""
+import pytest
+from tests.conftest import log_session
+
+
+@pytest.fixture
+def sid(client):
+    return log_session(client, "2026-03-02", [(1, 5, 100), (1, 5, 100)])
+
+def test_batch_round_trip(client, sid):
+    r = client.post("/api/sets/batch", json={"session_id": sid, "sets": [
+        {"exercise_id": 2, "set_number": 1, "reps": 8, "weight_kg": 60},
+        {"exercise_id": 99999, "set_number": 2}]}).get_json()
+    assert r["results"][1] == {"index": 1, "error": "Unknown exercise"}
+    set_id = r["results"][0]["id"]
+    r = client.patch("/api/sets/batch", json={"sets": [{"id": set_id, "reps": 10}]}).get_json()
+    assert r["results"][0]["set"]["reps"] == 10
+    r = client.delete("/api/sets/batch", json={"ids": [set_id, 123456]}).get_json()
+    assert r["results"] == [{"index": 0, "id": set_id}, {"index": 1, "error": "Not found"}]
+
+@pytest.mark.parametrize("body", [
+    {"session_id": [1], "sets": [{"exercise_id": 1, "set_number": 1}]},
+    {"session_id": "1", "sets": [{"exercise_id": 1, "set_number": 1}]},
+    {"sets": [{"exercise_id": [1], "set_number": 1}]},
+    {"sets": [{"exercise_id": {"id": 1}, "set_number": 1}]},
+    {"sets": [{"exercise_id": 1, "set_number": 1, "reps": [5]}]},
+])
+def test_log_batch_rejects_bad_types(client, sid, body):
+    body.setdefault("session_id", sid)
+    assert client.post("/api/sets/batch", json=body).status_code == 400
+
+@pytest.mark.parametrize("item", [{"id": [1]}, {"id": {"x": 1}}, {"id": 1.5}, {"id": 1, "reps": {"n": 5}}])
+def test_update_batch_rejects_bad_types(client, sid, item):
+    assert client.patch("/api/sets/batch", json={"sets": [item]}).status_code == 400
+
+@pytest.mark.parametrize("ids", [[[1]], [{"id": 1}], ["1"], [True]])
+def test_delete_batch_rejects_bad_ids(client, sid, ids):
+    assert client.delete("/api/sets/batch", json={"ids": ids}).status_code == 400
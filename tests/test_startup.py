@@ -0,0 +1,12 @@
+import os, subprocess, sys
+
+
+def test_serving_path_leaves_the_dev_tooling_unimported():
+    out = subprocess.run([sys.executable, "-c", "import app, sys; print('datagen' in sys.modules, 'bench' in sys.modules)"],
+                         capture_output=True, text=True, check=True,
+                         env={"IRONLOG_ENV": "test"}, cwd=os.path.dirname(os.path.dirname(__file__)))
+    assert out.stdout.split() == ["False", "False"]
+
+def test_lazy_groups_still_load_under_the_cli(app):
+    result = app.test_cli_runner().invoke(args=["bench", "--help"])
+    assert result.exit_code == 0 and "wal" in result.output
@@ -0,0 +1,39 @@
+import sqlite3, uuid
+from routes import sync
+
+
+def ops(*items):
+    return [{"op_id": str(uuid.uuid4()), "type": t, "data": d} for t, d in items]
+
+def test_malformed_op_fails_alone(client):
+    batch = ops(("create_session", {"client_id": "s1", "date": "2025-06-01"}),
+                ("log_cardio", {"session_client_id": "s1", "distance_km": "far", "duration_min": 30}),
+                ("log_set", "not an object"),
+                ("log_set", {"session_client_id": "s1", "exercise_id": 1, "set_number": 1, "reps": 5}))
+    r = client.post("/api/sync", json={"ops": batch})
+    assert r.status_code == 200
+    results = r.get_json()["results"]
+    assert [x["ok"] for x in results] == [True, False, False, True]
+    assert results[1]["error"] == results[2]["error"] == "Invalid operation"
+    sid = results[0]["id"]
+    detail = client.get(f"/api/sessions/{sid}").get_json()
+    assert len(detail["sets"]) == 1 and detail["cardio"] == []
+
+    # The failures are remembered like successes: a resent batch changes nothing
+    again = client.post("/api/sync", json={"ops": batch}).get_json()["results"]
+    assert again == results
+
+def test_transient_errors_are_retried_not_remembered(client, conn, monkeypatch):
+    def locked(conn, uid, data, touched):
+        raise sqlite3.OperationalError("database is locked")
+    batch = ops(("create_session", {"client_id": "s1", "date": "2025-06-01"}),
+                ("end_session", {"session_client_id": "s1"}))
+    monkeypatch.setitem(sync.OPS, "end_session", locked)
+    r = client.post("/api/sync", json={"ops": batch})
+    assert r.status_code == 503 and r.headers["Retry-After"]
+    assert conn.execute("SELECT COUNT(*) FROM sync_op").fetchone()[0] == 0
+    assert conn.execute("SELECT COUNT(*) FROM workout_session").fetchone()[0] == 0
+
+    monkeypatch.undo()
+    results = client.post("/api/sync", json={"ops": batch}).get_json()["results"]
+    assert [x["ok"] for x in results] == [True, True]
@@ -0,0 +1,43 @@
+import sqlite3
+from aggregates import verify_template_snapshots
+from datagen import generate_file
+from tests.conftest import log_session
+
+
+def session_changes(client, sid, since=0):
+    return client.get(f"/api/sessions/{sid}/changes?since={since}").get_json()
+
+def test_template_from_session_records_the_relink(client):
+    sid = log_session(client, "2025-06-01", sets=[(1, 5, 100), (2, 8, 60)])
+    version = session_changes(client, sid)["version"]
+    tid = client.post(f"/api/templates/from-session/{sid}", json={"name": "A"}).get_json()["id"]
+    feed = session_changes(client, sid, version)
+    assert [c["row"]["template_id"] for c in feed["changes"] if c["entity"] == "session"] == [tid]
+
+def test_deleting_a_template_records_its_unlinked_sessions(client):
+    sid = log_session(client, "2025-06-01")
+    tid = client.post(f"/api/templates/from-session/{sid}", json={"name": "A"}).get_json()["id"]
+    version = session_changes(client, sid)["version"]
+    client.delete(f"/api/templates/{tid}")
+    feed = session_changes(client, sid, version)
+    assert [c["row"]["template_id"] for c in feed["changes"] if c["entity"] == "session"] == [None]
+
+def test_template_without_a_snapshot_is_still_listed(client, conn):
+    sid = log_session(client, "2025-06-01", sets=[(1, 5, 100), (2, 8, 60)])
+    tid = client.post(f"/api/templates/from-session/{sid}", json={"name": "A"}).get_json()["id"]
+    listed = client.get("/api/templates").get_json()
+    conn.execute("DELETE FROM template_snapshot")
+    conn.commit()
+    assert client.get("/api/templates").get_json() == listed
+    assert listed[0]["id"] == tid and listed[0]["exercise_count"] == 2
+    assert conn.execute("SELECT COUNT(*) FROM template_snapshot").fetchone()[0] == 1
+
+def test_generated_users_rotate_through_many_templates(tmp_path):
+    path = str(tmp_path / "gym.db")
+    generate_file(path, 3000, users=1, templates=40, seed=1)
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    used = conn.execute("SELECT COUNT(DISTINCT template_id) FROM workout_session").fetchone()[0]
+    assert conn.execute("SELECT COUNT(*) FROM session_template").fetchone()[0] == used == 40
+    assert not verify_template_snapshots(conn)
+    conn.close()
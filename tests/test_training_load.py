@@ -0,0 +1,33 @@
+import pytest
+from training_load import rebuild_load, verify_load
+from tests.conftest import log_session
+
+
+@pytest.mark.parametrize("day", ["01/06/2025", "2025-6-1", "20250601", "", 20250601, None])
+def test_create_session_rejects_non_iso_dates(client, day):
+    r = client.post("/api/sessions", json={"date": day})
+    assert r.status_code == 400
+    assert "YYYY-MM-DD" in r.get_json()["error"]
+
+def test_sync_create_session_rejects_non_iso_dates(client):
+    r = client.post("/api/sync", json={"ops": [
+        {"op_id": "a", "type": "create_session", "data": {"client_id": "s1", "date": "01/06/2025"}}]})
+    assert r.status_code == 200
+    assert r.get_json()["results"] == [{"op_id": "a", "ok": False, "error": "date must be YYYY-MM-DD"}]
+
+def test_load_skips_sessions_with_legacy_dates(client, conn):
+    """Rows written before dates were validated no longer break every later write."""
+    log_session(client, "2025-06-01")
+    uid = conn.execute("SELECT id FROM user WHERE username='lifter'").fetchone()[0]
+    conn.execute("INSERT INTO workout_session (user_id, session_date) VALUES (?, '01/06/2025')", (uid,))
+    sid = conn.execute("SELECT MAX(id) FROM workout_session").fetchone()[0]
+    conn.commit()
+    r = client.post("/api/sets", json={"session_id": sid, "exercise_id": 1, "set_number": 1,
+                                       "reps": 5, "weight_kg": 100})
+    assert r.status_code == 200
+    log_session(client, "2025-06-03")
+    rebuild_load(conn, uid)
+    assert verify_load(conn) == []
+    days = [row[0] for row in conn.execute("SELECT day FROM training_load WHERE user_id=? ORDER BY day", (uid,))]
+    assert days == ["2025-06-01", "2025-06-03"]
+    assert client.get("/api/analytics/load?days=30").status_code == 200
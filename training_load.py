@@ -0,0 +1,182 @@
+"""Training load: acute/chronic workload (ACWR) and a Banister fitness/fatigue model.
+
+Daily load comes from the rollup_load_daily rollup (set volume × RPE/10 plus
+cardio minutes × heart rate). Every model here is a first-order recurrence,
+so the state after a day depends only on the previous state and that day's
+load — and a run of rest days collapses to a single decay factor. The state
+is stored per user in training_load, one row per day with any load.
+
+refresh_load() is called from aggregates.refresh_day() inside the write's
+transaction: it replays only the rows from the edited day onward, which for
+the usual "log today" write is a single row regardless of history length.
+"""
+import math
+from datetime import date, timedelta
+
+ACUTE_DAYS = 7
+CHRONIC_DAYS = 28
+FITNESS_TAU = 42.0
+FATIGUE_TAU = 7.0
+K_FITNESS = 1.0
+K_FATIGUE = 2.0
+DEFAULT_RPE = 7       # sets logged without an RPE
+DEFAULT_HR = 120      # cardio logged without a heart rate
+
+# EWMA smoothing per Williams et al.: alpha = 2 / (N + 1)
+ACUTE_ALPHA = 2.0 / (ACUTE_DAYS + 1)
+CHRONIC_ALPHA = 2.0 / (CHRONIC_DAYS + 1)
+
+STATE_FIELDS = ("acute", "chronic", "fitness", "fatigue")
+ZERO = dict.fromkeys(STATE_FIELDS, 0.0)
+
+
+# ── Recurrences ───────────────────────────────────────────────────────────────
+def decay(state, days):
+    """State after `days` rest days."""
+    if days <= 0:
+        return dict(state)
+    return {
+        "acute":   state["acute"]   * (1 - ACUTE_ALPHA) ** days,
+        "chronic": state["chronic"] * (1 - CHRONIC_ALPHA) ** days,
+        "fitness": state["fitness"] * math.exp(-days / FITNESS_TAU),
+        "fatigue": state["fatigue"] * math.exp(-days / FATIGUE_TAU),
+    }
+
+def step(state, days, load):
+    """State after `days - 1` rest days followed by one day with `load`."""
+    s = decay(state, days - 1)
+    return {
+        "acute":   s["acute"]   + ACUTE_ALPHA   * (load - s["acute"]),
+        "chronic": s["chronic"] + CHRONIC_ALPHA * (load - s["chronic"]),
+        "fitness": s["fitness"] * math.exp(-1 / FITNESS_TAU) + load,
+        "fatigue": s["fatigue"] * math.exp(-1 / FATIGUE_TAU) + load,
+    }
+
+def derived(state):
+    """ACWR and Banister performance (form) for a state."""
+    return {
+        "acwr": round(state["acute"] / state["chronic"], 3) if state["chronic"] > 1e-9 else None,
+        "form": round(K_FITNESS * state["fitness"] - K_FATIGUE * state["fatigue"], 1),
+    }
+
+def _days(a, b):
+    return (date.fromisoformat(b) - date.fromisoformat(a)).days
+
+def is_iso_date(value):
+    """True for a "YYYY-MM-DD" string, the form session_date must take: the
+    rollups and these recurrences order and parse it as one. Writes check it."""
+    try:
+        return date.fromisoformat(value).isoformat() == value
+    except (TypeError, ValueError):
+        return False
+
+def _day(value):
+    """`value` as a date, or None if it isn't one. Sessions written before
+    dates were validated can carry any text; the recurrences skip those days."""
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+# ── Maintenance ───────────────────────────────────────────────────────────────
+def _replay(conn, uid, prev, since):
+    state = {k: prev[k] for k in STATE_FIELDS} if prev else ZERO
+    last = _day(prev["day"]) if prev else None
+    rows = conn.execute("""
+        SELECT day, strength_load + cardio_load AS load
+        FROM rollup_load_daily WHERE user_id=? AND day>=? ORDER BY day
+    """, (uid, since)).fetchall()
+    out = []
+    for r in rows:
+        day = _day(r["day"])
+        if day is None:
+            continue
+        state = step(state, (day - last).days if last else 1, r["load"])
+        last = day
+        out.append((uid, r["day"], r["load"], *(state[k] for k in STATE_FIELDS)))
+    conn.executemany("INSERT INTO training_load VALUES (?,?,?,?,?,?,?)", out)
+
+def refresh_load(conn, uid, day):
+    """Recompute the user's load state from `day` onward."""
+    prev = conn.execute(
+        "SELECT * FROM training_load WHERE user_id=? AND day<? ORDER BY day DESC LIMIT 1",
+        (uid, day)
+    ).fetchone()
+    conn.execute("DELETE FROM training_load WHERE user_id=? AND day>=?", (uid, day))
+    _replay(conn, uid, prev, day)
+
+def rebuild_load(conn, user_id=None):
+    """Backfill: replay every user's (or one user's) full history."""
+    if user_id is None:
+        conn.execute("DELETE FROM training_load")
+        users = [r[0] for r in conn.execute("SELECT DISTINCT user_id FROM rollup_load_daily")]
+    else:
+        conn.execute("DELETE FROM training_load WHERE user_id=?", (user_id,))
+        users = [user_id]
+    for uid in users:
+        _replay(conn, uid, None, "")
+
+def verify_load(conn):
+    """Replay each user's history in memory and compare with the stored rows.
+    Returns a list of (user_id, day, problem); empty means consistent."""
+    problems = []
+    users = [r[0] for r in conn.execute(
+        "SELECT user_id FROM rollup_load_daily UNION SELECT user_id FROM training_load"
+    )]
+    for uid in users:
+        expected, state, last = {}, ZERO, None
+        for r in conn.execute(
+            "SELECT day, strength_load + cardio_load AS load FROM rollup_load_daily "
+            "WHERE user_id=? ORDER BY day", (uid,)
+        ):
+            day = _day(r["day"])
+            if day is None:
+                continue
+            state = step(state, (day - last).days if last else 1, r["load"])
+            last = day
+            expected[r["day"]] = state
+        stored = {r["day"]: r for r in conn.execute(
+            "SELECT * FROM training_load WHERE user_id=?", (uid,)
+        )}
+        for day in expected.keys() - stored.keys():
+            problems.append((uid, day, "missing"))
+        for day in stored.keys() - expected.keys():
+            problems.append((uid, day, "orphaned"))
+        for day in expected.keys() & stored.keys():
+            if any(abs(expected[day][k] - stored[day][k]) > 1e-6 * max(1.0, abs(expected[day][k]))
+                   for k in STATE_FIELDS):
+                problems.append((uid, day, "stale"))
+    return problems
+
+
+# ── Reads ─────────────────────────────────────────────────────────────────────
+def load_series(conn, uid, days, today=None):
+    """Daily state for the last `days` days ending `today`, rest days included.
+    Reads only the stored rows inside the window plus one seed row before it."""
+    today = today or date.today().isoformat()
+    start = (date.fromisoformat(today) - timedelta(days=days - 1)).isoformat()
+    seed = conn.execute(
+        "SELECT * FROM training_load WHERE user_id=? AND day<? ORDER BY day DESC LIMIT 1",
+        (uid, start)
+    ).fetchone()
+    rows = {r["day"]: r for r in conn.execute(
+        "SELECT * FROM training_load WHERE user_id=? AND day BETWEEN ? AND ? ORDER BY day",
+        (uid, start, today)
+    )}
+    state = {k: seed[k] for k in STATE_FIELDS} if seed else ZERO
+    last = seed["day"] if seed else start
+
+    series = []
+    d = date.fromisoformat(start)
+    for _ in range(days):
+        day = d.isoformat()
+        if day in rows:
+            state, last, load = {k: rows[day][k] for k in STATE_FIELDS}, day, rows[day]["load"]
+            current = state
+        else:
+            current, load = decay(state, _days(last, day)), 0.0
+        series.append({"date": day, "load": round(load, 1),
+                       **{k: round(v, 1) for k, v in current.items()}, **derived(current)})
+        d += timedelta(days=1)
+    return series
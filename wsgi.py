@@ -0,0 +1,21 @@
+"""WSGI entry point for production: `gunicorn -c gunicorn.conf.py wsgi:application`.
+
+Each worker imports this module after the fork. database.migrate() only
+reads the schema version once the database is current; when it is behind,
+one worker applies the pending migrations and the others wait for it. Each
+worker then starts its background job runner.
+`python app.py` remains the development server.
+"""
+import startup                      # first: its import is the cold-start zero point
+from app import app
+from database import migrate
+from jobs import start_jobs
+
+cold_start = startup.ColdStart()
+cold_start.mark("import")
+migrate()
+cold_start.mark("migrate")
+start_jobs(app)
+cold_start.init_app(app)
+application = app
+cold_start.mark("ready")